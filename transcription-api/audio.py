@@ -0,0 +1,145 @@
+import io
+import os
+import uuid
+import numpy as np
+import soundfile as sf
+from typing import Iterator, List, Optional, Tuple
+from faster_whisper import decode_audio
+
+SAMPLE_RATE = 16000
+
+# Decoded buffers above this size are memory-mapped from disk instead of kept on the heap
+MMAP_THRESHOLD = int(os.environ.get("AUDIO_MMAP_THRESHOLD_MB", 256)) * 1024 * 1024
+
+def convert_audio(file) -> np.ndarray:
+        return decode_audio(file, split_stereo=False, sampling_rate=SAMPLE_RATE)
+
+def load_audio(path: str) -> np.ndarray:
+    """
+    Decodes a media file once into a 16 kHz mono float32 buffer that can be shared by
+    every consumer (faster-whisper, pyannote). Large recordings are spilled to disk and
+    memory-mapped, so the kernel can page them out under memory pressure.
+    """
+    audio = convert_audio(path)
+    if not MMAP_THRESHOLD or audio.nbytes <= MMAP_THRESHOLD:
+        return audio
+
+    pcm_path = os.path.join(os.path.dirname(path) or ".", f".{uuid.uuid4().hex}.f32")
+    audio.tofile(pcm_path)
+    del audio
+    try:
+        # Copy-on-write so consumers that need a writable array (torch) still work
+        return np.memmap(pcm_path, dtype=np.float32, mode="c")
+    finally:
+        # The mapping stays valid after unlinking, the file disappears with the last reference
+        os.remove(pcm_path)
+
+def media_duration(path: str) -> Optional[float]:
+    """
+    Duration in seconds read from the container header, without decoding. None if unknown.
+    """
+    import av
+    try:
+        with av.open(path) as container:
+            if container.duration:
+                return container.duration / av.time_base
+    except Exception:
+        pass
+    return None
+
+def quietest_point(audio: np.ndarray, low: int, high: int, frame_samples: int = SAMPLE_RATE // 50) -> int:
+    """
+    Sample index in the middle of the quietest frame of audio[low:high], or high if the range is too short.
+    """
+    low = max(0, low)
+    frames = (high - low) // frame_samples
+    if frames <= 0:
+        return high
+    window = np.asarray(audio[low:low + frames * frame_samples], dtype=np.float32)
+    energy = np.square(window).reshape(frames, frame_samples).mean(axis=1)
+    return low + int(np.argmin(energy)) * frame_samples + frame_samples // 2
+
+def split_on_silence(audio: np.ndarray, max_samples: int, search_samples: int = 30 * SAMPLE_RATE,
+                     frame_samples: int = SAMPLE_RATE // 50) -> List[Tuple[int, int]]:
+    """
+    Splits a buffer into [start, end) sample ranges of at most max_samples.
+    Each cut is placed in the quietest 20 ms frame of the last search_samples before the limit,
+    so chunk boundaries fall in pauses instead of in the middle of words.
+    """
+    ranges = []
+    start = 0
+    while len(audio) - start > max_samples:
+        limit = start + max_samples
+        cut = quietest_point(audio, max(start + frame_samples, limit - search_samples), limit, frame_samples)
+        ranges.append((start, cut))
+        start = cut
+    ranges.append((start, len(audio)))
+    return ranges
+
+def iter_audio_windows(path: str, window_seconds: float, search_seconds: float = 5.0) -> Iterator[Tuple[float, np.ndarray]]:
+    """
+    Streams a media file through ffmpeg as 16 kHz mono float32 and yields (offset in seconds, window)
+    pairs of about window_seconds, each cut at the quietest point of its last search_seconds.
+    Only one window is in memory at a time, whatever the length of the file.
+    """
+    import ffmpeg
+    window_samples = int(window_seconds * SAMPLE_RATE)
+    search_samples = int(search_seconds * SAMPLE_RATE)
+    process = (
+        ffmpeg.input(path)
+        .output("pipe:", format="f32le", acodec="pcm_f32le", ac=1, ar=SAMPLE_RATE)
+        .global_args("-loglevel", "error")
+        .run_async(pipe_stdout=True)
+    )
+    offset = 0
+    carry = np.zeros(0, dtype=np.float32)
+    finished = False
+    try:
+        while True:
+            data = process.stdout.read((window_samples - len(carry)) * 4)
+            chunk = np.frombuffer(data[:len(data) // 4 * 4], dtype=np.float32)
+            buffer = np.concatenate([carry, chunk]) if len(carry) else chunk
+            if len(buffer) < window_samples:
+                # End of stream
+                if len(buffer):
+                    yield offset / SAMPLE_RATE, buffer
+                finished = True
+                break
+            cut = quietest_point(buffer, len(buffer) - search_samples, len(buffer))
+            yield offset / SAMPLE_RATE, buffer[:cut]
+            carry = buffer[cut:].copy()
+            offset += cut
+    finally:
+        process.stdout.close()
+        if not finished and process.poll() is None:
+            # The consumer stopped early
+            process.kill()
+        process.wait()
+    if process.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed to decode {path} (exit code {process.returncode})")
+
+def encode_flac(audio: np.ndarray, name: str = "audio.flac") -> io.BytesIO:
+    """
+    Encodes a 16 kHz mono buffer as 16-bit FLAC in memory, about a third of the WAV size.
+    """
+    buffer = io.BytesIO()
+    sf.write(buffer, audio, SAMPLE_RATE, format="FLAC", subtype="PCM_16")
+    buffer.name = name
+    buffer.seek(0)
+    return buffer
+
+def transcode(path: str, out_path: str, codec: str = "flac") -> None:
+    """
+    Re-encodes any media file ffmpeg can read to 16 kHz mono audio, dropping video streams.
+    flac is lossless for what Whisper hears, opus (in ogg) is several times smaller still.
+    """
+    import ffmpeg
+    options = {"ac": 1, "ar": SAMPLE_RATE, "vn": None, "format": "flac" if codec == "flac" else "ogg"}
+    if codec == "flac":
+        options.update(acodec="flac", sample_fmt="s16")
+    else:
+        options.update(acodec="libopus", audio_bitrate="32k")
+    try:
+        ffmpeg.input(path).output(out_path, **options).overwrite_output().run(quiet=True)
+    except ffmpeg.Error as e:
+        raise RuntimeError(f"ffmpeg failed to encode {path}: {e.stderr.decode(errors='ignore')[-500:]}") from e
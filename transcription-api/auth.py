@@ -0,0 +1,176 @@
+import os
+import hmac
+import json
+import time
+import base64
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class AuthenticatedUser:
+    """
+    User built from a locally verified JWT, exposes the same id attribute as the Supabase user.
+    """
+    def __init__(self, claims: Dict):
+        self.id = claims["sub"]
+        self.email = claims.get("email")
+        self.role = claims.get("role")
+        self.claims = claims
+
+def _b64decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+def decode_segment(segment: str) -> Optional[Dict]:
+    try:
+        value = json.loads(_b64decode(segment))
+    except (ValueError, UnicodeDecodeError):
+        return None
+    return value if isinstance(value, dict) else None
+
+def decode_claims(token: str) -> Optional[Dict]:
+    # Claims without checking the signature, only used for the expiry
+    parts = token.split(".")
+    if len(parts) != 3:
+        return None
+    return decode_segment(parts[1])
+
+def verify_hs256(token: str, secret: str) -> Optional[Dict]:
+    """
+    Returns the claims of an HS256 token signed with secret, None if the signature doesn't match.
+    """
+    parts = token.split(".")
+    if len(parts) != 3:
+        return None
+    header, payload, signature = parts
+    expected = hmac.new(secret.encode(), f"{header}.{payload}".encode(), hashlib.sha256).digest()
+    try:
+        if not hmac.compare_digest(expected, _b64decode(signature)):
+            return None
+    except ValueError:
+        return None
+    return decode_segment(payload)
+
+def claims_valid(claims: Dict, audience: str, now: float) -> bool:
+    """
+    Whether locally verified claims are usable: a user, an exp in the future, any nbf in the past
+    and audience among the aud values.
+    """
+    exp = claims.get("exp")
+    nbf = claims.get("nbf")
+    aud = claims.get("aud")
+    if "sub" not in claims or not isinstance(exp, (int, float)) or exp <= now:
+        return False
+    if nbf is not None and (not isinstance(nbf, (int, float)) or nbf > now):
+        return False
+    return audience == aud or (isinstance(aud, list) and audience in aud)
+
+class TokenCache:
+    """
+    Bounded LRU of validated tokens, each entry expiring at the earlier of its TTL and the JWT exp.
+    Keys are token hashes so the raw tokens don't sit in the cache.
+    """
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[object, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str):
+        key = self.key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= time.time():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, token: str, user, exp: Optional[float] = None) -> None:
+        expires_at = time.time() + self.ttl
+        if exp is not None:
+            expires_at = min(expires_at, exp)
+        if not self.max_entries or expires_at <= time.time():
+            return
+        key = self.key(token)
+        with self._lock:
+            self._entries[key] = (user, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+class TokenValidator:
+    """
+    Resolves bearer tokens to users. Cached tokens cost nothing, HS256 tokens are verified locally
+    when the project's JWT secret is configured, anything else is checked with fetch_user
+    (a blocking Supabase call) in a worker thread. A revoked session stays valid until its entry expires.
+    Locally verified tokens must carry exp and the audience, and be past their nbf.
+    """
+    def __init__(self, fetch_user: Callable[[str], object], secret: Optional[str] = None, ttl: float = 300, max_entries: int = 10000,
+                 audience: str = "authenticated"):
+        self.fetch_user = fetch_user
+        self.secret = secret
+        self.audience = audience
+        self.cache = TokenCache(max_entries, ttl)
+        # Concurrent requests with the same new token share one lookup
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def validate(self, token: str):
+        user = self.cache.get(token)
+        if user is not None:
+            return user
+
+        claims = decode_claims(token)
+        exp = claims.get("exp") if claims else None
+        if isinstance(exp, (int, float)) and exp <= time.time():
+            # Expired tokens are rejected without asking Supabase
+            return None
+
+        if self.secret and claims and (decode_segment(token.split(".")[0]) or {}).get("alg") == "HS256":
+            verified = verify_hs256(token, self.secret)
+            if verified is None or not claims_valid(verified, self.audience, time.time()):
+                return None
+            user = AuthenticatedUser(verified)
+            self.cache.put(token, user, exp)
+            return user
+
+        key = TokenCache.key(token)
+        if key in self._inflight:
+            return await asyncio.shield(self._inflight[key])
+
+        future = asyncio.ensure_future(asyncio.to_thread(self.fetch_user, token))
+        self._inflight[key] = future
+        try:
+            user = await asyncio.shield(future)
+        finally:
+            self._inflight.pop(key, None)
+        if user is not None:
+            self.cache.put(token, user, exp)
+        return user
+
+
+def create_token_validator(fetch_user: Callable[[str], object]) -> TokenValidator:
+    return TokenValidator(
+        fetch_user,
+        secret=os.environ.get("SUPABASE_JWT_SECRET") or None,
+        ttl=float(os.environ.get("AUTH_CACHE_TTL", 300)),
+        max_entries=int(os.environ.get("AUTH_CACHE_SIZE", 10000)),
+        audience=os.environ.get("SUPABASE_JWT_AUDIENCE", "authenticated"),
+    )
@@ -1,4 +1,4 @@
-from typing import Any, Mapping, TypedDict, Union, List
+from typing import Any, Callable, Mapping, NotRequired, Optional, TypedDict, Union, List
 import numpy as np
 from faster_whisper.audio import decode_audio  # type: ignore
 
@@ -31,6 +31,8 @@ Transcription = TypedDict(
         "duration": float,
         "processing_duration": float,
         "segments": list[Segment],
+        # Set when diarization or its refinement failed and the result was returned without it
+        "degraded": NotRequired[bool],
     },
 )
 
@@ -63,5 +65,8 @@ class Backend:
                   language: str = None, 
                   task: str = "transcribe",
                   diarize: bool = False,
-                  num_speakers: int = None) -> Transcription:
+                  num_speakers: int = None,
+                  progress_callback: Optional[Callable[[float], None]] = None,
+                  batch_size: Optional[int] = None,
+                  content_hash: Optional[str] = None) -> Transcription:
         raise NotImplementedError()
\ No newline at end of file
@@ -1,10 +1,21 @@
 import numpy as np
 from .backend import Backend, Transcription, Segment
-import os, math
+from .registry import model_registry, directory_size
+from audio import SAMPLE_RATE, iter_audio_windows, media_duration
+import os, math, bisect
 from tqdm import tqdm  # type: ignore
 import uuid
-from faster_whisper import WhisperModel, download_model, decode_audio
-from typing import Optional
+from faster_whisper import WhisperModel, BatchedInferencePipeline, download_model, decode_audio
+from typing import Any, Callable, Iterator, Optional, Tuple
+
+# Default batch size for batched (VAD-chunked) decoding, 0 keeps sequential decoding
+DEFAULT_BATCH_SIZE = int(os.environ.get("WHISPER_BATCH_SIZE", 0))
+# Window length of the windowed mode for long recordings
+DEFAULT_WINDOW_SECONDS = float(os.environ.get("LONG_AUDIO_WINDOW_SECONDS", 600))
+# Characters of the previous window's text passed as prompt to the next one
+PROMPT_CHARS = 200
+# Silence between packed clips
+CLIP_GAP_SAMPLES = SAMPLE_RATE // 2
 
 class FasterWhisperBackend(Backend):
     device: str = "cpu"  # cpu, cuda
@@ -26,14 +37,25 @@ class FasterWhisperBackend(Backend):
         else:
             raise RuntimeError(f"model not found in {local_model_path}")
         
-    def load(self) -> None:
+    def registry_key(self) -> tuple:
         # Get CPU threads env variable or default to 4
         cpu_threads = int(os.environ.get("CPU_THREADS", 4))
-        self.model = WhisperModel(
-            self.model_path(), device=self.device, compute_type=self.quantization, cpu_threads=cpu_threads
+        return (self.model_size, self.device, self.quantization, cpu_threads)
+
+    def load(self) -> None:
+        # Loaded models are shared across requests through the process-wide registry
+        model_size, device, quantization, cpu_threads = key = self.registry_key()
+        path = self.model_path()
+        self.model = model_registry.get_or_load(
+            key,
+            lambda: WhisperModel(path, device=device, compute_type=quantization, cpu_threads=cpu_threads),
+            size_bytes=directory_size(path),
         )
 
     def get_model(self) -> None:
+        # Skip the download check entirely if the model is already resident
+        if model_registry.contains(self.registry_key()):
+            return
         print(f"Downloading model {self.model_size}...")
         local_model_path = os.path.join(os.environ["WHISPER_MODELS_DIR"], f"faster-whisper-{self.model_size}")
         local_model_cache = os.path.join(os.environ["WHISPER_MODELS_DIR"], f"faster-whisper-{self.model_size}", "cache")
@@ -46,6 +68,97 @@ class FasterWhisperBackend(Backend):
         except:
             download_model(self.model_size, output_dir=local_model_path, local_files_only=False, cache_dir=local_model_cache)
 
+    def iter_segments(
+        self,
+        input: np.ndarray,
+        language: str = None,
+        task: str = "transcribe",
+        batch_size: Optional[int] = None,
+        initial_prompt: Optional[str] = None,
+        offset: float = 0.0
+    ) -> Tuple[Iterator[Segment], Any]:
+        """
+        Lazily decode the audio, yielding each Segment (with words) as soon as it is produced.
+        Returns the segment generator and the faster-whisper TranscriptionInfo.
+        With batch_size > 0 the audio is split into speech chunks by VAD and decoded in batches.
+        offset (seconds) is added to every timestamp, for audio that is a window of a longer file.
+        """
+        assert self.model is not None
+        if batch_size is None:
+            batch_size = DEFAULT_BATCH_SIZE
+
+        if batch_size > 0:
+            pipeline = BatchedInferencePipeline(model=self.model)
+            segments, info = pipeline.transcribe(
+                input,
+                batch_size=batch_size,
+                beam_size=5,
+                word_timestamps=True,
+                language=language,
+                task=task,
+                vad_filter=True,
+                initial_prompt=initial_prompt
+            )
+        else:
+            segments, info = self.model.transcribe(
+                input,
+                beam_size=5,
+                word_timestamps=True,
+                language=language,
+                task=task,
+                initial_prompt=initial_prompt
+            )
+
+        def generate() -> Iterator[Segment]:
+            for segment in segments:
+                if segment.words is None:
+                    continue
+                yield to_segment(segment, offset)
+
+        return generate(), info
+
+    def transcribe_clips(
+        self,
+        clips: list[np.ndarray],
+        language: str,
+        task: str = "transcribe",
+        batch_size: Optional[int] = None
+    ) -> list[Transcription]:
+        """
+        Transcribes many short clips (up to 30 s each) together: they are packed into one buffer and
+        fed to the encoder as batched chunks through BatchedInferencePipeline instead of one decode
+        per clip. The language must be known, it is not detected per clip.
+        Returns one transcription per clip, in order.
+        """
+        assert self.model is not None
+        gap = np.zeros(CLIP_GAP_SAMPLES, dtype=np.float32)
+        parts, bounds, position = [], [], 0
+        for clip in clips:
+            parts.extend([clip, gap])
+            bounds.append((position, position + len(clip)))
+            position += len(clip) + len(gap)
+
+        pipeline = BatchedInferencePipeline(model=self.model)
+        segments, _ = pipeline.transcribe(
+            np.concatenate(parts).astype(np.float32),
+            batch_size=batch_size or DEFAULT_BATCH_SIZE or 16,
+            beam_size=5,
+            word_timestamps=True,
+            language=language,
+            task=task,
+            vad_filter=False,
+            # Sample ranges of the clips, used instead of VAD to cut the chunks
+            clip_timestamps=[{"start": start, "end": end} for start, end in bounds]
+        )
+        decoded = [to_segment(segment) for segment in segments if segment.words is not None]
+
+        starts = [start / SAMPLE_RATE for start, _ in bounds]
+        per_clip = split_by_clip(decoded, starts)
+        return [
+            build_transcription(clip_segments, language, len(clip) / SAMPLE_RATE)
+            for clip, clip_segments in zip(clips, per_clip)
+        ]
+
     def transcribe(
         self, 
         input: np.ndarray, 
@@ -53,55 +166,123 @@ class FasterWhisperBackend(Backend):
         language: str = None, 
         task: str = "transcribe",
         diarize: bool = False,
-        num_speakers: int = None
+        num_speakers: int = None,
+        progress_callback: Optional[Callable[[float], None]] = None,
+        batch_size: Optional[int] = None,
+        content_hash: Optional[str] = None
     ) -> Transcription:
         """
         Return word level transcription data.
         World level probabities are calculated by ctranslate2.models.Whisper.align
+        progress_callback, if given, receives the decoded fraction (0-1) after each segment.
+        batch_size enables batched decoding, defaults to WHISPER_BATCH_SIZE.
         """
         result: list[Segment] = []
-        assert self.model is not None
-        segments, info = self.model.transcribe(
-            input,
-            beam_size=5,
-            word_timestamps=True,
-            language=language,
-            task=task
-        )
+        segments, info = self.iter_segments(input, language=language, task=task, batch_size=batch_size)
         # ps = playback seconds
         with tqdm(
             total=info.duration, unit_scale=True, unit="ps", disable=silent
         ) as pbar:
             for segment in segments:
-                if segment.words is None:
-                    continue
-                id = uuid.uuid4().hex
-                segment_extract: Segment = {
-                    "id": id,
-                    "text": segment.text,
-                    "start": segment.start,
-                    "end": segment.end,
-                    "score": round(math.exp(segment.avg_logprob), 2),
-                    "words": [
-                        {
-                            "start": w.start,
-                            "end": w.end,
-                            "word": w.word,
-                            "score": round(w.probability, 2),
-                        }
-                        for w in segment.words
-                    ],
-                }
-                result.append(segment_extract)
+                result.append(segment)
                 if not silent:
-                    pbar.update(segment.end - pbar.last_print_n)
+                    pbar.update(segment["end"] - pbar.last_print_n)
+                if progress_callback and info.duration:
+                    progress_callback(min(1.0, segment["end"] / info.duration))
         
-        text = " ".join([segment["text"] for segment in result])
-        text = ' '.join(text.strip().split())
-        transcription: Transcription = {
-            "text": text,
-            "language": info.language,
-            "duration": info.duration,
-            "segments": result,
-        }
-        return transcription
\ No newline at end of file
+        return build_transcription(result, info.language, info.duration)
+
+    def transcribe_windowed(
+        self,
+        path: str,
+        language: str = None,
+        task: str = "transcribe",
+        window_seconds: float = DEFAULT_WINDOW_SECONDS,
+        progress_callback: Optional[Callable[[float], None]] = None,
+        batch_size: Optional[int] = None
+    ) -> Transcription:
+        """
+        Transcription of long recordings without decoding them whole. The file is decoded by a streaming
+        ffmpeg process one window at a time, and each window is prompted with the end of the previous
+        window's text. Only the decoded audio is bounded by the window, the segments of the whole
+        recording are collected in memory for the response.
+        """
+        duration = media_duration(path)
+        prompt = None
+        end = 0.0
+        result: list[Segment] = []
+        for offset, window in iter_audio_windows(path, window_seconds):
+            segments, info = self.iter_segments(window, language=language, task=task, batch_size=batch_size, initial_prompt=prompt, offset=offset)
+            texts = []
+            for segment in segments:
+                result.append(segment)
+                texts.append(segment["text"])
+                if progress_callback and duration:
+                    progress_callback(min(1.0, segment["end"] / duration))
+            # Later windows keep the language detected on the first one
+            language = language or info.language
+            text = " ".join(" ".join(texts).split())
+            if text:
+                prompt = text[-PROMPT_CHARS:]
+            end = offset + info.duration
+
+        return build_transcription(result, language, duration or end)
+
+
+def to_segment(segment, offset: float = 0.0) -> Segment:
+    return {
+        "id": uuid.uuid4().hex,
+        "text": segment.text,
+        "start": segment.start + offset,
+        "end": segment.end + offset,
+        "score": round(math.exp(segment.avg_logprob), 2),
+        "words": [
+            {
+                "start": w.start + offset,
+                "end": w.end + offset,
+                "word": w.word,
+                "score": round(w.probability, 2),
+            }
+            for w in segment.words
+        ],
+    }
+
+def split_by_clip(segments: list[Segment], starts: list[float]) -> list[list[Segment]]:
+    """
+    Distributes segments decoded from packed clips back to the clips, given each clip's start time
+    in the packed buffer. Words are assigned by their start, a segment spanning two clips is split,
+    and timestamps are made relative to the clip.
+    """
+    per_clip: list[list[Segment]] = [[] for _ in starts]
+    for segment in segments:
+        groups: dict[int, list] = {}
+        if not segment["words"]:
+            groups[max(0, bisect.bisect_right(starts, segment["start"]) - 1)] = []
+        for word in segment["words"]:
+            groups.setdefault(max(0, bisect.bisect_right(starts, word["start"]) - 1), []).append(word)
+        for index, words in groups.items():
+            offset = starts[index]
+            shifted = [{**w, "start": w["start"] - offset, "end": w["end"] - offset} for w in words]
+            if not shifted:
+                per_clip[index].append({**segment, "start": segment["start"] - offset, "end": segment["end"] - offset})
+                continue
+            per_clip[index].append({
+                **segment,
+                "id": segment["id"] if len(groups) == 1 else uuid.uuid4().hex,
+                "text": segment["text"] if len(groups) == 1 else "".join(w["word"] for w in words),
+                "start": segment["start"] - offset if len(groups) == 1 else shifted[0]["start"],
+                "end": segment["end"] - offset if len(groups) == 1 else shifted[-1]["end"],
+                "words": shifted,
+            })
+    return per_clip
+
+def build_transcription(segments: list[Segment], language: str, duration: float) -> Transcription:
+    text = " ".join([segment["text"] for segment in segments])
+    text = ' '.join(text.strip().split())
+    transcription: Transcription = {
+        "text": text,
+        "language": language,
+        "duration": duration,
+        "segments": segments,
+    }
+    return transcription
@@ -4,21 +4,31 @@ import logging
 import io
 import math
 import uuid
+import threading
 import soundfile as sf
 import numpy as np
-from typing import Union, Optional
-from groq import Groq, RateLimitError, InternalServerError, APIConnectionError
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Union, Optional
+import groq_client
+import metrics
 from .backend import Backend, Transcription, Segment, WordData
 from processors.diarizer import LlamaDiarizer
+from audio import SAMPLE_RATE, convert_audio, encode_flac, media_duration, split_on_silence
+from cache import encoded_audio_cache
 
 logger = logging.getLogger(__name__)
 
+# Uploads above this size are rejected by the API
+MAX_UPLOAD_BYTES = int(os.environ.get("GROQ_MAX_UPLOAD_MB", 25)) * 1024 * 1024
+# Longer recordings are split at silences and the chunks transcribed in parallel
+CHUNK_SECONDS = int(os.environ.get("GROQ_CHUNK_SECONDS", 600))
+CHUNK_CONCURRENCY = int(os.environ.get("GROQ_CHUNK_CONCURRENCY", 4))
+
 class GroqBackend(Backend):
     name: str = "groq"
     
     def __init__(self, model_size: str, device: str = "cpu"):
         self.model_size = model_size
-        self.client = Groq(api_key=os.environ.get("GROQ_API_KEY"))
 
     def supported_model_sizes(self) -> list[str]:
         return ["distil-whisper-large-v3-en", "whisper-large-v3", "whisper-large-v3-turbo"]
@@ -34,70 +44,128 @@ class GroqBackend(Backend):
                   language: Optional[str] = None, 
                   task: str = "transcribe",
                   diarize: bool = False,
-                  num_speakers: Optional[int] = None) -> Transcription:
+                  num_speakers: Optional[int] = None,
+                  progress_callback: Optional[Callable[[float], None]] = None,
+                  batch_size: Optional[int] = None,
+                  content_hash: Optional[str] = None) -> Transcription:
         """
         Transcribes audio using Groq API with robust retry logic and word-level timestamps.
+        Recordings over the upload limit or longer than GROQ_CHUNK_SECONDS are split at silences
+        and the chunks transcribed concurrently.
+        content_hash, the SHA-256 of input_data when it is a file, saves hashing it again.
         """
-        
-        # Determine source: if string, it's a path; if ndarray, we need to buffer it.
-        if isinstance(input_data, str):
-            audio_file = open(input_data, "rb")
+        if isinstance(input_data, str) and encoded_audio_cache is not None:
+            input_data = self._pre_encode(input_data, content_hash)
+
+        if self._needs_chunking(input_data):
+            audio = convert_audio(input_data) if isinstance(input_data, str) else input_data
+            result = self._transcribe_chunks(audio, language, task, progress_callback)
         else:
-            buffer = io.BytesIO()
-            # Standard Whisper sample rate is 16kHz
-            sf.write(buffer, input_data, 16000, format='WAV', subtype='PCM_16')
-            buffer.name = "audio.wav"
-            buffer.seek(0)
-            audio_file = buffer
+            # Determine source: if string, it's a path; if ndarray, we need to buffer it.
+            if isinstance(input_data, str):
+                audio_file = open(input_data, "rb")
+            else:
+                buffer = io.BytesIO()
+                # Standard Whisper sample rate is 16kHz
+                sf.write(buffer, input_data, 16000, format='WAV', subtype='PCM_16')
+                buffer.name = "audio.wav"
+                buffer.seek(0)
+                audio_file = buffer
+
+            try:
+                completion = self._request(audio_file, language, task)
+            finally:
+                audio_file.close()
+            result = self._to_transcription(completion, language)
+
+        if diarize:
+            diarizer = LlamaDiarizer(api_key=os.environ.get("GROQ_API_KEY"))
+            # We are running inside a thread (run_inference) and LlamaDiarizer.diarize is async,
+            # it runs on the client's long-lived loop so its connection pool is reused
+            try:
+                with metrics.stage("diarization"):
+                    result["segments"] = groq_client.run(diarizer.diarize(result["segments"], num_speakers))
+            except Exception as e:
+                logger.error(f"Diarization failed: {e}")
+                result["degraded"] = True
+
+        # Single requests return the whole transcription at once
+        if progress_callback:
+            progress_callback(1.0)
+        return result
+
+    def _pre_encode(self, path: str, content_hash: Optional[str] = None) -> str:
+        # Uploading 16 kHz mono instead of the original media (often video or 48 kHz) is what
+        # dominates latency, the encoded copy is cached by content hash
+        try:
+            start_time = time.time()
+            encoded = encoded_audio_cache.get_or_encode(path, content_hash)
+            logger.info(f"Pre-encoded {os.path.getsize(path)} -> {os.path.getsize(encoded)} bytes in {time.time() - start_time:.2f}s")
+            return encoded
+        except Exception as e:
+            logger.warning(f"Pre-encoding failed, uploading the original file: {e}")
+            return path
+
+    def _needs_chunking(self, input_data: Union[np.ndarray, str]) -> bool:
+        if isinstance(input_data, str):
+            if os.path.getsize(input_data) > MAX_UPLOAD_BYTES:
+                return True
+            duration = media_duration(input_data)
+            return duration is not None and duration > CHUNK_SECONDS
+        return len(input_data) > CHUNK_SECONDS * SAMPLE_RATE
+
+    def _transcribe_chunks(self, audio: np.ndarray,
+                           language: Optional[str],
+                           task: str,
+                           progress_callback: Optional[Callable[[float], None]]) -> Transcription:
+        ranges = split_on_silence(audio, CHUNK_SECONDS * SAMPLE_RATE)
+        logger.info(f"Splitting {len(audio) / SAMPLE_RATE:.0f}s of audio into {len(ranges)} chunks for Groq")
+
+        lock = threading.Lock()
+        finished = [0]
 
+        def run(index: int, start: int, end: int) -> Transcription:
+            # Chunks are encoded lazily so only the in-flight ones are held in memory
+            audio_file = encode_flac(audio[start:end], name=f"chunk{index}.flac")
+            completion = self._request(audio_file, language, task)
+            if progress_callback:
+                with lock:
+                    finished[0] += 1
+                    progress_callback(finished[0] / len(ranges))
+            return self._to_transcription(completion, language, offset=start / SAMPLE_RATE)
+
+        with ThreadPoolExecutor(max_workers=max(1, min(CHUNK_CONCURRENCY, len(ranges)))) as pool:
+            parts = list(pool.map(lambda args: run(*args), [(i, start, end) for i, (start, end) in enumerate(ranges)]))
+
+        return stitch_transcriptions(parts, len(audio) / SAMPLE_RATE)
+
+    def _request(self, audio_file, language: Optional[str], task: str):
         params = {
             "file": audio_file,
             "model": self.model_size,
             "response_format": "verbose_json",
             "timestamp_granularities": ["word", "segment"],
         }
-        
+
         if language and language != "auto" and task == "transcribe":
             params["language"] = language
 
-        # Robust Retry mechanism with exponential backoff (CTO-level reliability)
-        max_retries = 5
-        backoff_factor = 2
-        
-        for attempt in range(max_retries):
-            try:
-                if task == "translate":
-                    completion = self.client.audio.translations.create(**params)
-                else:
-                    completion = self.client.audio.transcriptions.create(**params)
-                break # Success!
-            except (RateLimitError, InternalServerError, APIConnectionError) as e:
-                if attempt == max_retries - 1:
-                    logger.error(f"Groq API failed after {max_retries} attempts: {e}")
-                    raise
-                
-                wait_time = backoff_factor ** attempt
-                logger.warning(f"Groq API error (attempt {attempt+1}/{max_retries}): {e}. Retrying in {wait_time}s...")
-                time.sleep(wait_time)
-                audio_file.seek(0) # Reset file pointer for retry
-            finally:
-                # If we opened a file from path, we don't close it yet as we might retry.
-                # But it will be closed at the end of function.
-                pass
-
-        if isinstance(input_data, str):
-            audio_file.close()
+        # Retries, backoff and rate limiting are shared with every other Groq caller in the process
+        endpoint = "audio.translations" if task == "translate" else "audio.transcriptions"
+        return groq_client.create(endpoint, **params)
 
-        # Map Groq/OpenAI-compatible response to our internal Transcription format
+    def _to_transcription(self, completion, language: Optional[str], offset: float = 0.0) -> Transcription:
+        # Map Groq/OpenAI-compatible response to our internal Transcription format.
+        # offset shifts the timestamps of a chunk back to the position in the full recording.
         segments: list[Segment] = []
-        
-        # Get segments from completion. 
+
+        # Get segments from completion.
         # completion is typically a VerboseJsonResponse object
         raw_segments = getattr(completion, 'segments', [])
-        
+
         for seg in raw_segments:
             seg_dict = seg if isinstance(seg, dict) else seg.__dict__
-            
+
             words_data: list[WordData] = []
             # Check if word-level timestamps were returned
             if 'words' in seg_dict and seg_dict['words']:
@@ -105,21 +173,21 @@ class GroqBackend(Backend):
                     w_dict = w if isinstance(w, dict) else w.__dict__
                     words_data.append({
                         "word": w_dict.get('word', ''),
-                        "start": w_dict.get('start', 0.0),
-                        "end": w_dict.get('end', 0.0),
+                        "start": w_dict.get('start', 0.0) + offset,
+                        "end": w_dict.get('end', 0.0) + offset,
                         "score": 1.0 # Groq doesn't provide word-level scores usually
                     })
-            
+
             segments.append({
                 "id": uuid.uuid4().hex,
                 "text": seg_dict.get('text', ''),
-                "start": seg_dict.get('start', 0.0),
-                "end": seg_dict.get('end', 0.0),
+                "start": seg_dict.get('start', 0.0) + offset,
+                "end": seg_dict.get('end', 0.0) + offset,
                 "score": round(math.exp(seg_dict.get('avg_logprob', 0.0)), 2) if 'avg_logprob' in seg_dict else 0.0,
                 "words": words_data
             })
 
-        result = {
+        return {
             "text": completion.text,
             "language": getattr(completion, 'language', language or 'unknown'),
             "duration": completion.duration,
@@ -127,17 +195,14 @@ class GroqBackend(Backend):
             "processing_duration": 0.0 # Will be set by caller
         }
 
-        if diarize:
-            import asyncio
-            diarizer = LlamaDiarizer(api_key=os.environ.get("GROQ_API_KEY"))
-            # We are running inside a thread (run_inference), so we might need a separate loop or just run sync if possible.
-            # But LlamaDiarizer.diarize is async. Let's make a small helper or run it in a new loop.
-            try:
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                result["segments"] = loop.run_until_complete(diarizer.diarize(result["segments"], num_speakers))
-                loop.close()
-            except Exception as e:
-                logger.error(f"Diarization failed: {e}")
-
-        return result
+def stitch_transcriptions(parts: list[Transcription], duration: float) -> Transcription:
+    """
+    Joins chunk transcriptions (timestamps already offset) in order into one transcription.
+    """
+    return {
+        "text": " ".join(part["text"].strip() for part in parts if part["text"].strip()),
+        "language": parts[0]["language"] if parts else "unknown",
+        "duration": duration,
+        "segments": [segment for part in parts for segment in part["segments"]],
+        "processing_duration": 0.0,
+    }
@@ -0,0 +1,126 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+logger = logging.getLogger(__name__)
+
+class ModelRegistry:
+    """
+    Process-wide cache of loaded models shared by every request.
+    Models stay resident until the memory budget (or model count) is exceeded,
+    then the least recently used ones are evicted.
+    """
+    def __init__(self, max_bytes: int = 0, max_models: int = 0):
+        self.max_bytes = max_bytes  # 0 = unbounded
+        self.max_models = max_models  # 0 = unbounded
+        self._models: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # One lock per key so a model is loaded only once, while different models can load in parallel
+        self._key_locks: Dict[Hashable, threading.Lock] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.evictions = 0
+        self.load_seconds = 0.0
+
+    def contains(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._models
+
+    def get(self, key: Hashable):
+        with self._lock:
+            return self._lookup(key)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any], size_bytes: int = 0):
+        with self._lock:
+            model = self._lookup(key)
+            if model is not None:
+                return model
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            # Another request may have finished loading while we were waiting
+            with self._lock:
+                model = self._lookup(key)
+                if model is not None:
+                    return model
+                self.misses += 1
+
+            start = time.perf_counter()
+            model = loader()
+            elapsed = time.perf_counter() - start
+            logger.info(f"Loaded model {key} in {elapsed:.2f}s")
+
+            with self._lock:
+                self.loads += 1
+                self.load_seconds += elapsed
+                self._models[key] = (model, size_bytes)
+                self._evict(keep=key)
+        return model
+
+    def clear(self) -> None:
+        with self._lock:
+            self._models.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "models": [list(k) if isinstance(k, tuple) else k for k in self._models],
+                "resident_bytes": sum(size for _, size in self._models.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "load_seconds": round(self.load_seconds, 3),
+            }
+
+    def _lookup(self, key: Hashable):
+        # Caller must hold self._lock
+        entry = self._models.get(key)
+        if entry is None:
+            return None
+        self._models.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def _evict(self, keep: Hashable) -> None:
+        # Caller must hold self._lock. Never evict the model that was just loaded.
+        def over_budget():
+            if self.max_models and len(self._models) > self.max_models:
+                return True
+            if self.max_bytes and sum(size for _, size in self._models.values()) > self.max_bytes:
+                return True
+            return False
+
+        while over_budget() and len(self._models) > 1:
+            oldest = next(iter(self._models))
+            if oldest == keep:
+                self._models.move_to_end(keep)
+                oldest = next(iter(self._models))
+            self._models.pop(oldest)
+            self.evictions += 1
+            logger.info(f"Evicted model {oldest} from registry")
+
+
+def directory_size(path: str) -> int:
+    """
+    Approximates the memory footprint of a model by its size on disk.
+    Only top-level files are counted, the download cache lives in a subdirectory.
+    """
+    total = 0
+    for name in os.listdir(path):
+        file_path = os.path.join(path, name)
+        if os.path.isfile(file_path):
+            total += os.path.getsize(file_path)
+    return total
+
+
+model_registry = ModelRegistry(
+    max_bytes=int(os.environ.get("WHISPER_MODEL_CACHE_MB", 0)) * 1024 * 1024,
+    max_models=int(os.environ.get("WHISPER_MODEL_CACHE_SIZE", 0)),
+)
@@ -0,0 +1,96 @@
+"""
+Benchmark for PyannoteDiarizer.assign_speakers_to_segments on synthetic multi-hour recordings.
+
+Usage (from transcription-api/):
+    python -m benchmarks.alignment --hours 3
+"""
+import time
+import random
+import argparse
+
+from benchmarks.common import mock_remote_services, mock_if_missing, latency_summary, record, add_output_argument, emit
+
+mock_remote_services()
+mock_if_missing("torch")
+
+from processors.diarizer import PyannoteDiarizer
+
+class SyntheticTurn:
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+
+class SyntheticDiarization:
+    def __init__(self, turns):
+        self.turns = turns
+
+    def itertracks(self, yield_label=True):
+        for start, end, speaker in self.turns:
+            yield SyntheticTurn(start, end), None, speaker
+
+def synthetic_inputs(hours: float, speakers: int, seed: int, long_turn: bool = False):
+    """
+    Speaker turns of 1-15 s (with occasional overlapping speech) and Whisper-like segments
+    of ~12 words at ~2.5 words per second. With long_turn, one more turn spans the whole recording
+    (e.g. background music labelled as a speaker).
+    """
+    rng = random.Random(seed)
+    duration = hours * 3600
+    labels = [f"SPEAKER_{i:02d}" for i in range(speakers)]
+
+    turns = [(0.0, duration, labels[0])] if long_turn else []
+    t = 0.0
+    while t < duration:
+        length = rng.uniform(1, 15)
+        turns.append((t, min(duration, t + length), rng.choice(labels)))
+        if rng.random() < 0.1:
+            # Overlapping speech
+            turns.append((t + length / 2, min(duration, t + length + 1), rng.choice(labels)))
+        t += length + rng.uniform(0, 0.5)
+
+    segments = []
+    t = 0.0
+    while t < duration:
+        words = []
+        for _ in range(12):
+            length = rng.uniform(0.2, 0.6)
+            words.append({"start": t, "end": t + length, "word": "word"})
+            t += length
+        segments.append({"start": words[0]["start"], "end": words[-1]["end"], "text": "", "words": words})
+        t += rng.uniform(0, 1)
+    return SyntheticDiarization(turns), segments
+
+def run(hours: float, speakers: int, seed: int, repeat: int = 1, long_turn: bool = False) -> dict:
+    diarization, segments = synthetic_inputs(hours, speakers, seed, long_turn)
+    words = sum(len(s["words"]) for s in segments)
+
+    diarizer = PyannoteDiarizer(auth_token="benchmark")
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        diarizer.assign_speakers_to_segments(segments, diarization)
+        timings.append(time.perf_counter() - start)
+    elapsed = min(timings)
+
+    return record(
+        "alignment",
+        hours=hours,
+        long_turn=long_turn,
+        turns=len(diarization.turns),
+        segments=len(segments),
+        words=words,
+        seconds=round(elapsed, 4),
+        words_per_second=round(words / elapsed) if elapsed else None,
+        latency=latency_summary(timings),
+    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hours", type=float, default=3.0)
+    parser.add_argument("--speakers", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--long-turn", action="store_true", help="add one turn spanning the whole recording")
+    add_output_argument(parser)
+    args = parser.parse_args()
+    emit(run(args.hours, args.speakers, args.seed, args.repeat, args.long_turn), args.output)
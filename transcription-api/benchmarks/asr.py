@@ -0,0 +1,76 @@
+"""
+Benchmark for FasterWhisperBackend on synthetic speech-like audio, reporting the real-time factor.
+Runs offline against models already in WHISPER_MODELS_DIR unless --allow-download is given.
+
+Usage (from transcription-api/):
+    WHISPER_MODELS_DIR=/models python -m benchmarks.asr --model tiny --seconds 120 --repeat 3
+"""
+import os
+import time
+import argparse
+
+from benchmarks.common import mock_remote_services, latency_summary, percentile, record, add_output_argument, emit
+
+mock_remote_services()
+
+SAMPLE_RATE = 16000
+
+def synthetic_audio(seconds: float, seed: int = 0):
+    """
+    Harmonics of a drifting pitch, gated into ~4 Hz syllables with a pause every few seconds,
+    over a low noise floor. Not intelligible, but it exercises VAD and the decoder like speech does.
+    """
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    pitch = 120 + 30 * np.sin(2 * np.pi * 0.3 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / SAMPLE_RATE
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 6))
+    syllables = np.sin(2 * np.pi * 4 * t) > -0.2
+    pauses = np.sin(2 * np.pi * t / 7 + rng.uniform(0, 2 * np.pi)) > -0.8
+    audio = 0.2 * voiced * syllables * pauses + 0.005 * rng.standard_normal(len(t))
+    return audio.astype(np.float32)
+
+def run(model: str, seconds: float, repeat: int, device: str = "cpu", batch_size: int = 0, seed: int = 0) -> dict:
+    from backends.fasterwhisper import FasterWhisperBackend
+
+    backend = FasterWhisperBackend(model_size=model, device=device)
+    start = time.perf_counter()
+    backend.get_model()
+    backend.load()
+    load_seconds = time.perf_counter() - start
+
+    audio = synthetic_audio(seconds, seed)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = backend.transcribe(audio, silent=True, language="en", batch_size=batch_size)
+        timings.append(time.perf_counter() - start)
+
+    rtf = [t / seconds for t in timings]
+    return record(
+        "asr",
+        model=model,
+        device=device,
+        batch_size=batch_size,
+        audio_seconds=seconds,
+        load_seconds=round(load_seconds, 3),
+        segments=len(result["segments"]),
+        rtf={"best": round(min(rtf), 4), "p50": round(percentile(rtf, 50), 4), "p95": round(percentile(rtf, 95), 4)},
+        latency=latency_summary(timings),
+    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="tiny")
+    parser.add_argument("--seconds", type=float, default=120.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--batch-size", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--allow-download", action="store_true", help="fetch the model if it isn't cached")
+    add_output_argument(parser)
+    args = parser.parse_args()
+    if not args.allow_download:
+        os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    emit(run(args.model, args.seconds, args.repeat, args.device, args.batch_size, args.seed), args.output)
@@ -0,0 +1,68 @@
+"""
+Helpers shared by the benchmarks: offline mocks for remote services, latency statistics,
+peak memory and JSON output.
+"""
+import sys
+import json
+import time
+import platform
+import resource
+import argparse
+import importlib
+from typing import Dict, List, Optional
+from unittest.mock import MagicMock
+
+def mock_remote_services() -> None:
+    # Groq, Supabase and S3 are never contacted by the benchmarks
+    for name in ("groq", "supabase", "boto3", "boto3.s3", "boto3.s3.transfer", "botocore", "botocore.config"):
+        sys.modules.setdefault(name, MagicMock())
+
+def mock_if_missing(*names: str) -> None:
+    # Heavy optional dependencies (torch) are only mocked when they aren't installed
+    for name in names:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            sys.modules[name] = MagicMock()
+
+def percentile(values: List[float], q: float) -> float:
+    # Nearest-rank percentile
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+def latency_summary(seconds: List[float]) -> Dict:
+    if not seconds:
+        return {"count": 0}
+    return {
+        "count": len(seconds),
+        "mean": round(sum(seconds) / len(seconds), 4),
+        "p50": round(percentile(seconds, 50), 4),
+        "p95": round(percentile(seconds, 95), 4),
+        "max": round(max(seconds), 4),
+    }
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def record(benchmark: str, **fields) -> Dict:
+    return {
+        "benchmark": benchmark,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        **fields,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+def add_output_argument(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--output", help="append the result as a JSON line to this file")
+
+def emit(result: Dict, output: Optional[str] = None) -> None:
+    line = json.dumps(result)
+    print(line)
+    if output:
+        with open(output, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
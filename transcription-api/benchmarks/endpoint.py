@@ -0,0 +1,95 @@
+"""
+End-to-end benchmark of POST /transcribe/ under concurrency, served in process through the ASGI app.
+Supabase, S3 and Groq are mocked, the result cache is disabled and ASR uses a locally cached model.
+
+Usage (from transcription-api/):
+    WHISPER_MODELS_DIR=/models python -m benchmarks.endpoint --model tiny --requests 20 --concurrency 4
+"""
+import io
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+from collections import Counter
+
+from benchmarks.common import mock_remote_services, mock_if_missing, latency_summary, record, add_output_argument, emit
+
+mock_remote_services()
+mock_if_missing("torch")
+
+def configure(workdir: str) -> None:
+    # Must run before main is imported, it reads its configuration at import time
+    os.environ["UPLOAD_DIR"] = workdir
+    os.environ["JOBS_DIR"] = os.path.join(workdir, ".jobs")
+    os.environ["RESULT_CACHE"] = "false"
+    os.environ.setdefault("SUPABASE_URL", "http://supabase.invalid")
+    os.environ.setdefault("SUPABASE_ANON_KEY", "benchmark")
+    os.environ.pop("S3_BUCKET_NAME", None)
+
+def run(model: str, requests: int, concurrency: int, seconds: float, device: str = "cpu") -> dict:
+    import httpx
+    import soundfile as sf
+    from benchmarks.asr import synthetic_audio, SAMPLE_RATE
+
+    configure(tempfile.mkdtemp(prefix="whishper-bench-"))
+    import main
+
+    buffer = io.BytesIO()
+    sf.write(buffer, synthetic_audio(seconds), SAMPLE_RATE, format="WAV", subtype="PCM_16")
+    wav = buffer.getvalue()
+    params = {"model_size": model, "language": "en", "device": device}
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            async def post():
+                return await client.post("/transcribe/", params=params, files={"file": ("benchmark.wav", wav, "audio/wav")})
+
+            # The first request pays for loading the model
+            warmup = await post()
+            warmup.raise_for_status()
+
+            semaphore = asyncio.Semaphore(concurrency)
+            latencies, statuses = [], Counter()
+
+            async def one():
+                async with semaphore:
+                    start = time.perf_counter()
+                    response = await post()
+                    latencies.append(time.perf_counter() - start)
+                    statuses[response.status_code] += 1
+
+            start = time.perf_counter()
+            await asyncio.gather(*(one() for _ in range(requests)))
+            return time.perf_counter() - start, latencies, statuses
+
+    wall, latencies, statuses = asyncio.run(scenario())
+    return record(
+        "endpoint",
+        model=model,
+        device=device,
+        audio_seconds=seconds,
+        requests=requests,
+        concurrency=concurrency,
+        wall_seconds=round(wall, 3),
+        requests_per_second=round(requests / wall, 3),
+        # Wall-clock seconds per second of audio, across all requests
+        throughput_rtf=round(wall / (requests * seconds), 4),
+        statuses={str(code): count for code, count in sorted(statuses.items())},
+        latency=latency_summary(latencies),
+    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="tiny")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=30.0)
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--allow-download", action="store_true", help="fetch the model if it isn't cached")
+    add_output_argument(parser)
+    args = parser.parse_args()
+    if not args.allow_download:
+        os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    emit(run(args.model, args.requests, args.concurrency, args.seconds, args.device), args.output)
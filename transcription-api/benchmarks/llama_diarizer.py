@@ -0,0 +1,69 @@
+"""
+Benchmark for LlamaDiarizer.diarize against a fake LLM with fixed latency, measuring how well
+batches overlap under LLAMA_DIARIZER_CONCURRENCY.
+
+Usage (from transcription-api/):
+    python -m benchmarks.llama_diarizer --segments 600 --llm-latency 0.5
+"""
+import json
+import time
+import asyncio
+import argparse
+from types import SimpleNamespace
+
+from benchmarks.common import mock_remote_services, mock_if_missing, latency_summary, record, add_output_argument, emit
+
+mock_remote_services()
+mock_if_missing("torch")
+
+import groq_client
+from processors.diarizer import LlamaDiarizer
+
+def fake_llm(latency: float, speakers: int):
+    calls = []
+
+    async def acreate(endpoint, **params):
+        calls.append(time.perf_counter())
+        await asyncio.sleep(latency)
+        current = json.loads(params["messages"][-1]["content"])["current"]
+        labels = {
+            s["id"]: {"speaker": f"Speaker {int(s['id'].split('_')[1]) % speakers + 1}", "role": "Guest"}
+            for s in current
+        }
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps(labels)))])
+
+    return acreate, calls
+
+def run(segments: int, llm_latency: float, speakers: int, repeat: int) -> dict:
+    acreate, calls = fake_llm(llm_latency, speakers)
+    groq_client.acreate = acreate
+    data = [{"id": f"seg_{i}", "text": f"line {i}", "start": i * 4.0, "end": i * 4.0 + 3.5} for i in range(segments)]
+
+    timings = []
+    for _ in range(repeat):
+        calls.clear()
+        # The diarizer's semaphore belongs to the event loop it is first used on
+        diarizer = LlamaDiarizer(api_key="benchmark")
+        start = time.perf_counter()
+        asyncio.run(diarizer.diarize([dict(s) for s in data]))
+        timings.append(time.perf_counter() - start)
+
+    return record(
+        "llama_diarizer",
+        segments=segments,
+        llm_latency=llm_latency,
+        llm_calls=len(calls),
+        # Serial time of the same calls divided by the measured time
+        overlap=round(len(calls) * llm_latency / min(timings), 2),
+        latency=latency_summary(timings),
+    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--segments", type=int, default=600)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--speakers", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=3)
+    add_output_argument(parser)
+    args = parser.parse_args()
+    emit(run(args.segments, args.llm_latency, args.speakers, args.repeat), args.output)
@@ -0,0 +1,38 @@
+"""
+Runs every benchmark in its own process (so peak RSS is per benchmark) and prints one JSON line each.
+The ASR and endpoint benchmarks need a cached model and are skipped without WHISPER_MODELS_DIR.
+
+Usage (from transcription-api/):
+    python -m benchmarks.run --output benchmarks.jsonl
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+from benchmarks.common import add_output_argument, emit, record
+
+def suite(model: str, quick: bool):
+    yield ["benchmarks.alignment", "--hours", "0.5" if quick else "3", "--repeat", "3"]
+    yield ["benchmarks.llama_diarizer", "--segments", "200" if quick else "600", "--llm-latency", "0.5"]
+    if os.environ.get("WHISPER_MODELS_DIR"):
+        yield ["benchmarks.asr", "--model", model, "--seconds", "30" if quick else "120"]
+        yield ["benchmarks.endpoint", "--model", model, "--seconds", "10" if quick else "30", "--requests", "8" if quick else "20"]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="tiny")
+    parser.add_argument("--quick", action="store_true", help="smaller inputs, for a smoke run")
+    add_output_argument(parser)
+    args = parser.parse_args()
+
+    failed = False
+    for command in suite(args.model, args.quick):
+        process = subprocess.run([sys.executable, "-m", *command], capture_output=True, text=True)
+        if process.returncode != 0:
+            failed = True
+            emit(record(command[0].split(".")[-1], error=process.stderr.strip().splitlines()[-1:]), args.output)
+            continue
+        emit(json.loads(process.stdout.strip().splitlines()[-1]), args.output)
+    sys.exit(1 if failed else 0)
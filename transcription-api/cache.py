@@ -0,0 +1,215 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from typing import Optional
+from backends.backend import Transcription
+from storage import hash_file
+
+logger = logging.getLogger(__name__)
+
+def evict_lru(directory: str, max_bytes: int, suffix: str) -> None:
+    # Removes the least recently used files ending in suffix until the directory fits in max_bytes
+    if not max_bytes:
+        return
+    entries = []
+    for name in os.listdir(directory):
+        if not name.endswith(suffix):
+            continue
+        try:
+            stat = os.stat(os.path.join(directory, name))
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, name))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, name in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(os.path.join(directory, name))
+            total -= size
+        except OSError:
+            pass
+
+class ResultCache:
+    """
+    Size-bounded disk cache of finished transcriptions.
+    Entries are keyed by the SHA-256 of the audio plus the options that change the output,
+    and evicted least recently used first. Entries can optionally be mirrored to S3.
+    """
+    def __init__(self, directory: str, max_bytes: int, s3_client=None, bucket: Optional[str] = None, prefix: str = "result-cache/"):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def key(content_hash: str,
+            model_size: str,
+            language: Optional[str],
+            task: str,
+            diarize: bool,
+            num_speakers: Optional[int],
+            batch_size: int = 0,
+            english_model: Optional[str] = None) -> str:
+        # english_model is the .en model detected English is routed to, if any
+        options = [content_hash, model_size, language or "auto", task, bool(diarize), num_speakers, batch_size, english_model]
+        return hashlib.sha256(json.dumps(options).encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Transcription]:
+        path = self._path(key)
+        if not os.path.exists(path) and self.s3_client:
+            self._download(key, path)
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        # Refresh the access time used for LRU eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return result
+
+    def put(self, key: str, result: Transcription) -> None:
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(result, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(f"Failed to write result cache entry {key}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+
+        self._evict()
+        if self.s3_client:
+            # Mirroring to S3 is best effort and must not delay the response
+            threading.Thread(target=self._upload, args=(key, path), daemon=True).start()
+
+    def _evict(self) -> None:
+        with self._lock:
+            evict_lru(self.directory, self.max_bytes, ".json")
+
+    def _upload(self, key: str, path: str) -> None:
+        try:
+            self.s3_client.upload_file(path, self.bucket, f"{self.prefix}{key}.json")
+        except Exception as e:
+            logger.warning(f"Failed to mirror result cache entry {key} to S3: {e}")
+
+    def _download(self, key: str, path: str) -> None:
+        try:
+            self.s3_client.download_file(self.bucket, f"{self.prefix}{key}.json", path)
+        except Exception:
+            # Not in S3 either
+            if os.path.exists(path):
+                os.remove(path)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "max_bytes": self.max_bytes}
+
+
+# File extension of the encoded copies per codec
+CODEC_EXTENSIONS = {"flac": "flac", "opus": "ogg"}
+
+class EncodedAudioCache:
+    """
+    Size-bounded disk cache of uploads re-encoded to compact 16 kHz mono audio for remote APIs.
+    Entries are keyed by the SHA-256 of the original file, so re-submitting the same media skips ffmpeg.
+    """
+    def __init__(self, directory: str, max_bytes: int, codec: str = "flac"):
+        if codec not in CODEC_EXTENSIONS:
+            raise ValueError(f"unsupported codec {codec}")
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.codec = codec
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def get_or_encode(self, path: str, content_hash: Optional[str] = None) -> str:
+        """
+        Returns the path of the encoded copy of path, encoding it on a miss.
+        content_hash is the SHA-256 of path when the caller already has it.
+        """
+        from audio import transcode
+
+        if content_hash is None:
+            content_hash = hash_file(path)
+        encoded_path = os.path.join(self.directory, f"{content_hash}.{CODEC_EXTENSIONS[self.codec]}")
+        if os.path.exists(encoded_path):
+            try:
+                os.utime(encoded_path)
+            except OSError:
+                pass
+            with self._lock:
+                self.hits += 1
+            return encoded_path
+
+        tmp_path = f"{encoded_path}.{threading.get_ident()}.tmp"
+        try:
+            transcode(path, tmp_path, self.codec)
+            os.replace(tmp_path, encoded_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        with self._lock:
+            self.misses += 1
+            evict_lru(self.directory, self.max_bytes, f".{CODEC_EXTENSIONS[self.codec]}")
+        return encoded_path
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "codec": self.codec, "max_bytes": self.max_bytes}
+
+
+def create_result_cache() -> Optional[ResultCache]:
+    if os.environ.get("RESULT_CACHE", "true").lower() != "true":
+        return None
+
+    directory = os.environ.get("RESULT_CACHE_DIR") or os.path.join(os.environ.get("UPLOAD_DIR", "/tmp"), ".result-cache")
+    max_bytes = int(os.environ.get("RESULT_CACHE_MAX_MB", 512)) * 1024 * 1024
+
+    s3_client, bucket = None, None
+    if os.environ.get("RESULT_CACHE_S3", "false").lower() == "true" and os.environ.get("S3_BUCKET_NAME"):
+        from storage import s3_client, BUCKET_NAME as bucket
+
+    return ResultCache(directory, max_bytes, s3_client=s3_client, bucket=bucket)
+
+
+result_cache = create_result_cache()
+
+
+def create_encoded_audio_cache() -> Optional[EncodedAudioCache]:
+    codec = os.environ.get("GROQ_PRE_ENCODE", "flac").lower()
+    if codec in ("off", "false", "none", ""):
+        return None
+
+    directory = os.environ.get("GROQ_ENCODE_CACHE_DIR") or os.path.join(os.environ.get("UPLOAD_DIR", "/tmp"), ".encoded-cache")
+    max_bytes = int(os.environ.get("GROQ_ENCODE_CACHE_MAX_MB", 1024)) * 1024 * 1024
+    return EncodedAudioCache(directory, max_bytes, codec)
+
+
+encoded_audio_cache = create_encoded_audio_cache()
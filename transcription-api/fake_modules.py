@@ -0,0 +1,18 @@
+"""
+Stand-ins for the heavy dependencies the tests do not need, see mock_modules.
+"""
+import sys
+from unittest.mock import MagicMock, patch
+
+AUDIO = ("numpy", "soundfile", "tqdm", "faster_whisper", "faster_whisper.audio")
+S3 = ("boto3", "boto3.s3", "boto3.s3.transfer", "botocore", "botocore.config", "botocore.exceptions")
+API = ("pydantic", "httpx", "groq", "torch", "ffmpeg", "av", "dotenv")
+PIPELINE = AUDIO + S3 + API
+
+def mock_modules(*modules):
+    """
+    Mock the given modules unless they are already imported, for use around the imports
+    of a test module only. Everything imported inside the block is dropped from
+    sys.modules again on exit, so later test modules see the real environment.
+    """
+    return patch.dict(sys.modules, {module: MagicMock() for module in modules if module not in sys.modules})
@@ -0,0 +1,270 @@
+import os
+import re
+import time
+import random
+import asyncio
+import logging
+import threading
+import weakref
+from typing import Dict, Optional
+from groq import Groq, AsyncGroq, RateLimitError, InternalServerError, APIConnectionError
+
+logger = logging.getLogger(__name__)
+
+# Attempts per request, including the first one
+MAX_ATTEMPTS = int(os.environ.get("GROQ_MAX_ATTEMPTS", 5))
+# Client side budget per model, the provider's rate-limit headers tighten it when they report less
+REQUESTS_PER_MINUTE = float(os.environ.get("GROQ_REQUESTS_PER_MINUTE", 30))
+BURST = int(os.environ.get("GROQ_BURST", 5))
+BACKOFF_BASE = float(os.environ.get("GROQ_BACKOFF_BASE", 1.0))
+BACKOFF_MAX = float(os.environ.get("GROQ_BACKOFF_MAX", 30.0))
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """
+    Parses rate-limit header durations ("7.66s", "2m59.56s", "450ms", or plain seconds) into seconds.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    scale = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+    return sum(float(number) * scale[unit] for number, unit in parts)
+
+def backoff_delay(attempt: int) -> float:
+    # Full jitter, so clients that failed together don't retry together
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+class TokenBucket:
+    """
+    Request budget of one model. Callers reserve a token and are told how long to wait for it,
+    so concurrent jobs queue up behind each other instead of all hitting the API at once.
+    """
+    def __init__(self, per_minute: float, burst: int):
+        self.rate = per_minute / 60
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def reserve(self, now: float) -> float:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        delay = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        return max(delay, self.paused_until - now)
+
+    def pause(self, now: float, seconds: float) -> None:
+        self.paused_until = max(self.paused_until, now + seconds)
+
+class GroqRateLimiter:
+    """
+    Process-wide token buckets per model, adjusted by the x-ratelimit-* and retry-after headers.
+    """
+    def __init__(self, per_minute: float, burst: int):
+        self.per_minute = per_minute
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, TokenBucket] = {}
+
+        self.requests = 0
+        self.throttled = 0
+        self.retries = 0
+        self.delayed = 0
+        self.wait_seconds_total = 0.0
+        self.max_wait_seconds = 0.0
+
+    def _bucket(self, model: str) -> TokenBucket:
+        bucket = self._buckets.get(model)
+        if bucket is None:
+            bucket = self._buckets[model] = TokenBucket(self.per_minute, self.burst)
+        return bucket
+
+    def reserve(self, model: str) -> float:
+        # Returns how long the caller must wait before sending its request
+        with self._lock:
+            delay = self._bucket(model).reserve(time.monotonic())
+            self.requests += 1
+            if delay > 0:
+                self.delayed += 1
+                self.wait_seconds_total += delay
+                self.max_wait_seconds = max(self.max_wait_seconds, delay)
+            return delay
+
+    def observe(self, model: str, headers) -> None:
+        # The provider's view of the remaining budget wins over ours when it is lower
+        remaining = headers.get("x-ratelimit-remaining-requests")
+        reset = parse_duration(headers.get("x-ratelimit-reset-requests"))
+        if remaining is None:
+            return
+        try:
+            remaining = int(remaining)
+        except ValueError:
+            return
+        with self._lock:
+            bucket = self._bucket(model)
+            bucket.tokens = min(bucket.tokens, remaining)
+            if remaining <= 0 and reset:
+                bucket.pause(time.monotonic(), reset)
+
+    def throttle(self, model: str, retry_after: Optional[float], attempt: int) -> None:
+        # A 429 pauses every caller of the model, not only the one that got it
+        with self._lock:
+            self.throttled += 1
+            self._bucket(model).pause(time.monotonic(), retry_after if retry_after is not None else backoff_delay(attempt))
+
+    def record_retry(self) -> None:
+        with self._lock:
+            self.retries += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            now = time.monotonic()
+            return {
+                "requests": self.requests,
+                "throttled": self.throttled,
+                "retries": self.retries,
+                "delayed": self.delayed,
+                "wait_seconds_total": round(self.wait_seconds_total, 3),
+                "max_wait_seconds": round(self.max_wait_seconds, 3),
+                "models": {
+                    model: {
+                        "tokens": round(bucket.tokens, 2),
+                        "paused_seconds": round(max(0.0, bucket.paused_until - now), 3),
+                    }
+                    for model, bucket in self._buckets.items()
+                },
+            }
+
+
+rate_limiter = GroqRateLimiter(REQUESTS_PER_MINUTE, BURST)
+
+_clients_lock = threading.Lock()
+_clients: Dict[Optional[str], Groq] = {}
+# httpx async connection pools are bound to the event loop that created them
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Optional[str], AsyncGroq]]" = weakref.WeakKeyDictionary()
+# Event loop for async calls made from worker threads, started on first use
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+def client(api_key: Optional[str] = None) -> Groq:
+    """
+    Shared client, so requests reuse pooled connections. Retries are handled here, not by the SDK.
+    """
+    api_key = api_key or os.environ.get("GROQ_API_KEY")
+    with _clients_lock:
+        if api_key not in _clients:
+            _clients[api_key] = Groq(api_key=api_key, max_retries=0)
+        return _clients[api_key]
+
+def async_client(api_key: Optional[str] = None) -> AsyncGroq:
+    api_key = api_key or os.environ.get("GROQ_API_KEY")
+    loop = asyncio.get_running_loop()
+    with _clients_lock:
+        clients = _async_clients.setdefault(loop, {})
+        if api_key not in clients:
+            clients[api_key] = AsyncGroq(api_key=api_key, max_retries=0)
+        return clients[api_key]
+
+def run(coro):
+    """
+    Runs a coroutine on the shared background event loop and blocks until it completes, for worker threads.
+    Its async clients are created once and reused, rather than one per throwaway loop that is never closed.
+    """
+    global _loop
+    with _clients_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="groq-client-loop", daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(coro, _loop).result()
+
+def _resource(api, endpoint: str):
+    # "audio.transcriptions" -> api.audio.transcriptions
+    for name in endpoint.split("."):
+        api = getattr(api, name)
+    return api
+
+def _rewind(params: Dict) -> None:
+    # File uploads are read again on every attempt
+    file = params.get("file")
+    if hasattr(file, "seek"):
+        file.seek(0)
+
+def _retry_delay(error: Exception, model: str, attempt: int) -> Optional[float]:
+    """
+    Returns how long to sleep before the next attempt (None to re-raise). Throttling is waited out
+    through the bucket, so it returns 0 for it.
+    """
+    if attempt == MAX_ATTEMPTS - 1:
+        logger.error(f"Groq API failed after {MAX_ATTEMPTS} attempts: {error}")
+        return None
+    rate_limiter.record_retry()
+    if isinstance(error, RateLimitError):
+        response = getattr(error, "response", None)
+        retry_after = parse_duration(response.headers.get("retry-after")) if response is not None else None
+        rate_limiter.throttle(model, retry_after, attempt)
+        logger.warning(f"Groq API rate limited {model} (attempt {attempt+1}/{MAX_ATTEMPTS}), retry after {retry_after}s")
+        return 0.0
+    delay = backoff_delay(attempt)
+    logger.warning(f"Groq API error (attempt {attempt+1}/{MAX_ATTEMPTS}): {error}. Retrying in {delay:.1f}s...")
+    return delay
+
+def create(endpoint: str, api_key: Optional[str] = None, **params):
+    """
+    Sends a request (e.g. endpoint="audio.transcriptions") through the shared client and limiter.
+    Blocks the calling thread while queued, meant for worker threads.
+    """
+    model = params.get("model", "")
+    resource = _resource(client(api_key), endpoint)
+    for attempt in range(MAX_ATTEMPTS):
+        delay = rate_limiter.reserve(model)
+        if delay > 0:
+            time.sleep(delay)
+        _rewind(params)
+        try:
+            raw = resource.with_raw_response.create(**params)
+        except (RateLimitError, InternalServerError, APIConnectionError) as e:
+            delay = _retry_delay(e, model, attempt)
+            if delay is None:
+                raise
+            time.sleep(delay)
+            continue
+        rate_limiter.observe(model, raw.headers)
+        return raw.parse()
+
+async def acreate(endpoint: str, api_key: Optional[str] = None, total_timeout: Optional[float] = None, **params):
+    """
+    Async variant of create, waiting on the event loop instead of blocking it.
+    A "timeout" param applies to each of the MAX_ATTEMPTS attempts. total_timeout caps the time spent
+    in requests and backoff across attempts and raises asyncio.TimeoutError when exceeded. Time queued
+    for a rate-limit token doesn't count, so busy models queue instead of timing out.
+    """
+    model = params.get("model", "")
+    resource = _resource(async_client(api_key), endpoint)
+    spent = 0.0
+    for attempt in range(MAX_ATTEMPTS):
+        delay = rate_limiter.reserve(model)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        _rewind(params)
+        started = time.monotonic()
+        try:
+            request = resource.with_raw_response.create(**params)
+            raw = await (asyncio.wait_for(request, total_timeout - spent) if total_timeout is not None else request)
+        except (RateLimitError, InternalServerError, APIConnectionError) as e:
+            delay = _retry_delay(e, model, attempt)
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+            spent += time.monotonic() - started
+            if total_timeout is not None and spent >= total_timeout:
+                raise asyncio.TimeoutError(f"Groq API request exceeded {total_timeout}s")
+            continue
+        rate_limiter.observe(model, raw.headers)
+        return raw.parse()
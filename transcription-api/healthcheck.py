@@ -1,6 +1,8 @@
 import requests
 
+# Only report healthy once the configured models are loaded
 response = requests.get(
-    url='http://0.0.0.0:8000/healthcheck/',
+    url='http://0.0.0.0:8000/readiness/',
     timeout=60
-)
\ No newline at end of file
+)
+response.raise_for_status()
\ No newline at end of file
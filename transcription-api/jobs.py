@@ -0,0 +1,225 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import asyncio
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional
+from scheduler import PoolSaturated
+
+logger = logging.getLogger(__name__)
+
+class JobStatus:
+    pending = "pending"
+    running = "running"
+    done = "done"
+    error = "error"
+
+class JobStore:
+    """
+    Persistent job queue backed by SQLite.
+    Job metadata lives in the database, results are written as JSON files next to it.
+    Each job records its owner's user id (None for internal callers) and the S3 URL of its upload.
+    """
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(directory, "jobs.db"), check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._lock, self._db:
+            self._db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    filename TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    progress REAL NOT NULL DEFAULT 0,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    user_id TEXT,
+                    s3_url TEXT
+                )
+                """
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+            # Databases created before these columns existed
+            columns = {row["name"] for row in self._db.execute("PRAGMA table_info(jobs)")}
+            for column in ("user_id", "s3_url"):
+                if column not in columns:
+                    self._db.execute(f"ALTER TABLE jobs ADD COLUMN {column} TEXT")
+
+    def _result_path(self, job_id: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    def create(self, filename: str, params: Dict[str, Any], user_id: Optional[str] = None) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO jobs (id, status, filename, params, created_at, updated_at, user_id) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, JobStatus.pending, filename, json.dumps(params), now, now, user_id)
+            )
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        return job
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def claim_next(self) -> Optional[Dict[str, Any]]:
+        # Oldest pending job first, marked running atomically
+        with self._lock, self._db:
+            row = self._db.execute(
+                "SELECT id FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (JobStatus.pending,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?",
+                (JobStatus.running, time.time(), row["id"])
+            )
+        return self.get(row["id"])
+
+    def set_progress(self, job_id: str, progress: float) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE jobs SET progress = ?, updated_at = ? WHERE id = ?", (progress, time.time(), job_id)
+            )
+
+    def set_s3_url(self, job_id: str, s3_url: str) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE jobs SET s3_url = ?, updated_at = ? WHERE id = ?", (s3_url, time.time(), job_id)
+            )
+
+    def requeue(self, job_id: str) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?", (JobStatus.pending, time.time(), job_id)
+            )
+
+    def requeue_running(self) -> int:
+        # Jobs interrupted by a restart are picked up again
+        with self._lock, self._db:
+            cursor = self._db.execute(
+                "UPDATE jobs SET status = ?, progress = 0, updated_at = ? WHERE status = ?",
+                (JobStatus.pending, time.time(), JobStatus.running)
+            )
+        return cursor.rowcount
+
+    def complete(self, job_id: str, result: Dict[str, Any]) -> None:
+        path = self._result_path(job_id)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False)
+        os.replace(f"{path}.tmp", path)
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, progress = 1, updated_at = ? WHERE id = ?",
+                (JobStatus.done, time.time(), job_id)
+            )
+
+    def fail(self, job_id: str, error: str) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+                (JobStatus.error, error, time.time(), job_id)
+            )
+
+    def result(self, job_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._result_path(job_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except OSError:
+            return None
+
+
+JobHandler = Callable[[Dict[str, Any], Callable[[float], None]], Awaitable[Dict[str, Any]]]
+
+class JobRunner:
+    """
+    Background workers that take pending jobs from the store and run them through a handler.
+    The handler receives the job and a progress callback that may be called from any thread.
+    """
+    def __init__(self, store: JobStore, handler: JobHandler, workers: int = 1, retry_delay: float = 5.0):
+        self.store = store
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.retry_delay = retry_delay
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks = []
+
+    def start(self) -> None:
+        requeued = self.store.requeue_running()
+        if requeued:
+            logger.info(f"Requeued {requeued} interrupted jobs")
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    def notify(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _worker(self) -> None:
+        while True:
+            # Clear before claiming so a job submitted in between still wakes us up
+            self._wakeup.clear()
+            try:
+                job = await asyncio.to_thread(self.store.claim_next)
+            except Exception as e:
+                logger.error(f"Could not claim a job: {e}")
+                await asyncio.sleep(self.retry_delay)
+                continue
+            if job is None:
+                try:
+                    # Poll periodically in case jobs were added by another process
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=5)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await self._run(job)
+            except Exception as e:
+                # A failed store write (e.g. a full disk) fails the job instead of stopping the worker
+                logger.error(f"Job {job['id']} could not be recorded: {e}")
+                try:
+                    await asyncio.to_thread(self.store.fail, job["id"], str(e))
+                except Exception as e:
+                    logger.error(f"Job {job['id']} could not be marked as failed: {e}")
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        job_id = job["id"]
+        last = {"progress": 0.0, "time": 0.0}
+
+        def progress(value: float):
+            # Throttle database writes from the inference thread
+            now = time.monotonic()
+            if value - last["progress"] >= 0.01 and now - last["time"] >= 1.0:
+                last.update(progress=value, time=now)
+                self.store.set_progress(job_id, value)
+
+        try:
+            result = await self.handler(job, progress)
+        except PoolSaturated as e:
+            # Inference pool is saturated, put the job back and try again later
+            await asyncio.to_thread(self.store.requeue, job_id)
+            await asyncio.sleep(max(self.retry_delay, e.retry_after))
+            return
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}")
+            await asyncio.to_thread(self.store.fail, job_id, str(e))
+            return
+        await asyncio.to_thread(self.store.complete, job_id, result)
@@ -0,0 +1,138 @@
+import os
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple, Union
+
+import numpy as np
+
+from audio import SAMPLE_RATE, iter_audio_windows
+from models import ModelSize
+
+logger = logging.getLogger(__name__)
+
+ENGLISH_MODELS = {m.value for m in ModelSize if m.value.endswith(".en")}
+
+def english_model(model_size: str) -> str:
+    """
+    The English-only variant of a multilingual model, or the model itself when there is none.
+    """
+    candidate = f"{model_size}.en"
+    return candidate if candidate in ENGLISH_MODELS else model_size
+
+class LanguageCache:
+    """
+    Bounded LRU of detected languages keyed by content hash.
+    """
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, content_hash: str) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            entry = self._entries.get(content_hash)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(content_hash)
+            self.hits += 1
+            return entry
+
+    def put(self, content_hash: str, language: str, probability: float) -> None:
+        if not self.max_entries:
+            return
+        with self._lock:
+            self._entries[content_hash] = (language, probability)
+            self._entries.move_to_end(content_hash)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"entries": len(self._entries), "max_entries": self.max_entries, "hits": self.hits, "misses": self.misses}
+
+class LanguageDetector:
+    """
+    Detects the spoken language with a small model on the first seconds of the audio,
+    so the main model is given the language instead of detecting it itself.
+    The small model stays resident in the model registry like any other.
+    """
+    def __init__(self, model_size: str = "tiny", excerpt_seconds: float = 30.0, threshold: float = 0.5, cache: Optional[LanguageCache] = None):
+        self.model_size = model_size
+        self.excerpt_seconds = excerpt_seconds
+        # Below this probability the main model detects the language as before
+        self.threshold = threshold
+        self.cache = cache
+        self._lock = threading.Lock()
+        self.detections = 0
+        self.low_confidence = 0
+
+    def applies(self, model_size: str) -> bool:
+        # Remote and English-only models don't detect locally, and the detection model gains nothing
+        return not model_size.startswith("groq:") and model_size not in ENGLISH_MODELS and model_size != self.model_size
+
+    def excerpt(self, audio: Union[np.ndarray, str]) -> np.ndarray:
+        samples = int(self.excerpt_seconds * SAMPLE_RATE)
+        if isinstance(audio, str):
+            # Only the beginning of the file is decoded
+            windows = iter_audio_windows(audio, self.excerpt_seconds, search_seconds=min(5.0, self.excerpt_seconds / 2))
+            try:
+                _, window = next(windows, (0.0, np.zeros(0, dtype=np.float32)))
+            finally:
+                windows.close()
+            return window[:samples]
+        return audio[:samples]
+
+    def detect(self, audio: Union[np.ndarray, str], device: str = "cpu", content_hash: Optional[str] = None) -> Optional[str]:
+        """
+        Returns the detected language code, or None when the detection isn't confident enough.
+        """
+        cached = self.cache.get(content_hash) if self.cache is not None and content_hash else None
+        if cached is not None:
+            language, probability = cached
+        else:
+            from backends.fasterwhisper import FasterWhisperBackend
+            backend = FasterWhisperBackend(model_size=self.model_size, device=device)
+            backend.get_model()
+            backend.load()
+            language, probability, _ = backend.model.detect_language(self.excerpt(audio))
+            with self._lock:
+                self.detections += 1
+            if self.cache is not None and content_hash:
+                self.cache.put(content_hash, language, probability)
+
+        if probability < self.threshold:
+            with self._lock:
+                self.low_confidence += 1
+            logger.info(f"Language detection not confident ({language} at {probability:.2f}), leaving it to the main model")
+            return None
+        return language
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = {"model": self.model_size, "detections": self.detections, "low_confidence": self.low_confidence}
+        if self.cache is not None:
+            stats.update({f"cache_{k}": v for k, v in self.cache.stats().items()})
+        return stats
+
+
+def create_language_detector() -> Optional[LanguageDetector]:
+    # Optional stage, off unless a detection model is configured
+    model_size = os.environ.get("LANGUAGE_DETECTION_MODEL", "off")
+    if model_size.lower() in ("off", "false", "none", ""):
+        return None
+
+    return LanguageDetector(
+        model_size=model_size,
+        excerpt_seconds=float(os.environ.get("LANGUAGE_DETECTION_SECONDS", 30)),
+        threshold=float(os.environ.get("LANGUAGE_DETECTION_THRESHOLD", 0.5)),
+        cache=LanguageCache(int(os.environ.get("LANGUAGE_CACHE_SIZE", 10000))),
+    )
+
+
+language_detector = create_language_detector()
+# Transcribe with the English-only variant of the requested model when English is detected
+ROUTE_ENGLISH = os.environ.get("LANGUAGE_ROUTE_EN", "false").lower() == "true"
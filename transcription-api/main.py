@@ -1,20 +1,28 @@
 from dotenv import load_dotenv
 load_dotenv()
 
-from fastapi import FastAPI, UploadFile, File, Header, HTTPException, Depends
+from fastapi import FastAPI, UploadFile, File, Header, HTTPException, Depends, Request
+from fastapi.responses import JSONResponse, StreamingResponse, Response
 from models import ModelSize, Languages, DeviceType
-from transcribe import transcribe_file, transcribe_from_filename
+from transcribe import transcribe_file, transcribe_from_filename, transcribe_batch, stream_transcription, pool_device_for
+from storage import save_upload, upload_to_s3, delete_from_s3, UploadTooLarge
+from scheduler import inference_pool, PoolSaturated
+from jobs import JobStore, JobRunner, JobStatus
+from auth import create_token_validator
+from supabase_writer import create_supabase_writer
+import metrics
 import uvicorn
 import os
+import json
 import time
 from enum import Enum
-from typing import Annotated, Optional, Dict, Union
+from typing import Annotated, Optional, Dict, List, Union
 from backends.fasterwhisper import FasterWhisperBackend
+from backends.registry import model_registry
 from supabase import create_client, Client
 from pydantic import BaseModel
 import asyncio
-import boto3
-from botocore.exceptions import NoCredentialsError
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 app = FastAPI()
 
@@ -22,40 +30,42 @@ app = FastAPI()
 url: str = os.environ.get("SUPABASE_URL")
 key: str = os.environ.get("SUPABASE_ANON_KEY")
 supabase: Client = create_client(url, key)
-
-# Initialize S3 Client
-s3_client = boto3.client(
-    's3',
-    endpoint_url=os.environ.get("S3_ENDPOINT"),
-    aws_access_key_id=os.environ.get("S3_ACCESS_KEY_ID"),
-    aws_secret_access_key=os.environ.get("S3_SECRET_ACCESS_KEY"),
-    region_name=os.environ.get("S3_REGION")
+# Validated tokens are cached, so polling clients don't pay a Supabase round trip per request
+token_validator = create_token_validator(lambda token: supabase.auth.get_user(token).user)
+# Writes rows without a user token: spool replays and jobs resumed after a restart
+service_key: Optional[str] = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
+# Usage and transcription rows are inserted in batches off the request path
+supabase_writer = create_supabase_writer(
+    lambda: create_client(url, key),
+    (lambda: create_client(url, service_key)) if service_key else None,
 )
-BUCKET_NAME = os.environ.get("S3_BUCKET_NAME")
+
+# Startup warm-up state, reported by /readiness/
+warmup_state = {"ready": False, "requested": [], "loaded": [], "failed": {}}
+
+@app.exception_handler(PoolSaturated)
+async def pool_saturated_handler(request, exc: PoolSaturated):
+    # Backpressure: tell clients to come back later instead of queueing unbounded work
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
 
 class UserContext(BaseModel):
     user: object
     token: str
 
-async def upload_to_s3(file_path: str, object_name: str) -> Optional[str]:
-    try:
-        s3_client.upload_file(file_path, BUCKET_NAME, object_name)
-        endpoint = os.environ.get("S3_ENDPOINT", "")
-        if "backblaze" in endpoint:
-             return f"{endpoint}/{BUCKET_NAME}/{object_name}"
-        return object_name
-    except Exception as e:
-        print(f"S3 Upload Error: {e}")
-        return None
-
 async def get_current_user(authorization: Annotated[Optional[str], Header()] = None) -> Optional[UserContext]:
     if not authorization:
         return None
     
     try:
         token = authorization.replace("Bearer ", "")
-        user = supabase.auth.get_user(token)
-        return UserContext(user=user.user, token=token)
+        user = await token_validator.validate(token)
+        if user is None:
+            return None
+        return UserContext(user=user, token=token)
     except Exception as e:
         print(f"Auth Error: {e}")
         return None
@@ -92,7 +102,8 @@ async def transcribe_endpoint(
     device: str = "cpu",
     task: str = "transcribe",
     diarize: bool = False,
-    num_speakers: Optional[int] = None
+    num_speakers: Optional[int] = None,
+    batch_size: Optional[int] = None
 ):
     user = ctx.user if ctx else None
     token = ctx.token if ctx else None
@@ -102,40 +113,201 @@ async def transcribe_endpoint(
         return {"detail": "Device must be either cpu or cuda"}
     
     print(f"Transcribing with model {model_size.value} on device {device} and task {task} for user {user_id}...")
+
+    # Reject before saving or uploading anything so clients get a proper 503 with Retry-After
+    inference_pool.check_capacity(pool_device_for(model_size.value, device))
     
     if file is not None:
-        # Save UploadFile to disk temporarily to upload to S3 later
-        # Use a generic prefix if user is missing
-        prefix = user_id
-        saved_filename = f"{prefix}_{int(time.time())}_{file.filename}"
-        file_path = os.path.join(os.environ.get("UPLOAD_DIR", "/tmp"), saved_filename)
-        with open(file_path, "wb") as buffer:
-            # Read from UploadFile (which is Spooled)
-            content = await file.read() 
-            buffer.write(content)
-            
-        print(f"File saved to {file_path}")
-        
-        # Use transcribe_from_filename to reuse the saved file and preserve extension/path for Groq/Pyannote
-        result = await transcribe_from_filename(saved_filename, model_size.value, language.value, device, task, diarize, num_speakers)
+        saved_filename, content_hash = await save_request_file(file, user_id)
     elif filename is not None:
-        saved_filename = filename
-        result = await transcribe_from_filename(filename, model_size.value, language.value, device, task, diarize, num_speakers)
+        saved_filename, content_hash = filename, None
     else:
         return {"detail": "No file uploaded"}
 
-    # Upload to S3 (Only if S3 is configured and file exists)
-    s3_url = None
-    if saved_filename:
-        upload_dir = os.environ.get("UPLOAD_DIR", "/tmp")
-        full_path = os.path.join(upload_dir, saved_filename)
-        # Check if file exists before trying to upload
-        if os.path.exists(full_path) and os.environ.get("S3_BUCKET_NAME"):
-             s3_url = await upload_to_s3(full_path, saved_filename)
-             # os.remove(full_path) 
+    # Upload to S3 concurrently with transcription (Only if S3 is configured and file exists)
+    s3_task = start_s3_upload(saved_filename)
+
+    # Use transcribe_from_filename to reuse the saved file and preserve extension/path for Groq/Pyannote
+    try:
+        result = await transcribe_from_filename(saved_filename, model_size.value, language.value, device, task, diarize, num_speakers, content_hash=content_hash, batch_size=batch_size)
+    except BaseException:
+        discard_s3_upload(s3_task, saved_filename, delete=file is not None)
+        raise
+
+    s3_url = await s3_task if s3_task else None
     
+    log_transcription(user.id if user else None, token, result, saved_filename, s3_url, model_size.value, language.value, file.content_type if file else None)
+
+    return result
+
+class BatchTranscriptionRequest(BaseModel):
+    filenames: List[str]
+    model_size: ModelSize = ModelSize.small
+    language: Languages = Languages.auto
+    device: str = "cpu"
+    task: str = "transcribe"
+    batch_size: Optional[int] = None
+    # Queue one background job per file and return their ids instead of waiting
+    background: bool = False
+
+BATCH_MAX_FILES = int(os.environ.get("BATCH_MAX_FILES", 1000))
+
+@app.post("/transcribe/batch/")
+async def transcribe_batch_endpoint(
+    request: BatchTranscriptionRequest,
+    http_request: Request,
+    ctx: Annotated[Optional[UserContext], Depends(get_current_user)] = None
+):
+    """
+    Transcribes files already in UPLOAD_DIR with shared options on one loaded model.
+    """
+    if request.device != "cpu" and request.device != "cuda":
+        raise HTTPException(status_code=400, detail="Device must be either cpu or cuda")
+    if not request.filenames:
+        raise HTTPException(status_code=400, detail="No files given")
+    if len(request.filenames) > BATCH_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_FILES} files per batch")
+    if request.model_size.value.startswith("groq:"):
+        raise HTTPException(status_code=400, detail="Batch transcription only supports local models")
+    for filename in request.filenames:
+        check_filename(filename)
+
+    if request.background:
+        jobs = []
+        for filename in request.filenames:
+            job_id = await asyncio.to_thread(job_store.create, filename, {
+                "model_size": request.model_size.value,
+                "language": request.language.value,
+                "device": request.device,
+                "task": request.task,
+                "diarize": False,
+                "num_speakers": None,
+                "batch_size": request.batch_size,
+                "content_hash": None,
+                "mimetype": None,
+            }, ctx.user.id if ctx and ctx.user else None)
+            if ctx and ctx.user:
+                job_credentials[job_id] = ctx
+            jobs.append({"filename": filename, "id": job_id, "status": JobStatus.pending})
+        job_runner.notify()
+        return JSONResponse(status_code=202, content={"jobs": jobs})
+
+    # Reject before doing any work so clients get a proper 503 with Retry-After
+    inference_pool.check_capacity(pool_device_for(request.model_size.value, request.device))
+    # Stops between files once the client has gone away
+    results = await transcribe_batch(request.filenames, request.model_size.value, request.language.value, request.device, request.task, request.batch_size, is_cancelled=http_request.is_disconnected)
+
+    # Upload to S3 like /transcribe/, only the files that were transcribed
+    s3_tasks = {entry["filename"]: start_s3_upload(entry["filename"]) for entry in results if "result" in entry}
+    user = ctx.user if ctx else None
+    token = ctx.token if ctx else None
+    for entry in results:
+        if "result" in entry:
+            s3_task = s3_tasks[entry["filename"]]
+            s3_url = await s3_task if s3_task else None
+            log_transcription(user.id if user else None, token, entry["result"], entry["filename"], s3_url, request.model_size.value, request.language.value, None)
+    return {"results": results}
+
+@app.post("/transcribe/stream/")
+async def transcribe_stream_endpoint(
+    ctx: Annotated[Optional[UserContext], Depends(get_current_user)] = None,
+    file: UploadFile = File(None),
+    filename: str = None,
+    model_size: ModelSize = ModelSize.small, 
+    language: Languages = Languages.auto,
+    device: str = "cpu",
+    task: str = "transcribe",
+    batch_size: Optional[int] = None
+):
+    """
+    Server-sent events: one "segment" event per decoded segment, then a "summary" event.
+    """
+    if device != "cpu" and device != "cuda":
+        raise HTTPException(status_code=400, detail="Device must be either cpu or cuda")
+
+    # Reject before opening the stream so clients get a proper 503 with Retry-After
+    inference_pool.check_capacity(pool_device_for(model_size.value, device))
+
+    user = ctx.user if ctx else None
+    token = ctx.token if ctx else None
+    user_id = user.id if user else "internal_service"
+    if file is not None:
+        saved_filename, content_hash = await save_request_file(file, user_id)
+    elif filename is not None:
+        check_filename(filename)
+        saved_filename, content_hash = filename, None
+    else:
+        raise HTTPException(status_code=400, detail="No file uploaded")
+
+    async def events():
+        # Upload to S3 concurrently with transcription, like /transcribe/
+        s3_task = start_s3_upload(saved_filename)
+        try:
+            async for event in stream_transcription(saved_filename, model_size.value, language.value, device, task, content_hash=content_hash, batch_size=batch_size):
+                if event["type"] == "summary":
+                    # Logged before the last event, the client may disconnect as soon as it has it
+                    s3_url = await s3_task if s3_task else None
+                    s3_task = None
+                    log_transcription(user.id if user else None, token, event, saved_filename, s3_url, model_size.value, language.value, file.content_type if file else None)
+                yield f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+        except Exception as e:
+            print(f"Streaming transcription error: {e}")
+            yield f"event: error\ndata: {json.dumps({'type': 'error', 'detail': str(e)})}\n\n"
+        finally:
+            # The transcription failed or the client went away
+            discard_s3_upload(s3_task, saved_filename, delete=file is not None)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+async def save_request_file(file: UploadFile, user_id: str):
+    # Save UploadFile to disk temporarily to upload to S3 later
+    # Use a generic prefix if user is missing
+    prefix = user_id
+    saved_filename = f"{prefix}_{int(time.time())}_{file.filename}"
+    file_path = os.path.join(os.environ.get("UPLOAD_DIR", "/tmp"), saved_filename)
+    # Stream the UploadFile to disk in chunks instead of holding it in memory
+    try:
+        with metrics.stage("upload"):
+            content_hash, file_size = await save_upload(file, file_path)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+    print(f"File saved to {file_path} ({file_size} bytes, sha256 {content_hash})")
+    return saved_filename, content_hash
+
+def start_s3_upload(saved_filename: str) -> Optional[asyncio.Task]:
+    full_path = os.path.join(os.environ.get("UPLOAD_DIR", "/tmp"), saved_filename)
+    if os.path.exists(full_path) and os.environ.get("S3_BUCKET_NAME"):
+        return asyncio.create_task(upload_to_s3(full_path, saved_filename))
+    return None
+
+def check_filename(filename: str):
+    # Only plain names inside UPLOAD_DIR
+    if os.path.basename(filename) != filename or filename in ("", ".", ".."):
+        raise HTTPException(status_code=400, detail=f"Invalid filename {filename}")
+
+def discard_s3_upload(s3_task: Optional[asyncio.Task], saved_filename: str, delete: bool) -> None:
+    """
+    Drops the S3 copy of a request that failed. boto3 can't be interrupted mid-transfer, so a file
+    uploaded with the request (delete=True) is removed from the bucket once its upload ends.
+    Files only referenced by name may have been uploaded before, their upload is just cancelled.
+    """
+    if s3_task is None:
+        return
+    if not delete:
+        s3_task.cancel()
+        return
+
+    def cleanup(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is None and task.result():
+            asyncio.ensure_future(delete_from_s3(saved_filename))
+    s3_task.add_done_callback(cleanup)
+
+def log_transcription(user_id: Optional[str], token: Optional[str], result: Dict, saved_filename: str, s3_url: Optional[str], model_size: str, language: str, mimetype: Optional[str]):
+    full_path = os.path.join(os.environ.get("UPLOAD_DIR", "/tmp"), saved_filename)
     # Log usage & Save Transcription (Only if we have a valid user)
-    if user and token:
+    # Without a token (jobs resumed after a restart) rows are written with the service role
+    if user_id:
         try:
             # Pricing logic for different models
             # Rates per hour in USD
@@ -149,58 +321,278 @@ async def transcribe_endpoint(
                 "medium": 0.06,
                 "large": 0.09
             }
-            rate = rates.get(model_size.value, 0.03) # Default to 0.03 if unknown
+            rate = rates.get(model_size, 0.03) # Default to 0.03 if unknown
             duration = result.get("duration", 0.0)
             cost = (duration / 3600.0) * rate
             
-            user_client = create_client(url, key)
-            user_client.postgrest.auth(token)
-            
             # 1. Log Usage
             usage_data = {
-                "user_id": user.id,
+                "user_id": user_id,
                 "usage_type": "transcription_seconds",
                 "amount": float(duration),
                 "cost": float(cost),
                 "details": {
-                    "model": model_size.value,
+                    "model": model_size,
                     "rate_per_hr": rate
                 }
             }
-            user_client.table("whishper_usage_logs").insert(usage_data).execute()
+            supabase_writer.insert("whishper_usage_logs", usage_data, token, user_id)
             
             # 2. Save Transcription
             transcription_data = {
-                "user_id": user.id,
+                "user_id": user_id,
                 "filename": saved_filename,
                 "s3_url": s3_url,
                 "text": result.get("text", ""),
-                "language": result.get("language", language.value),
+                "language": result.get("language", language),
                 "duration": float(duration),
-                "model": model_size.value,
-                "mimetype": file.content_type if file else None,
+                "model": model_size,
+                "mimetype": mimetype,
                 "file_size": os.path.getsize(full_path) if os.path.exists(full_path) else None
             }
-            user_client.table("whishper_transcriptions").insert(transcription_data).execute()
+            supabase_writer.insert("whishper_transcriptions", transcription_data, token, user_id)
             
         except Exception as e:
             print(f"DB Error: {e}")
     else:
         print("Skipping Supabase logging - no authenticated user context")
 
+def start_job_upload(job: Dict) -> Optional[asyncio.Task]:
+    # One upload per job: retries after PoolSaturated reuse the upload in flight or the URL stored with the job
+    if job.get("s3_url"):
+        return None
+    if job["id"] in job_uploads:
+        return job_uploads[job["id"]]
+    upload = start_s3_upload(job["filename"])
+    if upload is None:
+        return None
+
+    async def upload_and_store():
+        try:
+            s3_url = await upload
+            if s3_url:
+                await asyncio.to_thread(job_store.set_s3_url, job["id"], s3_url)
+            return s3_url
+        finally:
+            job_uploads.pop(job["id"], None)
+
+    job_uploads[job["id"]] = asyncio.create_task(upload_and_store())
+    return job_uploads[job["id"]]
+
+async def run_job(job: Dict, progress) -> Dict:
+    params = job["params"]
+    saved_filename = job["filename"]
+    s3_task = start_job_upload(job)
+
+    try:
+        result = await transcribe_from_filename(
+            saved_filename,
+            params["model_size"],
+            params["language"],
+            params["device"],
+            params["task"],
+            params["diarize"],
+            params["num_speakers"],
+            content_hash=params.get("content_hash"),
+            progress_callback=progress,
+            batch_size=params.get("batch_size")
+        )
+    except PoolSaturated:
+        # The job is requeued, keep its credentials for the retry
+        raise
+    except Exception:
+        job_credentials.pop(job["id"], None)
+        raise
+
+    s3_url = await s3_task if s3_task else job.get("s3_url")
+    # Tokens are only held in memory, jobs resumed after a restart are logged for their owner with the service role
+    ctx = job_credentials.pop(job["id"], None)
+    log_transcription(job.get("user_id"), ctx.token if ctx else None, result, saved_filename, s3_url, params["model_size"], params["language"], params.get("mimetype"))
     return result
 
-@app.get("/healthcheck/")
-async def healthcheck():
-    return {"status": "healthy"}
+job_store = JobStore(os.environ.get("JOBS_DIR") or os.path.join(os.environ.get("UPLOAD_DIR", "/tmp"), ".jobs"))
+job_runner = JobRunner(job_store, run_job, workers=int(os.environ.get("JOB_WORKERS", 2)))
+job_credentials: Dict[str, UserContext] = {}
+# S3 uploads in flight per job id
+job_uploads: Dict[str, asyncio.Task] = {}
 
-if __name__ == "__main__":
+@app.on_event("startup")
+async def start_job_runner():
+    job_runner.start()
+
+@app.on_event("startup")
+async def start_supabase_writer():
+    supabase_writer.start()
+
+@app.on_event("shutdown")
+async def stop_supabase_writer():
+    await asyncio.get_running_loop().run_in_executor(None, supabase_writer.stop)
+
+@app.post("/jobs", status_code=202)
+async def submit_job(
+    ctx: Annotated[Optional[UserContext], Depends(get_current_user)] = None,
+    file: UploadFile = File(None),
+    filename: str = None,
+    model_size: ModelSize = ModelSize.small, 
+    language: Languages = Languages.auto,
+    device: str = "cpu",
+    task: str = "transcribe",
+    diarize: bool = False,
+    num_speakers: Optional[int] = None,
+    batch_size: Optional[int] = None
+):
+    if device != "cpu" and device != "cuda":
+        raise HTTPException(status_code=400, detail="Device must be either cpu or cuda")
+
+    user_id = ctx.user.id if ctx and ctx.user else "internal_service"
+    if file is not None:
+        saved_filename, content_hash = await save_request_file(file, user_id)
+    elif filename is not None:
+        check_filename(filename)
+        if not os.path.exists(os.path.join(os.environ.get("UPLOAD_DIR", "/tmp"), filename)):
+            raise HTTPException(status_code=404, detail=f"file {filename} not found")
+        saved_filename, content_hash = filename, None
+    else:
+        raise HTTPException(status_code=400, detail="No file uploaded")
+
+    job_id = await asyncio.to_thread(job_store.create, saved_filename, {
+        "model_size": model_size.value,
+        "language": language.value,
+        "device": device,
+        "task": task,
+        "diarize": diarize,
+        "num_speakers": num_speakers,
+        "batch_size": batch_size,
+        "content_hash": content_hash,
+        "mimetype": file.content_type if file else None,
+    }, ctx.user.id if ctx and ctx.user else None)
+    if ctx and ctx.user:
+        job_credentials[job_id] = ctx
+    job_runner.notify()
+    return {"id": job_id, "status": JobStatus.pending}
+
+def owns_job(job: Dict, ctx: Optional[UserContext]) -> bool:
+    # Jobs of a user are only visible to that user, jobs without an owner only to internal callers
+    return job.get("user_id") == (ctx.user.id if ctx and ctx.user else None)
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, ctx: Annotated[Optional[UserContext], Depends(get_current_user)] = None):
+    job = await asyncio.to_thread(job_store.get, job_id)
+    if job is None or not owns_job(job, ctx):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {
+        "id": job["id"],
+        "status": job["status"],
+        "progress": job["progress"],
+        "error": job["error"],
+        "filename": job["filename"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+    }
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str, ctx: Annotated[Optional[UserContext], Depends(get_current_user)] = None):
+    job = await asyncio.to_thread(job_store.get, job_id)
+    if job is None or not owns_job(job, ctx):
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] == JobStatus.error:
+        raise HTTPException(status_code=500, detail=job["error"])
+    if job["status"] != JobStatus.done:
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    return await asyncio.to_thread(job_store.result, job_id)
+
+def preload_models():
     # Get model list (comma separated) from environment variable
     model_list = os.environ.get("WHISPER_MODELS", "tiny,base,small")
-    model_list = model_list.split(",")
-    for model in model_list:
-        if model.startswith("groq:"):
-            continue
-        m = FasterWhisperBackend(model_size=model)
+    model_list = [m.strip() for m in model_list.split(",") if m.strip() and not m.strip().startswith("groq:")]
+    device = os.environ.get("WHISPER_DEVICE", "cpu")
+    warmup_state["requested"] = model_list
+
+    def load(model_size: str):
+        m = FasterWhisperBackend(model_size=model_size, device=device)
         m.get_model()
+        m.load()
+
+    def load_diarization():
+        from processors.diarizer import pipeline_pool
+        if not pipeline_pool.warm(os.environ.get("HF_TOKEN")):
+            raise RuntimeError("Pyannote pipeline not available")
+
+    workers = int(os.environ.get("PRELOAD_WORKERS", 2))
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(load, model): model for model in model_list}
+        if os.environ.get("PRELOAD_DIARIZATION", "false").lower() == "true":
+            futures[pool.submit(load_diarization)] = "pyannote"
+        for future in as_completed(futures):
+            model = futures[future]
+            try:
+                future.result()
+                warmup_state["loaded"].append(model)
+                print(f"Preloaded model {model} on {device}")
+            except Exception as e:
+                warmup_state["failed"][model] = str(e)
+                print(f"Failed to preload model {model}: {e}")
+
+    warmup_state["ready"] = True
+    print("Warm-up completed.")
+
+@app.on_event("startup")
+async def warmup():
+    if os.environ.get("PRELOAD_MODELS", "true").lower() != "true":
+        warmup_state["ready"] = True
+        return
+    # Load in the background so the server answers liveness checks while warming up
+    asyncio.get_running_loop().run_in_executor(None, preload_models)
+
+@app.get("/healthcheck/")
+async def healthcheck():
+    return {"status": "healthy", "ready": warmup_state["ready"]}
+
+@app.get("/readiness/")
+async def readiness():
+    if not warmup_state["ready"]:
+        return JSONResponse(status_code=503, content={"status": "warming", **warmup_state})
+    # Not ready to serve local transcriptions when every preloaded model failed
+    if warmup_state["requested"] and not set(warmup_state["requested"]) & set(warmup_state["loaded"]):
+        return JSONResponse(status_code=503, content={"status": "failed", **warmup_state})
+    return {"status": "ready", **warmup_state}
+
+@app.get("/queue/")
+async def queue_stats():
+    from groq_client import rate_limiter
+    return {**inference_pool.stats(), "groq": rate_limiter.stats(), "supabase_writer": supabase_writer.stats()}
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    if not metrics.enabled:
+        raise HTTPException(status_code=501, detail="prometheus_client is not installed")
+
+    from groq_client import rate_limiter
+    from processors.diarizer import pipeline_pool
+    from cache import result_cache, encoded_audio_cache
+    from language_detection import language_detector
+    pool_stats = inference_pool.stats()
+    components = {
+        "inference_pool": pool_stats,
+        "model_registry": model_registry.stats(),
+        "pyannote": pipeline_pool.stats(),
+        "groq": rate_limiter.stats(),
+        "supabase_writer": supabase_writer.stats(),
+    }
+    if result_cache is not None:
+        components["result_cache"] = result_cache.stats()
+    if encoded_audio_cache is not None:
+        components["encoded_audio_cache"] = encoded_audio_cache.stats()
+    if language_detector is not None:
+        components["language_detection"] = language_detector.stats()
+    job_counts = await asyncio.to_thread(job_store.counts)
+    metrics.update_gauges(pool_stats, job_counts, components)
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE_LATEST)
+
+@app.get("/models/")
+async def models_stats():
+    from processors.diarizer import pipeline_pool
+    return {**model_registry.stats(), "pyannote": pipeline_pool.stats()}
+
+if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,87 @@
+import time
+import logging
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+# prometheus_client is optional, without it the instrumentation is a no-op and /metrics is disabled
+try:
+    from prometheus_client import Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST
+except ImportError:
+    Counter = Gauge = Histogram = generate_latest = None
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+logger = logging.getLogger(__name__)
+
+# Pipeline stages timed by stage(), other names are rejected so label values stay a fixed set
+STAGES = (
+    "upload", "decode", "language_detection", "model_load", "asr", "diarization", "alignment", "llm_refine",
+    "s3_upload", "db_write",
+)
+
+enabled = Histogram is not None
+
+if enabled:
+    STAGE_SECONDS = Histogram(
+        "whishper_stage_seconds", "Time spent per pipeline stage", ["stage"],
+        buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600),
+    )
+    REALTIME_FACTOR = Histogram(
+        "whishper_realtime_factor", "Processing seconds per second of audio", ["model", "device"],
+        buckets=(0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1, 1.5, 2, 5, 10),
+    )
+    AUDIO_SECONDS = Counter("whishper_audio_seconds", "Seconds of audio transcribed", ["model", "device"])
+    ACTIVE_TRANSCRIPTIONS = Gauge("whishper_active_transcriptions", "Transcriptions currently in progress")
+    QUEUE_DEPTH = Gauge("whishper_queue_depth", "Inference jobs waiting for a slot", ["device"])
+    RUNNING = Gauge("whishper_running_inference", "Inference jobs holding a slot", ["device"])
+    JOBS = Gauge("whishper_jobs", "Background jobs per status", ["status"])
+    COMPONENT_STAT = Gauge("whishper_component_stat", "Counters reported by internal components", ["component", "stat"])
+
+@contextmanager
+def stage(name: str):
+    """
+    Times the enclosed block as one observation of a pipeline stage, failures included.
+    """
+    if name not in STAGES:
+        raise ValueError(f"unknown pipeline stage {name}")
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if enabled:
+            STAGE_SECONDS.labels(name).observe(time.perf_counter() - start)
+
+@contextmanager
+def active_transcription():
+    if enabled:
+        ACTIVE_TRANSCRIPTIONS.inc()
+    try:
+        yield
+    finally:
+        if enabled:
+            ACTIVE_TRANSCRIPTIONS.dec()
+
+def observe_transcription(model: str, device: str, processing_seconds: float, audio_seconds: Optional[float]) -> None:
+    if not enabled or not audio_seconds:
+        return
+    REALTIME_FACTOR.labels(model, device).observe(processing_seconds / audio_seconds)
+    AUDIO_SECONDS.labels(model, device).inc(audio_seconds)
+
+def update_gauges(pool_stats: Dict, job_counts: Dict[str, int], components: Dict[str, Dict]) -> None:
+    """
+    Copies point-in-time state into gauges before a scrape. Numeric top-level values of each
+    component's stats() are exported as whishper_component_stat{component, stat}.
+    """
+    if not enabled:
+        return
+    for device, stats in pool_stats.get("devices", {}).items():
+        QUEUE_DEPTH.labels(device).set(stats["queued"])
+        RUNNING.labels(device).set(stats["running"])
+    for status, count in job_counts.items():
+        JOBS.labels(status).set(count)
+    for component, stats in components.items():
+        for stat, value in stats.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                COMPONENT_STAT.labels(component, stat).set(value)
+
+def render() -> bytes:
+    return generate_latest()
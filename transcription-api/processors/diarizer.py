@@ -1,10 +1,14 @@
 
 import os
 import json
+import time
+import bisect
 import logging
 import asyncio
-from typing import List, Dict, Optional
-from groq import Groq
+import threading
+from contextlib import contextmanager
+from typing import List, Dict, Optional, Set, Tuple
+import groq_client
 import torch
 
 try:
@@ -19,9 +23,9 @@ class LlamaDiarizer:
         self.api_key = api_key or os.environ.get("GROQ_API_KEY")
         if not self.api_key:
             logger.error("GROQ_API_KEY missing for LlamaDiarizer")
-        self.client = Groq(api_key=self.api_key)
         self.model = "llama-3.3-70b-versatile"
-        self.semaphore = asyncio.Semaphore(3) # Limit parallel requests to 3
+        # Limit parallel requests (3 by default)
+        self.semaphore = asyncio.Semaphore(int(os.environ.get("LLAMA_DIARIZER_CONCURRENCY", 3)))
 
     async def _process_batch(self, batch: List[Dict], context: List[Dict], speaker_hint: str) -> Dict:
         """
@@ -44,19 +48,20 @@ class LlamaDiarizer:
             try:
                 prompt_content = {"context": context, "current": batch}
                 
-                # Set a reasonable timeout for the LLM response
-                response = await asyncio.wait_for(
-                    asyncio.to_thread(
-                        self.client.chat.completions.create,
-                        model=self.model,
-                        messages=[
-                            {"role": "system", "content": system_prompt},
-                            {"role": "user", "content": json.dumps(prompt_content)}
-                        ],
-                        response_format={"type": "json_object"},
-                        temperature=0.1
-                    ),
-                    timeout=20.0 # 20 seconds max per batch
+                # Set a reasonable timeout for the LLM response, per attempt so time spent
+                # queued behind the rate limiter doesn't count against it, and a cap for the whole batch
+                response = await groq_client.acreate(
+                    "chat.completions",
+                    api_key=self.api_key,
+                    model=self.model,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": json.dumps(prompt_content)}
+                    ],
+                    response_format={"type": "json_object"},
+                    temperature=0.1,
+                    timeout=20.0, # 20 seconds max per attempt
+                    total_timeout=60.0 # 60 seconds max per batch across retries, queueing excluded
                 )
                 
                 content = response.choices[0].message.content
@@ -78,6 +83,9 @@ class LlamaDiarizer:
     async def diarize(self, segments: List[Dict], num_speakers: Optional[int] = None) -> List[Dict]:
         """
         Assigns speakers and roles using parallel processing and speaker pinning.
+        Batches are labelled concurrently, each one also re-labelling the last segments of the
+        previous batch. Those overlapping segments are then used to map every batch's speaker
+        labels onto the labels of the batch before it.
         """
         if not segments:
             return segments
@@ -88,37 +96,43 @@ class LlamaDiarizer:
         BATCH_SIZE = 30
         OVERLAP = 7 # Larger overlap for better pinning
         
-        i = 0
         speaker_hint = f"Expected number of speakers: {num_speakers}." if num_speakers else ""
-        
-        while i < len(segments_to_process):
-            start = i
-            end = min(i + BATCH_SIZE, len(segments_to_process))
-            
-            # For each batch, we include the overlap as 'context' (now with previously assigned labels)
-            context_start = max(0, start - OVERLAP)
-            context = segments_to_process[context_start:start]
-            
-            batch = segments_to_process[start:end]
-            
-            # Record batch results
-            batch_result = await self._process_batch(batch, context, speaker_hint)
-            
-            # Update segments_to_process with labels for pinning in next batch
-            for idx in range(start, end):
-                seg_id = segments_to_process[idx]["id"]
+
+        async def label_batch(start: int):
+            end = min(start + BATCH_SIZE, len(segments_to_process))
+            # The overlap is labelled again by this batch so it can be pinned to the previous one
+            window_start = max(0, start - OVERLAP)
+            window = segments_to_process[window_start:end]
+            batch_result = await self._process_batch(window, [], speaker_hint)
+
+            labels = {}
+            for idx in range(window_start, end):
                 # Convert back to string as JSON keys are strings
-                seg_key = str(seg_id)
-                if seg_key in batch_result:
-                    res = batch_result[seg_key]
-                    segments_to_process[idx]["speaker"] = res.get("speaker", "Speaker ?")
-                    segments_to_process[idx]["role"] = res.get("role", "Unknown")
-                else:
+                res = batch_result.get(str(segments_to_process[idx]["id"]))
+                if not isinstance(res, dict):
                     # Fallback if key missing
-                    segments_to_process[idx]["speaker"] = "Speaker ?"
-                    segments_to_process[idx]["role"] = "Unknown"
-            
-            i += BATCH_SIZE
+                    res = {}
+                labels[idx] = (res.get("speaker", "Speaker ?"), res.get("role", "Unknown"))
+            return window_start, start, end, labels
+
+        # Concurrency is bounded by the semaphore in _process_batch
+        batches = await asyncio.gather(
+            *(label_batch(start) for start in range(0, len(segments_to_process), BATCH_SIZE))
+        )
+
+        # Reconcile batches in order, each one against the already reconciled previous batch
+        for window_start, start, end, labels in batches:
+            overlap_pairs = [
+                (labels[idx][0], segments_to_process[idx]["speaker"])
+                for idx in range(window_start, start)
+            ]
+            known = {seg["speaker"] for seg in segments_to_process[:start]}
+            mapping = map_batch_speakers(overlap_pairs, {spk for spk, _ in labels.values()}, known)
+
+            for idx in range(start, end):
+                speaker, role = labels[idx]
+                segments_to_process[idx]["speaker"] = mapping.get(speaker, speaker)
+                segments_to_process[idx]["role"] = role
 
         # Combine results back to original segments
         for i, seg in enumerate(segments):
@@ -128,73 +142,244 @@ class LlamaDiarizer:
         return segments
 
 
+def map_batch_speakers(overlap_pairs: List[Tuple[str, str]], local_labels: Set[str], known_labels: Set[str]) -> Dict[str, str]:
+    """
+    Maps a batch's local speaker labels onto the global ones.
+    overlap_pairs holds (local, global) labels of the segments both batches labelled. Local labels
+    are matched to the global label they agree with most, one to one. Unmatched labels keep their
+    name unless another local label was pinned to it, in which case they become a new speaker.
+    """
+    UNKNOWN = "Speaker ?"
+    votes: Dict[Tuple[str, str], int] = {}
+    for local, known in overlap_pairs:
+        if local == UNKNOWN or known == UNKNOWN:
+            continue
+        votes[(local, known)] = votes.get((local, known), 0) + 1
+
+    mapping: Dict[str, str] = {}
+    claimed: Set[str] = set()
+    for (local, known), _ in sorted(votes.items(), key=lambda item: -item[1]):
+        if local in mapping or known in claimed:
+            continue
+        mapping[local] = known
+        claimed.add(known)
+
+    def next_speaker() -> str:
+        numbers = [int(label.split()[-1]) for label in known_labels | claimed if label.split()[-1].isdigit()]
+        return f"Speaker {max(numbers, default=0) + 1}"
+
+    for local in sorted(local_labels):
+        if local in mapping or local == UNKNOWN:
+            continue
+        if local in claimed:
+            # Another local speaker was pinned to this name
+            mapping[local] = next_speaker()
+        else:
+            mapping[local] = local
+        claimed.add(mapping[local])
+    return mapping
+
+
+class SpeakerTurnIndex:
+    """
+    Diarization turns sorted by start time, with a running maximum of their end times and a
+    max-end segment tree over the same order.
+    A lookup binary-searches the last turn starting before the range ends and walks back while
+    earlier turns can still reach the range. One long turn keeps the running maximum high, so after
+    WALK steps the remaining turns that reach the range are found through the tree instead.
+    """
+    WALK = 8
+
+    def __init__(self, turns: List[Tuple[float, float, str]]):
+        # Keep the original position to break ties like a linear scan would (first turn wins)
+        order = sorted(range(len(turns)), key=lambda i: (turns[i][0], i))
+        self.starts = [turns[i][0] for i in order]
+        self.ends = [turns[i][1] for i in order]
+        self.speakers = [turns[i][2] for i in order]
+        self.positions = order
+        self.max_ends = []
+        running_max = float("-inf")
+        for end in self.ends:
+            running_max = max(running_max, end)
+            self.max_ends.append(running_max)
+
+        # tree[node] is the latest end below node, leaves start at self.leaves
+        self.leaves = 1
+        while self.leaves < len(self.ends):
+            self.leaves *= 2
+        self.tree = [float("-inf")] * (2 * self.leaves)
+        self.tree[self.leaves:self.leaves + len(self.ends)] = self.ends
+        for node in range(self.leaves - 1, 0, -1):
+            self.tree[node] = max(self.tree[2 * node], self.tree[2 * node + 1])
+
+    def _reaching(self, last: int, start: float) -> List[int]:
+        # Turns up to last that end after start, only descending into subtrees that reach it
+        found = []
+        stack = [(1, 0, self.leaves - 1)]
+        while stack:
+            node, low, high = stack.pop()
+            if low > last or self.tree[node] <= start:
+                continue
+            if low == high:
+                found.append(low)
+                continue
+            middle = (low + high) // 2
+            stack.append((2 * node, low, middle))
+            stack.append((2 * node + 1, middle + 1, high))
+        return found
+
+    def find_speaker(self, start: float, end: float) -> Optional[str]:
+        """
+        Returns the speaker of the turn overlapping [start, end] the most, None if none overlaps.
+        """
+        candidates = []
+        j = bisect.bisect_left(self.starts, end) - 1
+        while j >= 0 and self.max_ends[j] > start:
+            if len(candidates) == self.WALK:
+                candidates.extend(self._reaching(j, start))
+                break
+            candidates.append(j)
+            j -= 1
+
+        max_overlap = 0
+        best_speaker = None
+        best_position = None
+        for i in candidates:
+            overlap_duration = max(0, min(end, self.ends[i]) - max(start, self.starts[i]))
+            if overlap_duration > max_overlap or (
+                overlap_duration == max_overlap and best_position is not None and self.positions[i] < best_position
+            ):
+                max_overlap = overlap_duration
+                best_speaker = self.speakers[i]
+                best_position = self.positions[i]
+
+        return best_speaker
+
+
+class PyannotePipelinePool:
+    """
+    Process-wide pool of pyannote pipelines.
+    Pipelines are built lazily on first use and reused across jobs. Each pipeline is
+    handed to one diarization at a time, since inference mutates pipeline state.
+    """
+    def __init__(self, size: int = 1):
+        self.size = max(1, size)
+        self._idle: List = []
+        self._created = 0
+        self._lock = threading.Lock()
+        # Signalled when a pipeline is released or a failed build frees its slot
+        self._available = threading.Condition(self._lock)
+        self.loads = 0
+        self.load_seconds = 0.0
+
+    def _build(self, auth_token: Optional[str]):
+        if not Pipeline:
+            return None
+        # Use CUDA if available
+        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        # Diarization runs concurrently with CTranslate2, give torch its own thread budget
+        if os.environ.get("DIARIZATION_THREADS"):
+            torch.set_num_threads(int(os.environ["DIARIZATION_THREADS"]))
+        start = time.perf_counter()
+        pipeline = Pipeline.from_pretrained(
+            "pyannote/speaker-diarization-3.1",
+            use_auth_token=auth_token
+        )
+        if pipeline:
+            pipeline.to(device)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.loads += 1
+            self.load_seconds += elapsed
+        logger.info(f"Pyannote pipeline loaded in {elapsed:.2f}s on {device}")
+        return pipeline
+
+    def warm(self, auth_token: Optional[str] = None) -> bool:
+        with self.acquire(auth_token) as pipeline:
+            return pipeline is not None
+
+    @contextmanager
+    def acquire(self, auth_token: Optional[str] = None):
+        pipeline = None
+        with self._available:
+            # All pipelines are busy, wait for one to be released or for room to build one
+            while not self._idle and self._created >= self.size:
+                self._available.wait()
+            if self._idle:
+                pipeline = self._idle.pop()
+                build = False
+            else:
+                self._created += 1
+                build = True
+
+        if build:
+            try:
+                pipeline = self._build(auth_token)
+            except Exception as e:
+                logger.error(f"Failed to initialize Pyannote pipeline: {e}")
+                pipeline = None
+            if pipeline is None:
+                # Free the slot and wake one waiter so it can retry the load
+                with self._available:
+                    self._created -= 1
+                    self._available.notify()
+
+        try:
+            yield pipeline
+        finally:
+            if pipeline is not None:
+                with self._available:
+                    self._idle.append(pipeline)
+                    self._available.notify()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "size": self.size,
+                "created": self._created,
+                "idle": len(self._idle),
+                "loads": self.loads,
+                "load_seconds": round(self.load_seconds, 3),
+            }
+
+
+pipeline_pool = PyannotePipelinePool(size=int(os.environ.get("PYANNOTE_POOL_SIZE", 1)))
+
+
 class PyannoteDiarizer:
     def __init__(self, auth_token: str = None):
         self.auth_token = auth_token or os.environ.get("HF_TOKEN")
         if not self.auth_token:
             logger.error("HF_TOKEN missing for PyannoteDiarizer")
-        
-        self.pipeline = None
-        if Pipeline:
-            try:                
-                # Use CUDA if available
-                device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-                
-                self.pipeline = Pipeline.from_pretrained(
-                    "pyannote/speaker-diarization-3.1",
-                    use_auth_token=self.auth_token
-                )
-                if self.pipeline:
-                    self.pipeline.to(device)
-            except Exception as e:
-                logger.error(f"Failed to initialize Pyannote pipeline: {e}")
 
-    def run_diarization(self, audio_path: str, num_speakers: Optional[int] = None):
-        if not self.pipeline:
-            raise RuntimeError("Pyannote pipeline not initialized")
-        
-        try:
-            diarization = self.pipeline(audio_path, num_speakers=num_speakers)
-            return diarization
-        except Exception as e:
-            logger.error(f"Pyannote inference error: {e}")
-            raise
+    def run_diarization(self, audio, num_speakers: Optional[int] = None):
+        # audio is a file path or the 16 kHz mono buffer already decoded for ASR
+        if not isinstance(audio, str):
+            audio = {"waveform": torch.from_numpy(audio).unsqueeze(0), "sample_rate": 16000}
+
+        # The pipeline is shared across jobs, only loaded on the first diarization
+        with pipeline_pool.acquire(self.auth_token) as pipeline:
+            if not pipeline:
+                raise RuntimeError("Pyannote pipeline not initialized")
+
+            try:
+                diarization = pipeline(audio, num_speakers=num_speakers)
+                return diarization
+            except Exception as e:
+                logger.error(f"Pyannote inference error: {e}")
+                raise
 
     def assign_speakers_to_segments(self, segments: List[Dict], diarization) -> List[Dict]:
         """
         Aligns Pyannote speaker turns with Whisper segments.
         Iterates through words in segments to find the most overlapping speaker.
         """
-        # Convert diarization to list of turns for faster lookup
-        # turn: (start, end, speaker)
-        turns = []
-        for turn, _, speaker in diarization.itertracks(yield_label=True):
-            turns.append({
-                "start": turn.start,
-                "end": turn.end,
-                "speaker": speaker
-            })
-            
-        # Helper to find speaker for a time range
-        def find_speaker(start, end):
-            max_overlap = 0
-            best_speaker = None
-            
-            seg_center = (start + end) / 2
-            
-            # Simple check: find turn containing center
-            # For more precision, we could calculate exact overlap duration
-            for turn in turns:
-                # Check for overlap
-                overlap_start = max(start, turn["start"])
-                overlap_end = min(end, turn["end"])
-                overlap_duration = max(0, overlap_end - overlap_start)
-                
-                if overlap_duration > max_overlap:
-                    max_overlap = overlap_duration
-                    best_speaker = turn["speaker"]
-            
-            return best_speaker
+        # Index the turns once so each lookup only visits turns that can overlap
+        turns = SpeakerTurnIndex([
+            (turn.start, turn.end, speaker)
+            for turn, _, speaker in diarization.itertracks(yield_label=True)
+        ])
+        find_speaker = turns.find_speaker
 
         # Assign speakers to each word, then consensus for segment
         for segment in segments:
@@ -226,6 +411,7 @@ class PyannoteDiarizer:
         """
         Uses Llama 3 (via Groq) to correct semantic speaker errors.
         It looks for split sentences and illogical speaker turns.
+        Only the segments around speaker changes are sent, in chunks refined concurrently.
         """
         if not segments:
             return segments
@@ -235,16 +421,8 @@ class PyannoteDiarizer:
             logger.warning("GROQ_API_KEY missing, skipping smart refinement")
             return segments
 
-        client = Groq(api_key=api_key)
         model = "llama-3.3-70b-versatile"
 
-        # Prepare a lightweight version of segments for the LLM
-        # We process the whole conversation or large chunks to give context
-        # Given 128k context of Llama 3, we can likely pass the whole thing for typical files.
-        # But let's batch to be safe and robust.
-        
-        # However, purely fixing split sentences is easier if we look at text flow.
-        
         system_prompt = (
             "You are a smart transcript editor. "
             "Your ONLY goal is to fix 'Speaker Diarization Errors' where a single sentence is incorrectly split between two different speakers.\n\n"
@@ -252,81 +430,121 @@ class PyannoteDiarizer:
             "- Sometimes Speaker A pauses, and the system incorrectly thinks Speaker B started talking.\n"
             "- Your job is to look at the TEXT flow. If the text clearly continues a sentence, assign the SAME speaker as the previous segment.\n\n"
             "Input: JSON list of segments.\n"
-            "Output: JSON list of segments with CORRECTED 'speaker' labels. DO NOT change text.\n\n"
+            "Output: JSON object with a 'segments' list containing the 'id' and CORRECTED 'speaker' of every segment. DO NOT return text.\n\n"
             "Example:\n"
             "Input: [{'id': 1, 'speaker': 'A', 'text': 'I want to'}, {'id': 2, 'speaker': 'B', 'text': 'go home.'}]\n"
-            "Output: [{'id': 1, 'speaker': 'A', 'text': 'I want to'}, {'id': 2, 'speaker': 'A', 'text': 'go home.'}]"
+            "Output: {'segments': [{'id': 1, 'speaker': 'A'}, {'id': 2, 'speaker': 'A'}]}"
         )
 
-        import json
-
-        # We'll stick to a simple strategy: Pass chunks of ~50 segments with overlap
-        refined_segments = []
         chunk_size = 50
-        
-        try:
-             # Simplify: pass only id, speaker, text
-            light_segments = [{"id": s.get("id", i), "speaker": s["speaker"], "text": s["text"]} for i, s in enumerate(segments)]
-            
-            # Create the user message
-            user_content = json.dumps(light_segments, ensure_ascii=False)
-            
-            response = client.chat.completions.create(
-                model=model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_content}
-                ],
-                response_format={"type": "json_object"},
-                temperature=0.1
-            )
-            
-            content = response.choices[0].message.content
-            corrected_data = json.loads(content)
-            
-            # Robust parsing for list or dict response
-            corrected_list = []
-            if isinstance(corrected_data, dict):
-                corrected_list = corrected_data.get("segments", corrected_data)
-                # If it's still a dict, maybe nested under another key? try to find first list value
-                if isinstance(corrected_list, dict):
-                    for k, v in corrected_list.items():
-                        if isinstance(v, list):
-                            corrected_list = v
-                            break
-            elif isinstance(corrected_data, list):
-                corrected_list = corrected_data
-            
-            if not isinstance(corrected_list, list):
-                 logger.warning("LLM response is not a list")
-                 return segments
-
-            # Map back: we trust the LLM's structure if it matches roughly.
-            # But the LLM might have merged segments. 
-            # If we simply replace, we lose timestamps of the merged parts unless LLM kept them.
-            # Our prompt didn't ask to preserve timestamps.
-            # Strategy: ask LLM to return `id`: `speaker` map?
-            # Better: Ask LLM to output list of {id, speaker}.
-            
-            # Create a map for ID -> Speaker
-            id_speaker_map = {}
-            for item in corrected_list:
-                if "id" in item and "speaker" in item:
-                    # Ensure ID is treated consistently (string/int)
-                    id_speaker_map[str(item["id"])] = item["speaker"]
-            
-            # Apply corrections
-            for i, seg in enumerate(segments):
-                # Use "id" if present, else index
-                seg_id = str(seg.get("id", i))
-                
-                if seg_id in id_speaker_map:
-                    seg["speaker"] = id_speaker_map[seg_id]
-            
-            logger.info("Smart refinement completed successfully")
-            return segments
+        context = int(os.environ.get("SMART_REFINE_CONTEXT", 3))
+        # Per attempt, and for the whole chunk across retries (time queued for the rate limiter excluded)
+        timeout = float(os.environ.get("SMART_REFINE_TIMEOUT", 30))
+        total_timeout = float(os.environ.get("SMART_REFINE_TOTAL_TIMEOUT", 90))
+        semaphore = asyncio.Semaphore(int(os.environ.get("SMART_REFINE_CONCURRENCY", 4)))
 
-        except Exception as e:
-            logger.error(f"Smart refinement failed with exception: {e}")
+        # Simplify: pass only id, speaker, text
+        light_segments = [{"id": str(s.get("id", i)), "speaker": s["speaker"], "text": s["text"]} for i, s in enumerate(segments)]
+        windows = speaker_change_windows([s["speaker"] for s in light_segments], context, chunk_size)
+        if not windows:
             return segments
 
+        async def refine(window: range) -> Dict[str, str]:
+            chunk = [light_segments[i] for i in window]
+            allowed_speakers = {s["speaker"] for s in chunk}
+            async with semaphore:
+                try:
+                    response = await groq_client.acreate(
+                        "chat.completions",
+                        api_key=api_key,
+                        model=model,
+                        messages=[
+                            {"role": "system", "content": system_prompt},
+                            {"role": "user", "content": json.dumps(chunk, ensure_ascii=False)}
+                        ],
+                        response_format={"type": "json_object"},
+                        temperature=0.1,
+                        timeout=timeout,
+                        total_timeout=total_timeout
+                    )
+                    id_speaker_map = parse_speaker_map(response.choices[0].message.content)
+                except Exception as e:
+                    logger.error(f"Smart refinement chunk failed with exception: {e}")
+                    return {}
+            # Only accept labels for this chunk's segments and speakers that were already there
+            chunk_ids = {s["id"] for s in chunk}
+            return {
+                seg_id: speaker for seg_id, speaker in id_speaker_map.items()
+                if seg_id in chunk_ids and speaker in allowed_speakers
+            }
+
+        corrections: Dict[str, str] = {}
+        for chunk_map in await asyncio.gather(*(refine(w) for w in windows)):
+            corrections.update(chunk_map)
+
+        # Apply corrections
+        for i, seg in enumerate(segments):
+            # Use "id" if present, else index
+            seg_id = str(seg.get("id", i))
+            if seg_id in corrections:
+                seg["speaker"] = corrections[seg_id]
+
+        logger.info(f"Smart refinement completed: {len(windows)} chunks, {len(corrections)} segments checked")
+        return segments
+
+
+def speaker_change_windows(speakers: List[str], context: int, max_size: int) -> List[range]:
+    """
+    Returns index ranges covering `context` segments on each side of every speaker change,
+    merged when they overlap and split so no range exceeds max_size. Split ranges overlap by
+    `context` segments, so neighbours on either side of a cut are still seen together.
+    """
+    windows: List[List[int]] = []
+    for i in range(1, len(speakers)):
+        if speakers[i] == speakers[i - 1]:
+            continue
+        start, end = max(0, i - context), min(len(speakers), i + context)
+        if windows and start <= windows[-1][1]:
+            windows[-1][1] = max(windows[-1][1], end)
+        else:
+            windows.append([start, end])
+
+    chunks = []
+    step = max(1, max_size - context)
+    for start, end in windows:
+        chunk_start = start
+        while True:
+            chunk_end = min(end, chunk_start + max_size)
+            chunks.append(range(chunk_start, chunk_end))
+            if chunk_end >= end:
+                break
+            chunk_start += step
+    return chunks
+
+
+def parse_speaker_map(content: str) -> Dict[str, str]:
+    corrected_data = json.loads(content)
+
+    # Robust parsing for list or dict response
+    corrected_list = []
+    if isinstance(corrected_data, dict):
+        corrected_list = corrected_data.get("segments", corrected_data)
+        # If it's still a dict, maybe nested under another key? try to find first list value
+        if isinstance(corrected_list, dict):
+            for k, v in corrected_list.items():
+                if isinstance(v, list):
+                    corrected_list = v
+                    break
+    elif isinstance(corrected_data, list):
+        corrected_list = corrected_data
+
+    if not isinstance(corrected_list, list):
+        raise ValueError("LLM response is not a list")
+
+    # Create a map for ID -> Speaker
+    id_speaker_map = {}
+    for item in corrected_list:
+        if isinstance(item, dict) and "id" in item and "speaker" in item:
+            # Ensure ID is treated consistently (string/int)
+            id_speaker_map[str(item["id"])] = item["speaker"]
+    return id_speaker_map
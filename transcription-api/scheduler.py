@@ -0,0 +1,105 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+class PoolSaturated(Exception):
+    def __init__(self, device: str, retry_after: int):
+        super().__init__(f"inference queue for {device} is full, retry in {retry_after}s")
+        self.device = device
+        self.retry_after = retry_after
+
+class InferencePool:
+    """
+    Runs inference jobs on a fixed number of slots per device.
+    Jobs beyond the free slots wait in a bounded queue, once the queue is full new jobs are rejected
+    instead of oversubscribing the CPU/GPU.
+    """
+    def __init__(self, slots: Dict[str, int], queue_size: int, retry_after: int = 30):
+        self.slots = {device: max(1, n) for device, n in slots.items()}
+        self.queue_size = queue_size
+        self.retry_after = retry_after
+        self.executors = {
+            device: ThreadPoolExecutor(max_workers=n, thread_name_prefix=f"inference-{device}")
+            for device, n in self.slots.items()
+        }
+        self._lock = threading.Lock()
+        # Jobs submitted and not finished yet (running + queued), per device
+        self._pending = {device: 0 for device in self.slots}
+
+        self.completed = 0
+        self.rejected = 0
+        self.wait_seconds_total = 0.0
+        self.max_wait_seconds = 0.0
+
+    def check_capacity(self, device: str) -> None:
+        # Raises PoolSaturated if a job submitted now would be rejected
+        with self._lock:
+            if self._pending.get(device, 0) >= self.slots[device] + self.queue_size:
+                raise PoolSaturated(device, self.retry_after)
+
+    async def run(self, device: str, fn: Callable, *args):
+        if device not in self.executors:
+            raise ValueError(f"unknown inference device {device}")
+
+        with self._lock:
+            if self._pending[device] >= self.slots[device] + self.queue_size:
+                self.rejected += 1
+                raise PoolSaturated(device, self.retry_after)
+            self._pending[device] += 1
+
+        submitted = time.perf_counter()
+
+        def job():
+            waited = time.perf_counter() - submitted
+            with self._lock:
+                self.wait_seconds_total += waited
+                self.max_wait_seconds = max(self.max_wait_seconds, waited)
+            return fn(*args)
+
+        def release(_):
+            # Runs on completion and on cancellation of a job that never started
+            with self._lock:
+                self._pending[device] -= 1
+                self.completed += 1
+
+        future = self.executors[device].submit(job)
+        future.add_done_callback(release)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "devices": {
+                    device: {
+                        "slots": self.slots[device],
+                        "running": min(pending, self.slots[device]),
+                        "queued": max(0, pending - self.slots[device]),
+                    }
+                    for device, pending in self._pending.items()
+                },
+                "queue_size": self.queue_size,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "wait_seconds_total": round(self.wait_seconds_total, 3),
+                "max_wait_seconds": round(self.max_wait_seconds, 3),
+            }
+
+
+inference_pool = InferencePool(
+    slots={
+        "cpu": int(os.environ.get("INFERENCE_SLOTS_CPU", 1)),
+        "cuda": int(os.environ.get("INFERENCE_SLOTS_CUDA", 1)),
+        # Remote API backends (groq:) barely use local resources
+        "remote": int(os.environ.get("INFERENCE_SLOTS_REMOTE", 8)),
+        # Pyannote runs next to ASR, one slot per pooled pipeline
+        "diarization": int(os.environ.get("DIARIZATION_SLOTS", os.environ.get("PYANNOTE_POOL_SIZE", 1))),
+    },
+    queue_size=int(os.environ.get("INFERENCE_QUEUE_SIZE", 16)),
+    retry_after=int(os.environ.get("INFERENCE_RETRY_AFTER", 30)),
+)
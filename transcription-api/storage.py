@@ -0,0 +1,109 @@
+import os
+import hashlib
+import asyncio
+import logging
+from typing import Optional, Tuple
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+import metrics
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_CHUNK_SIZE = int(os.environ.get("UPLOAD_CHUNK_SIZE_KB", 1024)) * 1024
+MAX_UPLOAD_SIZE = int(os.environ.get("MAX_UPLOAD_SIZE_MB", 0)) * 1024 * 1024  # 0 = unlimited
+
+class UploadTooLarge(Exception):
+    def __init__(self, max_bytes: int):
+        super().__init__(f"upload exceeds the maximum size of {max_bytes // (1024 * 1024)} MB")
+        self.max_bytes = max_bytes
+
+async def save_upload(file, file_path: str, max_bytes: int = MAX_UPLOAD_SIZE) -> Tuple[str, int]:
+    """
+    Streams an UploadFile to disk in fixed-size chunks, hashing it on the fly.
+    Returns the SHA-256 hex digest and the number of bytes written.
+    """
+    # Reject before copying anything if the size is already known
+    known_size = getattr(file, "size", None)
+    if max_bytes and known_size and known_size > max_bytes:
+        raise UploadTooLarge(max_bytes)
+
+    sha256 = hashlib.sha256()
+    written = 0
+    try:
+        with open(file_path, "wb") as buffer:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if max_bytes and written > max_bytes:
+                    raise UploadTooLarge(max_bytes)
+                sha256.update(chunk)
+                await asyncio.to_thread(buffer.write, chunk)
+    except BaseException:
+        # Don't leave partial uploads behind
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+    return sha256.hexdigest(), written
+
+def hash_file(file_path: str) -> str:
+    sha256 = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+S3_MAX_CONCURRENCY = int(os.environ.get("S3_MAX_CONCURRENCY", 8))
+S3_UPLOAD_ATTEMPTS = int(os.environ.get("S3_UPLOAD_ATTEMPTS", 3))
+
+# Initialize S3 Client
+s3_client = boto3.client(
+    's3',
+    endpoint_url=os.environ.get("S3_ENDPOINT"),
+    aws_access_key_id=os.environ.get("S3_ACCESS_KEY_ID"),
+    aws_secret_access_key=os.environ.get("S3_SECRET_ACCESS_KEY"),
+    region_name=os.environ.get("S3_REGION"),
+    config=Config(
+        retries={"max_attempts": 5, "mode": "adaptive"},
+        max_pool_connections=max(10, S3_MAX_CONCURRENCY),
+    )
+)
+BUCKET_NAME = os.environ.get("S3_BUCKET_NAME")
+
+# Large media is sent as parallel multipart uploads
+CHUNK_SIZE = int(os.environ.get("S3_MULTIPART_CHUNK_MB", 16)) * 1024 * 1024
+transfer_config = TransferConfig(
+    multipart_threshold=CHUNK_SIZE,
+    multipart_chunksize=CHUNK_SIZE,
+    max_concurrency=S3_MAX_CONCURRENCY,
+    use_threads=True,
+)
+
+async def upload_to_s3(file_path: str, object_name: str) -> Optional[str]:
+    for attempt in range(S3_UPLOAD_ATTEMPTS):
+        try:
+            # boto3 is synchronous, run the transfer off the event loop
+            with metrics.stage("s3_upload"):
+                await asyncio.to_thread(
+                    s3_client.upload_file, file_path, BUCKET_NAME, object_name, Config=transfer_config
+                )
+            endpoint = os.environ.get("S3_ENDPOINT", "")
+            if "backblaze" in endpoint:
+                return f"{endpoint}/{BUCKET_NAME}/{object_name}"
+            return object_name
+        except Exception as e:
+            if attempt == S3_UPLOAD_ATTEMPTS - 1:
+                logger.error(f"S3 Upload Error after {S3_UPLOAD_ATTEMPTS} attempts: {e}")
+                return None
+            wait_time = 2 ** attempt
+            logger.warning(f"S3 Upload Error (attempt {attempt+1}/{S3_UPLOAD_ATTEMPTS}): {e}. Retrying in {wait_time}s...")
+            await asyncio.sleep(wait_time)
+
+async def delete_from_s3(object_name: str) -> None:
+    try:
+        await asyncio.to_thread(s3_client.delete_object, Bucket=BUCKET_NAME, Key=object_name)
+    except Exception as e:
+        logger.error(f"S3 delete of {object_name} failed: {e}")
@@ -0,0 +1,228 @@
+import os
+import json
+import time
+import queue
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+import metrics
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+class SupabaseWriter:
+    """
+    Writes rows to Supabase from a background thread, so requests never wait on the database.
+    Rows are batched per (user token, table) into a single insert, using one long-lived client.
+    Rows without a token are written with the service-role client.
+    Rows that fail are appended to a local JSONL spool and retried periodically and on restart,
+    until they succeed or run out of attempts (delivery is at least once). The spool never holds
+    tokens, which expire anyway: it keeps the row and its user id, replayed with the service-role
+    client. Without one, failed rows are dropped.
+    """
+    def __init__(self,
+                 client_factory: Callable[[], object],
+                 spool_path: str,
+                 service_client_factory: Optional[Callable[[], object]] = None,
+                 batch_size: int = 100,
+                 flush_interval: float = 2.0,
+                 retry_interval: float = 30.0,
+                 max_attempts: int = 10):
+        self.client_factory = client_factory
+        self.service_client_factory = service_client_factory
+        self.spool_path = spool_path
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.retry_interval = retry_interval
+        self.max_attempts = max_attempts
+        self._queue: "queue.Queue" = queue.Queue()
+        self._client = None
+        self._service_client = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        self.written = 0
+        self.failed = 0
+        self.spooled = 0
+        self.dropped = 0
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="supabase-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        # Flushes what is queued, anything still failing stays in the spool for the next start
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def insert(self, table: str, row: Dict, token: Optional[str], user_id: str) -> None:
+        """
+        Queues a row of user_id for insertion with the user's access token (for row level security),
+        or with the service-role client when there is no token. Never blocks.
+        """
+        self._queue.put({"table": table, "row": row, "token": token, "user_id": user_id, "attempts": 0})
+
+    def _run(self) -> None:
+        next_replay = 0.0
+        while True:
+            batch, stopping = self._collect()
+            if batch:
+                self._write(batch)
+            if stopping:
+                return
+            if time.monotonic() >= next_replay:
+                self._replay()
+                next_replay = time.monotonic() + self.retry_interval
+
+    def _collect(self):
+        # Waits for a first row, then gathers more until the batch is full or flush_interval passed
+        try:
+            first = self._queue.get(timeout=self.retry_interval)
+        except queue.Empty:
+            return [], False
+        if first is _STOP:
+            return [], True
+
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                record = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if record is _STOP:
+                return batch, True
+            batch.append(record)
+        return batch, False
+
+    def _write(self, records: List[Dict]) -> None:
+        groups: "OrderedDict[tuple, List[Dict]]" = OrderedDict()
+        for record in records:
+            groups.setdefault((record["token"], record["table"]), []).append(record)
+
+        failed = []
+        for (token, table), group in groups.items():
+            try:
+                client = self._client_for(token)
+                # The owner is set explicitly, the service role isn't bound to a user
+                rows = [{**record["row"], "user_id": record["user_id"]} if record.get("user_id") else record["row"] for record in group]
+                with metrics.stage("db_write"):
+                    client.table(table).insert(rows).execute()
+                with self._lock:
+                    self.written += len(group)
+            except Exception as e:
+                logger.warning(f"Supabase insert of {len(group)} rows into {table} failed: {e}")
+                failed.extend(group)
+
+        if failed:
+            with self._lock:
+                self.failed += len(failed)
+            self._spool(failed)
+
+    def _client_for(self, token: Optional[str]):
+        if token is None:
+            if self.service_client_factory is None:
+                raise RuntimeError("no service-role client configured")
+            if self._service_client is None:
+                self._service_client = self.service_client_factory()
+            return self._service_client
+        if self._client is None:
+            self._client = self.client_factory()
+        # Single writer thread, so switching the session's token between groups is safe
+        self._client.postgrest.auth(token)
+        return self._client
+
+    def _spool(self, records: List[Dict]) -> None:
+        keep = []
+        for record in records:
+            # Only the row and its owner are kept, replays use the service-role client
+            record = {
+                "table": record["table"],
+                "row": record["row"],
+                "user_id": record.get("user_id") or record["row"].get("user_id"),
+                "token": None,
+                "attempts": record["attempts"] + 1,
+            }
+            if self.service_client_factory is None:
+                logger.error(f"Dropping {record['table']} row, replaying it needs a service-role client")
+                with self._lock:
+                    self.dropped += 1
+                continue
+            if record["attempts"] >= self.max_attempts:
+                logger.error(f"Dropping {record['table']} row after {record['attempts']} failed attempts")
+                with self._lock:
+                    self.dropped += 1
+                continue
+            keep.append(record)
+        if not keep:
+            return
+
+        try:
+            # The spool holds transcripts, keep it private
+            fd = os.open(self.spool_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+            with os.fdopen(fd, "a", encoding="utf-8") as f:
+                for record in keep:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            with self._lock:
+                self.spooled += len(keep)
+        except OSError as e:
+            logger.error(f"Failed to spool {len(keep)} Supabase rows, they are lost: {e}")
+
+    def _replay(self) -> None:
+        # A leftover .replay file means the process stopped mid-replay, it is retried first
+        replay_path = f"{self.spool_path}.replay"
+        if not os.path.exists(replay_path):
+            if not os.path.exists(self.spool_path):
+                return
+            os.replace(self.spool_path, replay_path)
+
+        records = []
+        with open(replay_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Torn write from a crash
+                    continue
+                # Spooled rows are always replayed with the service-role client
+                record["token"] = None
+                records.append(record)
+
+        if records:
+            logger.info(f"Retrying {len(records)} spooled Supabase rows")
+        for start in range(0, len(records), self.batch_size):
+            self._write(records[start:start + self.batch_size])
+        # Rows that failed again are back in the spool
+        os.remove(replay_path)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "queued": self._queue.qsize(),
+                "written": self.written,
+                "failed": self.failed,
+                "spooled": self.spooled,
+                "dropped": self.dropped,
+            }
+
+
+def create_supabase_writer(client_factory: Callable[[], object],
+                           service_client_factory: Optional[Callable[[], object]] = None) -> SupabaseWriter:
+    spool_path = os.environ.get("SUPABASE_SPOOL_FILE") or os.path.join(os.environ.get("UPLOAD_DIR", "/tmp"), ".supabase-spool.jsonl")
+    return SupabaseWriter(
+        client_factory,
+        spool_path,
+        service_client_factory=service_client_factory,
+        batch_size=int(os.environ.get("SUPABASE_BATCH_SIZE", 100)),
+        flush_interval=float(os.environ.get("SUPABASE_FLUSH_INTERVAL", 2)),
+        retry_interval=float(os.environ.get("SUPABASE_RETRY_INTERVAL", 30)),
+        max_attempts=int(os.environ.get("SUPABASE_WRITE_ATTEMPTS", 10)),
+    )
@@ -0,0 +1,94 @@
+import hmac
+import json
+import time
+import base64
+import asyncio
+import hashlib
+import unittest
+from auth import TokenValidator, TokenCache, verify_hs256
+
+SECRET = "super-secret-jwt-token"
+
+def b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+def make_token(claims: dict, secret: str = SECRET, alg: str = "HS256") -> str:
+    header = b64(json.dumps({"alg": alg, "typ": "JWT"}).encode())
+    payload = b64(json.dumps(claims).encode())
+    signature = b64(hmac.new(secret.encode(), f"{header}.{payload}".encode(), hashlib.sha256).digest())
+    return f"{header}.{payload}.{signature}"
+
+class FakeUser:
+    def __init__(self, id):
+        self.id = id
+
+class TestTokenValidator(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+
+    def fetch_user(self, token):
+        self.calls.append(token)
+        time.sleep(0.01)
+        return FakeUser("remote-user")
+
+    def test_remote_lookup_is_cached_and_shared(self):
+        validator = TokenValidator(self.fetch_user)
+        token = make_token({"sub": "u1", "exp": time.time() + 3600})
+
+        async def scenario():
+            # Concurrent first requests share a single lookup
+            users = await asyncio.gather(*(validator.validate(token) for _ in range(5)))
+            users.append(await validator.validate(token))
+            return users
+
+        users = asyncio.run(scenario())
+        self.assertEqual(len(self.calls), 1)
+        self.assertTrue(all(u.id == "remote-user" for u in users))
+
+    def test_local_verification_skips_supabase(self):
+        validator = TokenValidator(self.fetch_user, secret=SECRET)
+        user = asyncio.run(validator.validate(make_token({"sub": "u1", "email": "a@b.c", "aud": "authenticated", "exp": time.time() + 3600})))
+        self.assertEqual(user.id, "u1")
+        self.assertEqual(user.email, "a@b.c")
+        self.assertEqual(self.calls, [])
+
+        forged = make_token({"sub": "u1", "aud": "authenticated", "exp": time.time() + 3600}, secret="wrong")
+        self.assertIsNone(asyncio.run(validator.validate(forged)))
+        self.assertIsNone(verify_hs256(forged, SECRET))
+
+    def test_local_verification_checks_claims(self):
+        validator = TokenValidator(self.fetch_user, secret=SECRET)
+        now = time.time()
+        rejected = [
+            {"sub": "u1", "aud": "authenticated"},
+            {"sub": "u1", "aud": "authenticated", "exp": now + 3600, "nbf": now + 600},
+            {"sub": "u1", "aud": "anon", "exp": now + 3600},
+            {"sub": "u1", "exp": now + 3600},
+        ]
+        for claims in rejected:
+            self.assertIsNone(asyncio.run(validator.validate(make_token(claims))), claims)
+
+        accepted = make_token({"sub": "u1", "aud": ["authenticated", "other"], "exp": now + 3600, "nbf": now - 1})
+        self.assertEqual(asyncio.run(validator.validate(accepted)).id, "u1")
+        self.assertEqual(self.calls, [])
+
+    def test_expired_tokens_are_rejected_without_lookup(self):
+        validator = TokenValidator(self.fetch_user)
+        self.assertIsNone(asyncio.run(validator.validate(make_token({"sub": "u1", "exp": time.time() - 1}))))
+        self.assertEqual(self.calls, [])
+
+    def test_cache_respects_exp_and_size(self):
+        cache = TokenCache(max_entries=2, ttl=300)
+        cache.put("a", "user-a", exp=time.time() + 0.05)
+        cache.put("b", "user-b")
+        cache.put("c", "user-c")
+        # "a" was the least recently used entry
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("b"), "user-b")
+
+        cache.put("d", "user-d", exp=time.time() + 0.05)
+        time.sleep(0.06)
+        self.assertIsNone(cache.get("d"))
+
+if __name__ == '__main__':
+    unittest.main()
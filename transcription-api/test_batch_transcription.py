@@ -0,0 +1,69 @@
+import os
+import asyncio
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+from fake_modules import PIPELINE, mock_modules
+
+# Mock the audio, model and storage dependencies only while the pipeline is imported
+with mock_modules(*PIPELINE):
+    import transcribe
+    from backends.fasterwhisper import split_by_clip
+    from cache import ResultCache
+
+def word(text, start, end):
+    # Same keys as to_segment produces
+    return {"word": text, "start": start, "end": end, "score": 1.0}
+
+class TestSplitByClip(unittest.TestCase):
+    def test_shifts_and_splits_segments(self):
+        segments = [
+            {"id": "a", "text": " one two", "start": 0.5, "end": 2.0, "score": 0.9, "words": [word(" one", 0.5, 1.0), word(" two", 1.2, 2.0)]},
+            # Decoded across the gap between the first and second clip
+            {"id": "b", "text": " three four", "start": 2.5, "end": 11.0, "score": 0.9, "words": [word(" three", 2.5, 3.0), word(" four", 10.5, 11.0)]},
+            {"id": "c", "text": " five", "start": 21.0, "end": 22.0, "score": 0.9, "words": []},
+        ]
+        first, second, third = split_by_clip(segments, [0.0, 10.0, 20.0])
+
+        self.assertEqual([s["text"] for s in first], [" one two", " three"])
+        self.assertEqual(first[0]["id"], "a")
+        self.assertEqual((first[1]["start"], first[1]["end"]), (2.5, 3.0))
+        self.assertEqual([s["text"] for s in second], [" four"])
+        self.assertEqual(second[0]["words"][0], word(" four", 0.5, 1.0))
+        self.assertEqual((third[0]["start"], third[0]["end"]), (1.0, 2.0))
+
+class TestBatchCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        with open(os.path.join(self.tmp.name, "voicemail.ogg"), "wb") as f:
+            f.write(b"media")
+        patcher = patch.dict(os.environ, {"UPLOAD_DIR": self.tmp.name})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_repeated_batch_of_clips_hits_the_cache(self):
+        cache = ResultCache(os.path.join(self.tmp.name, "cache"), max_bytes=0)
+        backend = MagicMock()
+        backend.transcribe_clips.side_effect = lambda clips, *args: [
+            {"text": " hello", "segments": [], "language": "en", "duration": 3.0} for _ in clips
+        ]
+
+        with patch.object(transcribe, "result_cache", cache), \
+             patch.object(transcribe, "language_detector", None), \
+             patch.object(transcribe, "media_duration", return_value=3.0), \
+             patch.object(transcribe, "load_audio", return_value=[0.0] * 16), \
+             patch.object(transcribe, "FasterWhisperBackend", return_value=backend):
+            # Default options, so the request's batch size differs from the packing one
+            first = asyncio.run(transcribe.transcribe_batch(["voicemail.ogg"], "small", "en"))
+            second = asyncio.run(transcribe.transcribe_batch(["voicemail.ogg"], "small", "en"))
+
+        self.assertEqual(backend.transcribe_clips.call_count, 1)
+        self.assertEqual(first[0]["result"]["text"], " hello")
+        self.assertEqual(second[0]["result"]["text"], " hello")
+        self.assertEqual(cache.stats()["hits"], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,8 +6,11 @@ from unittest.mock import MagicMock
 sys.modules["groq"] = MagicMock()
 sys.modules["torch"] = MagicMock()
 
+import random
+import threading
+import time
 import unittest
-from processors.diarizer import PyannoteDiarizer
+from processors.diarizer import PyannoteDiarizer, PyannotePipelinePool, SpeakerTurnIndex, speaker_change_windows
 
 # Mock classes to simulate Pyannote output
 class MockTurn:
@@ -75,5 +78,127 @@ class TestPyannoteAlignment(unittest.TestCase):
         
         print("Test passed!")
 
+def linear_find_speaker(turns, start, end):
+    # Reference implementation: scan every turn
+    max_overlap = 0
+    best_speaker = None
+    for turn_start, turn_end, speaker in turns:
+        overlap_duration = max(0, min(end, turn_end) - max(start, turn_start))
+        if overlap_duration > max_overlap:
+            max_overlap = overlap_duration
+            best_speaker = speaker
+    return best_speaker
+
+class VisitCounter(list):
+    def __init__(self, values, visited):
+        super().__init__(values)
+        self.visited = visited
+
+    def __getitem__(self, i):
+        self.visited.append(i)
+        return super().__getitem__(i)
+
+class TestSpeakerTurnIndex(unittest.TestCase):
+    def test_matches_linear_scan(self):
+        rng = random.Random(42)
+        for _ in range(50):
+            turns = []
+            for _ in range(rng.randint(0, 40)):
+                start = round(rng.uniform(0, 100), 1)
+                turns.append((start, round(start + rng.uniform(0, 15), 1), rng.choice(["A", "B", "C"])))
+            # Unsorted, overlapping turns with ties on purpose
+            rng.shuffle(turns)
+            index = SpeakerTurnIndex(turns)
+            for _ in range(100):
+                start = round(rng.uniform(-5, 110), 1)
+                end = round(start + rng.uniform(0, 5), 1)
+                self.assertEqual(index.find_speaker(start, end), linear_find_speaker(turns, start, end))
+
+    def test_empty(self):
+        self.assertIsNone(SpeakerTurnIndex([]).find_speaker(0.0, 1.0))
+
+    def test_long_overlapping_turn(self):
+        rng = random.Random(7)
+        # A turn spanning the whole recording under thousands of short ones
+        turns = [(0.0, 10800.0, "LONG")]
+        t = 0.0
+        while t < 10800:
+            length = rng.uniform(1, 10)
+            turns.append((t, t + length, rng.choice(["A", "B"])))
+            t += length
+        index = SpeakerTurnIndex(turns)
+        for _ in range(500):
+            start = rng.uniform(0, 10790)
+            end = start + rng.uniform(0.1, 1)
+            self.assertEqual(index.find_speaker(start, end), linear_find_speaker(turns, start, end))
+
+        visited = []
+        ends = index.ends
+        index.ends = VisitCounter(ends, visited)
+        index.find_speaker(10000.0, 10000.5)
+        # Only a short walk back plus the turns that reach the range are scored
+        self.assertLess(len(visited), 2 * SpeakerTurnIndex.WALK)
+
+class TestSmartRefineWindows(unittest.TestCase):
+    def test_only_speaker_changes_are_selected(self):
+        speakers = ["A"] * 10 + ["B"] * 10 + ["A"] * 2 + ["B"] * 20
+        windows = speaker_change_windows(speakers, context=2, max_size=50)
+        # Changes at 10, 20 and 22; the last two are close enough to merge
+        self.assertEqual(windows, [range(8, 12), range(18, 24)])
+
+    def test_no_changes(self):
+        self.assertEqual(speaker_change_windows(["A"] * 5, context=2, max_size=50), [])
+
+    def test_long_windows_are_split(self):
+        speakers = ["A", "B"] * 30
+        windows = speaker_change_windows(speakers, context=2, max_size=25)
+        self.assertEqual(windows, [range(0, 25), range(23, 48), range(46, 60)])
+        # Every pair of neighbours is shown to the LLM together in some chunk
+        for i in range(59):
+            self.assertTrue(any(i in w and i + 1 in w for w in windows), i)
+
+class TestPipelinePool(unittest.TestCase):
+    def test_waiter_retries_after_failed_build(self):
+        pool = PyannotePipelinePool(size=1)
+        building = threading.Event()
+        release = threading.Event()
+        pipeline = object()
+        calls = []
+
+        def build(auth_token):
+            calls.append(auth_token)
+            if len(calls) == 1:
+                building.set()
+                release.wait(5)
+                raise RuntimeError("load failed")
+            return pipeline
+
+        pool._build = build
+        results = {}
+
+        def use(name):
+            with pool.acquire(name) as acquired:
+                results[name] = acquired
+
+        first = threading.Thread(target=use, args=("a",))
+        first.start()
+        building.wait(5)
+        # Blocks on the only slot, which is being built by the first thread
+        second = threading.Thread(target=use, args=("b",))
+        second.start()
+        for _ in range(500):
+            if pool._available._waiters:
+                break
+            time.sleep(0.01)
+        release.set()
+        first.join(5)
+        second.join(5)
+
+        self.assertFalse(second.is_alive())
+        self.assertIsNone(results["a"])
+        self.assertIs(results["b"], pipeline)
+        self.assertEqual(pool.stats()["created"], 1)
+        self.assertEqual(pool.stats()["idle"], 1)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,101 @@
+import time
+import threading
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import unittest
+from fake_modules import AUDIO, S3, mock_modules
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Mock the audio and API dependencies only while the backend is imported
+with mock_modules("groq", "torch", *AUDIO, *S3):
+    import backends.groq_backend as groq_backend
+    from backends.groq_backend import GroqBackend, stitch_transcriptions
+    from audio import SAMPLE_RATE as SR, quietest_point, split_on_silence
+
+def completion(chunk: int):
+    return SimpleNamespace(
+        text=f" chunk {chunk} ",
+        language="en",
+        duration=10.0,
+        segments=[{
+            "text": f"chunk {chunk}", "start": 1.0, "end": 2.0,
+            "words": [{"word": "chunk", "start": 1.0, "end": 1.5}],
+        }],
+    )
+
+class TestGroqChunking(unittest.TestCase):
+    def test_chunks_run_concurrently_and_are_stitched_with_offsets(self):
+        backend = GroqBackend.__new__(GroqBackend)
+        backend.model_size = "whisper-large-v3"
+        ranges = [(0, 10 * SR), (10 * SR, 25 * SR), (25 * SR, 30 * SR)]
+
+        in_flight = {"now": 0, "max": 0}
+        lock = threading.Lock()
+
+        def create(endpoint, file, **params):
+            with lock:
+                in_flight["now"] += 1
+                in_flight["max"] = max(in_flight["max"], in_flight["now"])
+            # Later chunks answer first
+            time.sleep(0.05 * (3 - file.index))
+            with lock:
+                in_flight["now"] -= 1
+            return completion(file.index)
+
+        progress = []
+
+        with patch.object(groq_backend.groq_client, "create", side_effect=create), \
+             patch.object(groq_backend, "split_on_silence", return_value=ranges), \
+             patch.object(groq_backend, "encode_flac", side_effect=lambda audio, name: SimpleNamespace(index=int(name[5]))):
+            result = backend._transcribe_chunks([0.0] * (30 * SR), "en", "transcribe", progress.append)
+
+        self.assertGreater(in_flight["max"], 1)
+        self.assertEqual(result["text"], "chunk 0 chunk 1 chunk 2")
+        self.assertEqual(result["duration"], 30.0)
+        self.assertEqual([s["start"] for s in result["segments"]], [1.0, 11.0, 26.0])
+        self.assertEqual([s["words"][0]["end"] for s in result["segments"]], [1.5, 11.5, 26.5])
+        self.assertEqual(progress[-1], 1.0)
+
+    def test_stitch_skips_empty_chunks(self):
+        parts = [
+            {"text": " hello", "language": "de", "segments": [{"start": 0.0}]},
+            {"text": "  ", "language": "de", "segments": []},
+            {"text": "world ", "language": "de", "segments": [{"start": 700.0}]},
+        ]
+        result = stitch_transcriptions(parts, 1200.0)
+        self.assertEqual(result["text"], "hello world")
+        self.assertEqual(result["language"], "de")
+        self.assertEqual(len(result["segments"]), 2)
+
+@unittest.skipIf(np is None, "numpy is not installed")
+class TestSilenceCut(unittest.TestCase):
+    frame = SR // 50
+
+    def speech(self, seconds: float, *gaps):
+        # Constant signal with silent (start, end) gaps in seconds
+        audio = np.full(int(seconds * SR), 0.5, dtype=np.float32)
+        for start, end in gaps:
+            audio[int(start * SR):int(end * SR)] = 0.0
+        return audio
+
+    def test_cut_lands_in_the_middle_of_the_first_silent_frame(self):
+        audio = self.speech(2.0, (1.2, 1.3))
+        self.assertEqual(quietest_point(audio, SR, 2 * SR, self.frame), int(1.2 * SR) + self.frame // 2)
+
+    def test_range_shorter_than_a_frame_cuts_at_the_limit(self):
+        audio = self.speech(2.0, (0.5, 0.6))
+        self.assertEqual(quietest_point(audio, SR, SR + self.frame - 1, self.frame), SR + self.frame - 1)
+
+    def test_chunks_end_in_pauses(self):
+        audio = self.speech(10.0, (3.0, 3.1), (6.5, 6.6))
+        ranges = split_on_silence(audio, max_samples=4 * SR, search_samples=2 * SR, frame_samples=self.frame)
+        # The second search starts off the frame grid, the first fully silent frame wins
+        self.assertEqual(ranges, [(0, 48160), (48160, 104320), (104320, 10 * SR)])
+
+if __name__ == '__main__':
+    unittest.main()
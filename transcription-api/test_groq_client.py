@@ -0,0 +1,128 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+from fake_modules import mock_modules
+
+# Mock groq only while the client is imported
+with mock_modules("groq"):
+    import groq_client
+    from groq_client import GroqRateLimiter, TokenBucket, parse_duration
+
+class FakeRateLimitError(Exception):
+    def __init__(self, retry_after):
+        super().__init__("rate limited")
+        self.response = SimpleNamespace(headers={"retry-after": retry_after})
+
+class FakeServerError(Exception):
+    pass
+
+def raw_response(payload, headers=None):
+    return SimpleNamespace(headers=headers or {}, parse=lambda: payload)
+
+class TestRateLimiting(unittest.TestCase):
+    def test_parse_duration(self):
+        self.assertEqual(parse_duration("7.5"), 7.5)
+        self.assertAlmostEqual(parse_duration("2m59.56s"), 179.56)
+        self.assertAlmostEqual(parse_duration("450ms"), 0.45)
+        self.assertAlmostEqual(parse_duration("1h2m"), 3720)
+        self.assertIsNone(parse_duration(None))
+        self.assertIsNone(parse_duration("soon"))
+
+    def test_bucket_queues_requests_beyond_burst(self):
+        bucket = TokenBucket(per_minute=60, burst=2)
+        now = bucket.updated
+        delays = [bucket.reserve(now) for _ in range(4)]
+        # Two immediate requests, then one per second
+        self.assertEqual(delays[:2], [0.0, 0.0])
+        self.assertAlmostEqual(delays[2], 1.0)
+        self.assertAlmostEqual(delays[3], 2.0)
+
+    def test_headers_tighten_the_budget(self):
+        limiter = GroqRateLimiter(per_minute=600, burst=10)
+        limiter.observe("whisper-large-v3", {"x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "3s"})
+        self.assertGreaterEqual(limiter.reserve("whisper-large-v3"), 2.9)
+        # Other models keep their own budget
+        self.assertEqual(limiter.reserve("llama-3.3-70b-versatile"), 0.0)
+
+class TestCreate(unittest.TestCase):
+    def setUp(self):
+        self.limiter = GroqRateLimiter(per_minute=6000, burst=10)
+        self.sleeps = []
+        patches = [
+            patch.object(groq_client, "rate_limiter", self.limiter),
+            patch.object(groq_client, "RateLimitError", FakeRateLimitError),
+            patch.object(groq_client, "InternalServerError", FakeServerError),
+            patch.object(groq_client, "APIConnectionError", FakeServerError),
+            patch.object(groq_client.time, "sleep", side_effect=self.sleeps.append),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+        self.api = MagicMock()
+        client = patch.object(groq_client, "client", return_value=self.api)
+        client.start()
+        self.addCleanup(client.stop)
+
+    def test_rate_limited_request_waits_out_retry_after(self):
+        file = MagicMock()
+        create = self.api.audio.transcriptions.with_raw_response.create
+        create.side_effect = [FakeRateLimitError("2"), raw_response("ok")]
+
+        result = groq_client.create("audio.transcriptions", model="whisper-large-v3", file=file)
+
+        self.assertEqual(result, "ok")
+        self.assertEqual(create.call_count, 2)
+        # The retry waited for the pause the 429 put on the model's bucket
+        self.assertGreaterEqual(max(self.sleeps), 1.9)
+        self.assertEqual(file.seek.call_count, 2)
+        stats = self.limiter.stats()
+        self.assertEqual(stats["throttled"], 1)
+        self.assertEqual(stats["retries"], 1)
+
+    def test_gives_up_after_max_attempts(self):
+        create = self.api.chat.completions.with_raw_response.create
+        create.side_effect = FakeServerError("boom")
+        with self.assertRaises(FakeServerError):
+            groq_client.create("chat.completions", model="llama-3.3-70b-versatile")
+        self.assertEqual(create.call_count, groq_client.MAX_ATTEMPTS)
+
+class TestAsync(unittest.TestCase):
+    def test_total_timeout_caps_retries(self):
+        api = MagicMock()
+
+        async def slow_create(**params):
+            await asyncio.sleep(1)
+
+        api.chat.completions.with_raw_response.create = slow_create
+        with patch.object(groq_client, "async_client", return_value=api), \
+             patch.object(groq_client, "rate_limiter", GroqRateLimiter(per_minute=6000, burst=10)), \
+             patch.multiple(groq_client, RateLimitError=FakeRateLimitError, InternalServerError=FakeServerError, APIConnectionError=FakeServerError):
+            with self.assertRaises(asyncio.TimeoutError):
+                asyncio.run(groq_client.acreate("chat.completions", model="llama-3.3-70b-versatile", timeout=20.0, total_timeout=0.05))
+
+    def test_rate_limit_waits_do_not_count_against_total_timeout(self):
+        api = MagicMock()
+
+        async def create(**params):
+            return raw_response("ok")
+
+        api.chat.completions.with_raw_response.create = create
+        limiter = GroqRateLimiter(per_minute=6000, burst=10)
+        limiter.throttle("llama-3.3-70b-versatile", 0.2, 0)
+        with patch.object(groq_client, "async_client", return_value=api), \
+             patch.object(groq_client, "rate_limiter", limiter):
+            result = asyncio.run(groq_client.acreate("chat.completions", model="llama-3.3-70b-versatile", total_timeout=0.05))
+        self.assertEqual(result, "ok")
+
+    def test_worker_threads_share_one_loop(self):
+        async def current_loop():
+            return asyncio.get_running_loop()
+
+        first = groq_client.run(current_loop())
+        self.assertIs(groq_client.run(current_loop()), first)
+        self.assertTrue(first.is_running())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import asyncio
+import os
+import sqlite3
+import tempfile
+import unittest
+from jobs import JobStore, JobRunner, JobStatus
+
+class TestJobStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = JobStore(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_lifecycle(self):
+        job_id = self.store.create("audio.mp3", {"model_size": "tiny"})
+        self.assertEqual(self.store.get(job_id)["status"], JobStatus.pending)
+
+        job = self.store.claim_next()
+        self.assertEqual(job["id"], job_id)
+        self.assertEqual(job["status"], JobStatus.running)
+        self.assertEqual(job["params"], {"model_size": "tiny"})
+        self.assertIsNone(self.store.claim_next())
+
+        self.store.set_progress(job_id, 0.5)
+        self.assertEqual(self.store.get(job_id)["progress"], 0.5)
+
+        self.store.complete(job_id, {"text": "hello"})
+        self.assertEqual(self.store.get(job_id)["status"], JobStatus.done)
+        self.assertEqual(self.store.counts(), {JobStatus.done: 1})
+        self.assertEqual(self.store.result(job_id), {"text": "hello"})
+
+    def test_interrupted_jobs_are_requeued(self):
+        job_id = self.store.create("audio.mp3", {})
+        self.store.claim_next()
+
+        # Simulate a restart
+        store = JobStore(self.tmp.name)
+        self.assertEqual(store.requeue_running(), 1)
+        self.assertEqual(store.claim_next()["id"], job_id)
+
+    def test_owner_and_upload_are_persisted(self):
+        job_id = self.store.create("audio.mp3", {}, "user-1")
+        self.assertIsNone(self.store.get(job_id)["s3_url"])
+        self.store.set_s3_url(job_id, "https://bucket/audio.mp3")
+
+        # Survives a restart
+        job = JobStore(self.tmp.name).claim_next()
+        self.assertEqual(job["user_id"], "user-1")
+        self.assertEqual(job["s3_url"], "https://bucket/audio.mp3")
+        self.assertIsNone(self.store.get(self.store.create("internal.mp3", {}))["user_id"])
+
+    def test_existing_database_gains_new_columns(self):
+        with tempfile.TemporaryDirectory() as directory:
+            db = sqlite3.connect(os.path.join(directory, "jobs.db"))
+            db.execute(
+                "CREATE TABLE jobs (id TEXT PRIMARY KEY, status TEXT NOT NULL, filename TEXT NOT NULL, params TEXT NOT NULL, "
+                "progress REAL NOT NULL DEFAULT 0, error TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            db.execute("INSERT INTO jobs (id, status, filename, params, created_at, updated_at) VALUES ('old', 'pending', 'a.mp3', '{}', 0, 0)")
+            db.commit()
+            db.close()
+
+            store = JobStore(directory)
+            self.assertIsNone(store.get("old")["user_id"])
+            self.assertEqual(store.get(store.create("b.mp3", {}, "user-1"))["user_id"], "user-1")
+
+    def test_runner_records_results_and_errors(self):
+        ok = self.store.create("ok.mp3", {})
+        bad = self.store.create("bad.mp3", {})
+
+        async def handler(job, progress):
+            progress(1.0)
+            if job["filename"] == "bad.mp3":
+                raise RuntimeError("decode failed")
+            return {"text": job["filename"]}
+
+        async def scenario():
+            runner = JobRunner(self.store, handler)
+            runner.start()
+            for _ in range(100):
+                if all(self.store.get(j)["status"] in (JobStatus.done, JobStatus.error) for j in (ok, bad)):
+                    break
+                await asyncio.sleep(0.01)
+            for task in runner._tasks:
+                task.cancel()
+
+        asyncio.run(scenario())
+        self.assertEqual(self.store.result(ok), {"text": "ok.mp3"})
+        self.assertEqual(self.store.get(bad)["status"], JobStatus.error)
+        self.assertEqual(self.store.get(bad)["error"], "decode failed")
+
+    def test_store_errors_fail_the_job_and_keep_the_worker(self):
+        first = self.store.create("first.mp3", {})
+        second = self.store.create("second.mp3", {})
+        complete = self.store.complete
+
+        def complete_or_disk_full(job_id, result):
+            if job_id == first:
+                raise OSError("No space left on device")
+            complete(job_id, result)
+        self.store.complete = complete_or_disk_full
+
+        async def handler(job, progress):
+            return {"text": job["filename"]}
+
+        async def scenario():
+            runner = JobRunner(self.store, handler, workers=1)
+            runner.start()
+            for _ in range(100):
+                if self.store.get(second)["status"] == JobStatus.done:
+                    break
+                await asyncio.sleep(0.01)
+            for task in runner._tasks:
+                task.cancel()
+
+        asyncio.run(scenario())
+        self.assertEqual(self.store.get(first)["status"], JobStatus.error)
+        self.assertEqual(self.store.get(first)["error"], "No space left on device")
+        self.assertEqual(self.store.result(second), {"text": "second.mp3"})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+from fake_modules import AUDIO, mock_modules
+
+# Mock the audio and model dependencies only while the detector is imported
+with mock_modules(*AUDIO, "pydantic"):
+    from language_detection import LanguageCache, LanguageDetector, create_language_detector, english_model
+
+class TestLanguageDetection(unittest.TestCase):
+    def setUp(self):
+        self.model = MagicMock()
+        self.model.detect_language.return_value = ("en", 0.97, [])
+        self.backend_class = MagicMock(return_value=MagicMock(model=self.model))
+        # The detector imports its backend lazily, this stands in for it
+        patcher = patch.dict(sys.modules, {"backends.fasterwhisper": SimpleNamespace(FasterWhisperBackend=self.backend_class)})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.detector = LanguageDetector(model_size="tiny", excerpt_seconds=1.0, cache=LanguageCache(2))
+
+    def test_detection_is_cached_per_content_hash(self):
+        self.assertEqual(self.detector.detect([0.0] * 32000, content_hash="abc"), "en")
+        self.assertEqual(self.detector.detect([0.0] * 32000, content_hash="abc"), "en")
+
+        self.assertEqual(self.model.detect_language.call_count, 1)
+        # Only the excerpt is given to the small model
+        self.assertEqual(len(self.model.detect_language.call_args[0][0]), 16000)
+        self.backend_class.assert_called_once_with(model_size="tiny", device="cpu")
+        self.assertEqual(self.detector.stats()["cache_hits"], 1)
+
+    def test_low_confidence_is_left_to_the_main_model(self):
+        self.model.detect_language.return_value = ("nl", 0.3, [])
+        self.assertIsNone(self.detector.detect([0.0] * 100, content_hash="abc"))
+        # The cached low-confidence result is not trusted either
+        self.assertIsNone(self.detector.detect([0.0] * 100, content_hash="abc"))
+        self.assertEqual(self.detector.stats()["low_confidence"], 2)
+
+    def test_applies_and_english_routing(self):
+        self.assertTrue(self.detector.applies("large-v3"))
+        self.assertFalse(self.detector.applies("tiny"))
+        self.assertFalse(self.detector.applies("small.en"))
+        self.assertFalse(self.detector.applies("groq:whisper-large-v3"))
+        self.assertEqual(english_model("medium"), "medium.en")
+        self.assertEqual(english_model("large-v3"), "large-v3")
+
+    def test_detection_is_opt_in(self):
+        with patch.dict(os.environ, {}, clear=True):
+            self.assertIsNone(create_language_detector())
+        with patch.dict(os.environ, {"LANGUAGE_DETECTION_MODEL": "tiny"}):
+            self.assertEqual(create_language_detector().model_size, "tiny")
+
+    def test_cache_evicts_least_recently_used(self):
+        cache = LanguageCache(2)
+        cache.put("a", "en", 0.9)
+        cache.put("b", "de", 0.9)
+        cache.get("a")
+        cache.put("c", "fr", 0.9)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), ("en", 0.9))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import asyncio
+import unittest
+from fake_modules import mock_modules
+
+# Mock groq and torch only while the diarizer is imported
+with mock_modules("groq", "torch"):
+    from processors.diarizer import LlamaDiarizer, map_batch_speakers
+
+class TestSpeakerMapping(unittest.TestCase):
+    def test_swapped_labels_are_pinned(self):
+        pairs = [("Speaker 2", "Speaker 1"), ("Speaker 1", "Speaker 2"), ("Speaker 2", "Speaker 1")]
+        mapping = map_batch_speakers(pairs, {"Speaker 1", "Speaker 2"}, {"Speaker 1", "Speaker 2"})
+        self.assertEqual(mapping, {"Speaker 2": "Speaker 1", "Speaker 1": "Speaker 2"})
+
+    def test_conflicting_new_speaker_gets_fresh_label(self):
+        # Local "Speaker 1" is pinned to global "Speaker 2", so local "Speaker 2" must be someone else
+        pairs = [("Speaker 1", "Speaker 2")]
+        mapping = map_batch_speakers(pairs, {"Speaker 1", "Speaker 2"}, {"Speaker 1", "Speaker 2"})
+        self.assertEqual(mapping["Speaker 1"], "Speaker 2")
+        self.assertEqual(mapping["Speaker 2"], "Speaker 3")
+
+    def test_unknown_labels_are_ignored(self):
+        pairs = [("Speaker ?", "Speaker 1"), ("Speaker 1", "Speaker ?")]
+        mapping = map_batch_speakers(pairs, {"Speaker 1"}, {"Speaker 1"})
+        self.assertEqual(mapping, {"Speaker 1": "Speaker 1"})
+
+class TestConcurrentDiarize(unittest.TestCase):
+    def test_batches_run_concurrently_and_are_reconciled(self):
+        diarizer = LlamaDiarizer(api_key="dummy")
+        # Alternating speakers: even segments are Alice, odd are Bob
+        segments = [{"id": f"seg_{i}", "text": f"line {i}"} for i in range(75)]
+        truth = {s["id"]: ("Alice" if i % 2 == 0 else "Bob") for i, s in enumerate(segments)}
+
+        in_flight = {"now": 0, "max": 0}
+        calls = []
+
+        async def fake_process_batch(batch, context, speaker_hint):
+            in_flight["now"] += 1
+            in_flight["max"] = max(in_flight["max"], in_flight["now"])
+            await asyncio.sleep(0.01)
+            in_flight["now"] -= 1
+            calls.append(batch[0]["id"])
+            # Every other batch numbers the speakers the other way round
+            swap = len(calls) % 2 == 0
+            names = {"Alice": "Speaker 2", "Bob": "Speaker 1"} if swap else {"Alice": "Speaker 1", "Bob": "Speaker 2"}
+            return {s["id"]: {"speaker": names[truth[s["id"]]], "role": "Guest"} for s in batch}
+
+        diarizer._process_batch = fake_process_batch
+        result = asyncio.run(diarizer.diarize(segments))
+
+        self.assertGreater(in_flight["max"], 1)
+        self.assertEqual(len(calls), 3)
+        alice = result[0]["speaker"]
+        bob = result[1]["speaker"]
+        self.assertNotEqual(alice, bob)
+        for i, seg in enumerate(result):
+            self.assertEqual(seg["speaker"], alice if i % 2 == 0 else bob)
+            self.assertEqual(seg["role"], "Guest")
+
+if __name__ == '__main__':
+    unittest.main()
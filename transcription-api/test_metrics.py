@@ -0,0 +1,49 @@
+import os
+import re
+import glob
+import unittest
+import metrics
+
+class TestMetrics(unittest.TestCase):
+    def test_stage_reraises_and_observes(self):
+        with self.assertRaises(ValueError):
+            with metrics.stage("decode"):
+                raise ValueError("bad file")
+        with metrics.active_transcription():
+            pass
+        # Zero-length audio must not divide by zero
+        metrics.observe_transcription("tiny", "cpu", 1.0, 0.0)
+
+    def test_stage_names_are_known(self):
+        with self.assertRaises(ValueError):
+            with metrics.stage("transcode"):
+                pass
+        # Every stage timed in the service is declared
+        root = os.path.dirname(os.path.abspath(__file__))
+        used = set()
+        for path in glob.glob(os.path.join(root, "**", "*.py"), recursive=True):
+            if not os.path.basename(path).startswith("test_"):
+                with open(path, encoding="utf-8") as f:
+                    used.update(re.findall(r'metrics\.stage\("(\w+)"\)', f.read()))
+        self.assertIn("language_detection", used)
+        self.assertLessEqual(used, set(metrics.STAGES))
+
+    @unittest.skipUnless(metrics.enabled, "prometheus_client not installed")
+    def test_exposition(self):
+        with metrics.stage("asr"):
+            pass
+        metrics.observe_transcription("small", "cpu", 30.0, 120.0)
+        metrics.update_gauges(
+            {"devices": {"cpu": {"queued": 3, "running": 1}}},
+            {"pending": 2},
+            {"groq": {"throttled": 4, "models": {}}},
+        )
+        text = metrics.render().decode()
+        self.assertIn('whishper_stage_seconds_count{stage="asr"}', text)
+        self.assertIn('whishper_realtime_factor_sum{device="cpu",model="small"} 0.25', text)
+        self.assertIn('whishper_queue_depth{device="cpu"} 3.0', text)
+        self.assertIn('whishper_jobs{status="pending"} 2.0', text)
+        self.assertIn('whishper_component_stat{component="groq",stat="throttled"} 4.0', text)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import threading
+import unittest
+from backends.registry import ModelRegistry
+
+class TestModelRegistry(unittest.TestCase):
+    def test_hit_and_miss_counters(self):
+        registry = ModelRegistry()
+        loads = []
+
+        def loader():
+            loads.append(1)
+            return object()
+
+        first = registry.get_or_load(("tiny", "cpu"), loader)
+        second = registry.get_or_load(("tiny", "cpu"), loader)
+
+        self.assertIs(first, second)
+        self.assertEqual(len(loads), 1)
+        stats = registry.stats()
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["loads"], 1)
+
+    def test_lru_eviction_by_memory_budget(self):
+        registry = ModelRegistry(max_bytes=250)
+        registry.get_or_load("tiny", object, size_bytes=100)
+        registry.get_or_load("base", object, size_bytes=100)
+        # Touch tiny so base becomes the least recently used
+        registry.get("tiny")
+        registry.get_or_load("small", object, size_bytes=100)
+
+        self.assertTrue(registry.contains("tiny"))
+        self.assertFalse(registry.contains("base"))
+        self.assertTrue(registry.contains("small"))
+        self.assertEqual(registry.stats()["evictions"], 1)
+
+    def test_newest_model_is_kept_even_if_over_budget(self):
+        registry = ModelRegistry(max_bytes=50)
+        registry.get_or_load("large-v3", object, size_bytes=100)
+        self.assertTrue(registry.contains("large-v3"))
+
+    def test_concurrent_misses_load_once(self):
+        registry = ModelRegistry()
+        loads = []
+        gate = threading.Event()
+
+        def slow_loader():
+            loads.append(1)
+            gate.wait(1)
+            return object()
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(registry.get_or_load("small", slow_loader))) for _ in range(4)]
+        for t in threads:
+            t.start()
+        gate.set()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(loads), 1)
+        self.assertEqual(len(set(map(id, results))), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import os
+import sys
+import time
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+from fake_modules import AUDIO, S3, mock_modules
+
+# numpy and faster_whisper are only needed for type definitions, boto3 for the storage module,
+# mock them while the cache is imported
+with mock_modules(*AUDIO, *S3):
+    import cache as cache_module
+    from cache import ResultCache, EncodedAudioCache
+
+def fake_audio(transcode):
+    # The cache imports audio lazily, this stands in for it
+    return patch.dict(sys.modules, {"audio": SimpleNamespace(transcode=transcode)})
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_key_depends_on_options(self):
+        base = ResultCache.key("abc", "small", "en", "transcribe", False, None)
+        self.assertEqual(base, ResultCache.key("abc", "small", "en", "transcribe", False, None))
+        self.assertNotEqual(base, ResultCache.key("abc", "small", "en", "transcribe", True, None))
+        self.assertNotEqual(base, ResultCache.key("abc", "base", "en", "transcribe", False, None))
+        self.assertNotEqual(base, ResultCache.key("abd", "small", "en", "transcribe", False, None))
+        # Batched and sequential decoding, and the model English is routed to
+        self.assertNotEqual(base, ResultCache.key("abc", "small", "en", "transcribe", False, None, 16))
+        self.assertNotEqual(base, ResultCache.key("abc", "small", "en", "transcribe", False, None, 0, "small.en"))
+        # "auto" and no language are the same request
+        self.assertEqual(
+            ResultCache.key("abc", "small", None, "transcribe", False, None),
+            ResultCache.key("abc", "small", "auto", "transcribe", False, None),
+        )
+
+    def test_roundtrip(self):
+        cache = ResultCache(self.tmp.name, max_bytes=0)
+        result = {"text": "Hello", "language": "en", "duration": 1.0, "processing_duration": 0.5, "segments": []}
+
+        self.assertIsNone(cache.get("missing"))
+        cache.put("key", result)
+        self.assertEqual(cache.get("key"), result)
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_eviction_removes_least_recently_used(self):
+        cache = ResultCache(self.tmp.name, max_bytes=0)
+        payload = {"text": "x" * 100, "segments": []}
+        for key in ["a", "b", "c"]:
+            cache.put(key, payload)
+        # Make "a" the oldest entry, then read it so "b" becomes the least recently used
+        now = time.time()
+        os.utime(os.path.join(self.tmp.name, "a.json"), (now - 30, now - 30))
+        os.utime(os.path.join(self.tmp.name, "b.json"), (now - 20, now - 20))
+        os.utime(os.path.join(self.tmp.name, "c.json"), (now - 10, now - 10))
+        cache.get("a")
+
+        entry_size = os.path.getsize(os.path.join(self.tmp.name, "a.json"))
+        cache.max_bytes = entry_size * 2
+        cache._evict()
+
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("c"))
+
+class TestEncodedAudioCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.tmp.name, "video.mp4")
+        with open(self.source, "wb") as f:
+            f.write(b"original media")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_same_content_is_encoded_once(self):
+        cache = EncodedAudioCache(os.path.join(self.tmp.name, "encoded"), max_bytes=0, codec="opus")
+        calls = []
+
+        def fake_transcode(path, out_path, codec):
+            calls.append((path, codec))
+            with open(out_path, "wb") as f:
+                f.write(b"opus")
+
+        with fake_audio(fake_transcode):
+            first = cache.get_or_encode(self.source)
+            copy = os.path.join(self.tmp.name, "copy.mp4")
+            with open(copy, "wb") as f:
+                f.write(b"original media")
+            second = cache.get_or_encode(copy)
+
+        self.assertEqual(first, second)
+        self.assertTrue(first.endswith(".ogg"))
+        self.assertEqual(calls, [(self.source, "opus")])
+        self.assertEqual(cache.stats()["hits"], 1)
+
+    def test_known_hash_is_not_recomputed(self):
+        cache = EncodedAudioCache(os.path.join(self.tmp.name, "encoded"), max_bytes=0)
+
+        def fake_transcode(path, out_path, codec):
+            with open(out_path, "wb") as f:
+                f.write(b"flac")
+
+        with fake_audio(fake_transcode), patch.object(cache_module, "hash_file") as hash_file:
+            encoded = cache.get_or_encode(self.source, "abc")
+
+        hash_file.assert_not_called()
+        self.assertEqual(os.path.basename(encoded), "abc.flac")
+
+    def test_failed_encode_leaves_no_entry(self):
+        cache = EncodedAudioCache(os.path.join(self.tmp.name, "encoded"), max_bytes=0)
+        with fake_audio(MagicMock(side_effect=RuntimeError("ffmpeg failed"))):
+            with self.assertRaises(RuntimeError):
+                cache.get_or_encode(self.source)
+        self.assertEqual(os.listdir(cache.directory), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import asyncio
+import threading
+import unittest
+from scheduler import InferencePool, PoolSaturated
+
+class TestInferencePool(unittest.TestCase):
+    def test_rejects_when_slots_and_queue_are_full(self):
+        pool = InferencePool(slots={"cpu": 1}, queue_size=1, retry_after=7)
+        release = threading.Event()
+
+        async def scenario():
+            running = asyncio.ensure_future(pool.run("cpu", release.wait, 5))
+            queued = asyncio.ensure_future(pool.run("cpu", lambda: "done"))
+            await asyncio.sleep(0.05)
+
+            stats = pool.stats()["devices"]["cpu"]
+            self.assertEqual(stats["running"], 1)
+            self.assertEqual(stats["queued"], 1)
+
+            with self.assertRaises(PoolSaturated) as ctx:
+                await pool.run("cpu", lambda: None)
+            self.assertEqual(ctx.exception.retry_after, 7)
+
+            release.set()
+            self.assertTrue(await running)
+            self.assertEqual(await queued, "done")
+
+        asyncio.run(scenario())
+        stats = pool.stats()
+        self.assertEqual(stats["rejected"], 1)
+        self.assertEqual(stats["completed"], 2)
+        self.assertEqual(stats["devices"]["cpu"]["running"], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import os
+import asyncio
+import hashlib
+import tempfile
+import unittest
+from unittest.mock import patch
+from fake_modules import S3, mock_modules
+
+# Mock the S3 client dependencies only while storage is imported
+with mock_modules(*S3):
+    import storage
+    from storage import save_upload, UploadTooLarge
+
+class FakeUpload:
+    """
+    Stands in for UploadFile, records the size of every read.
+    """
+    def __init__(self, data: bytes, size=None):
+        self.data = data
+        self.size = size
+        self.position = 0
+        self.reads = []
+
+    async def read(self, n: int) -> bytes:
+        self.reads.append(n)
+        chunk = self.data[self.position:self.position + n]
+        self.position += len(chunk)
+        return chunk
+
+class TestSaveUpload(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "upload.mp3")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_copies_in_chunks_and_hashes_on_the_fly(self):
+        data = bytes(range(256)) * 10
+        upload = FakeUpload(data)
+        with patch.object(storage, "UPLOAD_CHUNK_SIZE", 1000):
+            content_hash, written = asyncio.run(save_upload(upload, self.path, max_bytes=0))
+
+        self.assertEqual(written, len(data))
+        self.assertEqual(content_hash, hashlib.sha256(data).hexdigest())
+        with open(self.path, "rb") as f:
+            self.assertEqual(f.read(), data)
+        # Three chunks and the empty read that ends the copy
+        self.assertEqual(upload.reads, [1000] * 4)
+
+    def test_oversized_stream_leaves_no_partial_file(self):
+        upload = FakeUpload(b"x" * 2500)
+        with patch.object(storage, "UPLOAD_CHUNK_SIZE", 1000):
+            with self.assertRaises(UploadTooLarge):
+                asyncio.run(save_upload(upload, self.path, max_bytes=2000))
+        self.assertFalse(os.path.exists(self.path))
+        # Copying stopped at the chunk that crossed the limit
+        self.assertEqual(len(upload.reads), 3)
+
+    def test_known_size_is_rejected_before_copying(self):
+        upload = FakeUpload(b"x" * 10, size=5000)
+        with self.assertRaises(UploadTooLarge):
+            asyncio.run(save_upload(upload, self.path, max_bytes=2000))
+        self.assertEqual(upload.reads, [])
+        self.assertFalse(os.path.exists(self.path))
+
+if __name__ == '__main__':
+    unittest.main()
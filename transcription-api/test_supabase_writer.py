@@ -0,0 +1,94 @@
+import os
+import json
+import tempfile
+import unittest
+from supabase_writer import SupabaseWriter
+
+class FakeClient:
+    def __init__(self, fail_tables=()):
+        self.fail_tables = set(fail_tables)
+        self.inserts = []
+        self.postgrest = self
+        self.token = None
+
+    def auth(self, token):
+        self.token = token
+
+    def table(self, name):
+        self.current = name
+        return self
+
+    def insert(self, rows):
+        self.rows = rows
+        return self
+
+    def execute(self):
+        if self.current in self.fail_tables:
+            raise ConnectionError("supabase unavailable")
+        self.inserts.append((self.token, self.current, self.rows))
+
+class TestSupabaseWriter(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.spool = os.path.join(self.tmp.name, "spool.jsonl")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_rows_are_batched_per_token_and_table(self):
+        client = FakeClient()
+        writer = SupabaseWriter(lambda: client, self.spool, flush_interval=0.05, retry_interval=0.05)
+        writer.insert("whishper_usage_logs", {"n": 1}, "token-a", "user-a")
+        writer.insert("whishper_usage_logs", {"n": 2}, "token-a", "user-a")
+        writer.insert("whishper_transcriptions", {"n": 3}, "token-a", "user-a")
+        writer.insert("whishper_usage_logs", {"n": 4}, "token-b", "user-b")
+        writer.start()
+        writer.stop()
+
+        self.assertEqual(client.inserts, [
+            ("token-a", "whishper_usage_logs", [{"n": 1, "user_id": "user-a"}, {"n": 2, "user_id": "user-a"}]),
+            ("token-a", "whishper_transcriptions", [{"n": 3, "user_id": "user-a"}]),
+            ("token-b", "whishper_usage_logs", [{"n": 4, "user_id": "user-b"}]),
+        ])
+        self.assertEqual(writer.stats()["written"], 4)
+
+    def test_failed_rows_are_spooled_and_replayed(self):
+        client = FakeClient(fail_tables={"whishper_transcriptions"})
+        writer = SupabaseWriter(lambda: client, self.spool, service_client_factory=FakeClient, flush_interval=0.01, retry_interval=60)
+        writer._write([
+            {"table": "whishper_usage_logs", "row": {"n": 1}, "token": "secret-token", "user_id": "u", "attempts": 0},
+            {"table": "whishper_transcriptions", "row": {"n": 2}, "token": "secret-token", "user_id": "u", "attempts": 0},
+        ])
+        with open(self.spool) as f:
+            content = f.read()
+        spooled = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([r["row"] for r in spooled], [{"n": 2}])
+        self.assertEqual(spooled[0]["attempts"], 1)
+        self.assertEqual(spooled[0]["user_id"], "u")
+        # Tokens never reach the disk
+        self.assertNotIn("secret-token", content)
+
+        # A new process picks the spool up once the database is back, as the service role
+        client, service = FakeClient(), FakeClient()
+        writer = SupabaseWriter(lambda: client, self.spool, service_client_factory=lambda: service)
+        writer._replay()
+        self.assertEqual(client.inserts, [])
+        self.assertEqual(service.inserts, [(None, "whishper_transcriptions", [{"n": 2, "user_id": "u"}])])
+        self.assertFalse(os.path.exists(self.spool))
+
+    def test_failed_rows_are_dropped_without_service_client(self):
+        client = FakeClient(fail_tables={"whishper_usage_logs"})
+        writer = SupabaseWriter(lambda: client, self.spool)
+        writer._write([{"table": "whishper_usage_logs", "row": {}, "token": "t", "user_id": "u", "attempts": 0}])
+        self.assertEqual(writer.stats()["dropped"], 1)
+        self.assertFalse(os.path.exists(self.spool))
+
+    def test_rows_are_dropped_after_max_attempts(self):
+        client = FakeClient(fail_tables={"whishper_usage_logs"})
+        writer = SupabaseWriter(lambda: client, self.spool, service_client_factory=lambda: client, max_attempts=2)
+        writer._write([{"table": "whishper_usage_logs", "row": {}, "token": "t", "user_id": "u", "attempts": 1}])
+        self.assertEqual(writer.stats()["dropped"], 1)
+        self.assertFalse(os.path.exists(self.spool))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import sys
+import asyncio
+import tempfile
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+from fake_modules import PIPELINE, mock_modules
+
+# Mock the audio, model and storage dependencies only while the pipeline is imported
+with mock_modules(*PIPELINE):
+    import transcribe
+
+class TestLongAudio(unittest.TestCase):
+    def transcribe(self, diarize: bool):
+        backend = MagicMock()
+        backend.transcribe.return_value = {"text": " hello", "segments": [], "language": "en", "duration": 9000.0}
+        backend.transcribe_windowed.return_value = backend.transcribe.return_value
+        diarizer = MagicMock()
+        diarizer.return_value.smart_refine = AsyncMock(return_value=[])
+
+        with patch.object(transcribe, "LONG_AUDIO_SECONDS", 7200), \
+             patch.object(transcribe, "media_duration", return_value=9000.0), \
+             patch.object(transcribe, "load_audio", return_value=[0.0] * 16), \
+             patch.object(transcribe, "language_detector", None), \
+             patch.object(transcribe, "FasterWhisperBackend", return_value=backend), \
+             patch.dict(sys.modules, {"processors.diarizer": MagicMock(PyannoteDiarizer=diarizer)}):
+            result = asyncio.run(transcribe.transcribe_audio("long.mp3", "small", diarize=diarize))
+        return backend, diarizer, result
+
+    def test_long_recordings_are_windowed(self):
+        backend, _, _ = self.transcribe(diarize=False)
+        backend.transcribe_windowed.assert_called_once()
+        backend.transcribe.assert_not_called()
+
+    def test_diarized_long_recordings_are_decoded_whole(self):
+        # pyannote needs the whole waveform, so the requested diarization is kept
+        backend, diarizer, result = self.transcribe(diarize=True)
+        backend.transcribe_windowed.assert_not_called()
+        backend.transcribe.assert_called_once()
+        diarizer.return_value.run_diarization.assert_called_once()
+        self.assertNotIn("degraded", result)
+
+class TestLanguageRouting(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        with open(os.path.join(self.tmp.name, "clip.mp3"), "wb") as f:
+            f.write(b"media")
+        patcher = patch.dict(os.environ, {"UPLOAD_DIR": self.tmp.name})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_detection_uses_the_content_hash_without_result_cache(self):
+        detector = MagicMock()
+        detector.detect.return_value = "en"
+        backend = MagicMock()
+        backend.transcribe.return_value = {"text": " hello", "segments": [], "language": "en", "duration": 3.0}
+
+        with patch.object(transcribe, "result_cache", None), \
+             patch.object(transcribe, "language_detector", detector), \
+             patch.object(transcribe, "ROUTE_ENGLISH", True), \
+             patch.object(transcribe, "hash_file", return_value="abc") as hash_file, \
+             patch.object(transcribe, "media_duration", return_value=3.0), \
+             patch.object(transcribe, "load_audio", return_value=[0.0] * 16), \
+             patch.object(transcribe, "FasterWhisperBackend", return_value=backend) as backend_class, \
+             patch.object(transcribe.metrics, "observe_transcription") as observe:
+            asyncio.run(transcribe.transcribe_from_filename("clip.mp3", "small"))
+
+        hash_file.assert_called_once()
+        # The language cache is keyed by the same hash as the result cache
+        self.assertEqual(detector.detect.call_args[0][2], "abc")
+        backend_class.assert_called_once_with(model_size="small.en", device=transcribe.DeviceType.cpu)
+        # Metrics are reported for the model that actually ran
+        self.assertEqual(observe.call_args[0][0], "small.en")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+from fake_modules import AUDIO, mock_modules
+
+# Mock the audio and model dependencies only while the backend is imported
+with mock_modules(*AUDIO):
+    import backends.fasterwhisper as fasterwhisper
+    from backends.fasterwhisper import FasterWhisperBackend
+
+class TestWindowedTranscription(unittest.TestCase):
+    def test_windows_carry_prompt_language_and_offsets(self):
+        backend = FasterWhisperBackend.__new__(FasterWhisperBackend)
+        calls = []
+
+        def iter_segments(window, language, task, batch_size, initial_prompt, offset):
+            calls.append({"window": window, "language": language, "prompt": initial_prompt, "offset": offset})
+            segments = [{"id": window, "text": f" {window} text", "start": offset + 1.0, "end": offset + 2.0, "words": []}]
+            return iter(segments), SimpleNamespace(language="de", duration=600.0)
+
+        backend.iter_segments = iter_segments
+        windows = [(0.0, "first"), (598.5, "second"), (1197.0, "third")]
+        progress = []
+
+        with patch.object(fasterwhisper, "iter_audio_windows", return_value=iter(windows)), \
+             patch.object(fasterwhisper, "media_duration", return_value=1500.0):
+            result = backend.transcribe_windowed("long.mp3", progress_callback=progress.append)
+
+        # The first window detects the language, later ones are pinned to it
+        self.assertEqual([c["language"] for c in calls], [None, "de", "de"])
+        self.assertEqual([c["prompt"] for c in calls], [None, "first text", "second text"])
+        self.assertEqual([s["start"] for s in result["segments"]], [1.0, 599.5, 1198.0])
+        self.assertEqual(result["text"], "first text second text third text")
+        self.assertEqual(result["duration"], 1500.0)
+        self.assertEqual(result["language"], "de")
+        self.assertEqual(len(progress), 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,16 +1,29 @@
-from backends.fasterwhisper import FasterWhisperBackend
+from backends.fasterwhisper import FasterWhisperBackend, build_transcription, DEFAULT_BATCH_SIZE
 from backends.groq_backend import GroqBackend
 from backends.backend import Transcription
-from faster_whisper import decode_audio
+from audio import SAMPLE_RATE, load_audio, media_duration
 from models import DeviceType
-from typing import Optional
+from storage import save_upload, hash_file
+from cache import result_cache
+from language_detection import language_detector, english_model, ROUTE_ENGLISH
+from scheduler import inference_pool, PoolSaturated
+import metrics
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
 import numpy as np
+import asyncio
+import threading
+from concurrent.futures import Future
 import io
 import os
 import time
 
-def convert_audio(file) -> np.ndarray:
-        return decode_audio(file, split_stereo=False, sampling_rate=16000)
+# Local recordings longer than this are transcribed in windows unless diarized (0 disables)
+LONG_AUDIO_SECONDS = float(os.environ.get("LONG_AUDIO_SECONDS", 7200))
+# Batch transcription packs clips up to this length through the encoder, this many at a time
+PACK_MAX_SECONDS = 30
+PACK_CLIPS = int(os.environ.get("BATCH_PACK_CLIPS", 64))
+# Seconds a batch waits before asking again for a slot in a full queue
+BATCH_RETRY_SECONDS = float(os.environ.get("BATCH_RETRY_SECONDS", 1))
 
 async def transcribe_from_filename(filename: str,
                                     model_size: str,
@@ -18,18 +31,40 @@ async def transcribe_from_filename(filename: str,
                                     device: DeviceType = DeviceType.cpu,
                                     task: str = "transcribe",
                                     diarize: bool = False,
-                                    num_speakers: Optional[int] = None) -> Transcription:
+                                    num_speakers: Optional[int] = None,
+                                    content_hash: Optional[str] = None,
+                                    progress_callback: Optional[Callable[[float], None]] = None,
+                                    batch_size: Optional[int] = None) -> Transcription:
     
     filepath = os.path.join(os.environ["UPLOAD_DIR"], filename)
     if not os.path.exists(filepath):
         raise RuntimeError(f"file not found in {filepath}")
+
+    # The result cache and the language cache are both keyed by the content hash
+    if content_hash is None and (result_cache is not None or detects_language(model_size, language)):
+        content_hash = await asyncio.to_thread(hash_file, filepath)
+
+    # Identical media transcribed with identical options is served from the result cache
+    cache_key = None
+    if result_cache is not None:
+        cache_key = result_cache_key(content_hash, model_size, language, task, diarize, num_speakers, batch_size)
+        cached = await asyncio.to_thread(result_cache.get, cache_key)
+        if cached is not None:
+            print(f"Result cache hit for {filename}")
+            return cached
     
     # Pass the filepath directly to transcribe_audio.
     # This allows:
     # 1. Groq backend to detect proper file extension.
     # 2. Pyannote to receive a valid file path for diarization.
     # 3. FasterWhisper to handle loading efficiently.
-    return await transcribe_audio(filepath, model_size, language, device, task, diarize, num_speakers)
+    with metrics.active_transcription():
+        result = await transcribe_audio(filepath, model_size, language, device, task, diarize, num_speakers, progress_callback, batch_size, content_hash)
+
+    # A result missing the requested diarization is returned but not cached
+    if cache_key is not None and not result.get("degraded"):
+        await asyncio.to_thread(result_cache.put, cache_key, result)
+    return result
 
 async def transcribe_file(file: io.BytesIO, 
                           model_size: str, 
@@ -38,16 +73,14 @@ async def transcribe_file(file: io.BytesIO,
                           task: str = "transcribe",
                           diarize: bool = False,
                           num_speakers: Optional[int] = None) -> Transcription:
-    contents = await file.read()  # async read
-    
     # We save to a temp file to allow Pyannote (and Faster Whisper) to access the file directly.
-    # This is also more memory efficient than holding the numpy array in memory.
+    # The upload is streamed in chunks, so it is never held in memory as a whole.
     temp_filename = f"temp_{int(time.time())}_{uuid.uuid4().hex}.audio"
     try:
-        with open(temp_filename, 'wb') as f:
-            f.write(contents)
+        await save_upload(file, temp_filename)
         
-        return await transcribe_audio(temp_filename, model_size, language, device, task, diarize, num_speakers)
+        with metrics.active_transcription():
+            return await transcribe_audio(temp_filename, model_size, language, device, task, diarize, num_speakers)
     finally:
         if os.path.exists(temp_filename):
             os.remove(temp_filename)
@@ -61,54 +94,401 @@ async def transcribe_audio(audio: Union[np.ndarray, str],
                            device: DeviceType = DeviceType.cpu,
                            task : str = "transcribe",
                            diarize: bool = False,
-                           num_speakers: Optional[int] = None) -> Transcription:
+                           num_speakers: Optional[int] = None,
+                           progress_callback: Optional[Callable[[float], None]] = None,
+                           batch_size: Optional[int] = None,
+                           content_hash: Optional[str] = None) -> Transcription:
     
     if language == "auto":
         language = None
 
+    # Local backends decode the file once, the same buffer then feeds ASR and pyannote.
+    # Remote backends keep the original file, which they upload as is.
+    decode_once = isinstance(audio, str) and not model_size.startswith("groq:")
+    decoded = Future()
+    if not decode_once:
+        decoded.set_result(audio)
+
     def run_inference():
+        windowed = False
+        if decode_once:
+            try:
+                duration = media_duration(audio) if LONG_AUDIO_SECONDS and not diarize else None
+                if duration and duration > LONG_AUDIO_SECONDS:
+                    # Too long to hold in memory, ASR streams it in windows.
+                    # Diarized recordings are decoded whole, pyannote needs the whole waveform.
+                    windowed = True
+                    decoded.set_result(audio)
+                else:
+                    with metrics.stage("decode"):
+                        decoded.set_result(load_audio(audio))
+            except BaseException as e:
+                decoded.set_exception(e)
+                raise
+        data = decoded.result()
+
+        # A small model detects the language so the main model doesn't have to
+        target_model, target_language = model_size, language
+        if detects_language(model_size, language):
+            try:
+                with metrics.stage("language_detection"):
+                    target_language = language_detector.detect(data, device, content_hash)
+            except Exception as e:
+                print(f"Language detection failed, leaving it to {model_size}: {e}")
+            if target_language == "en" and routes_english(model_size, language, task):
+                target_model = english_model(model_size)
+
         # Load the model
         if model_size.startswith("groq:"):
             actual_model = model_size.split(":", 1)[1]
             model = GroqBackend(model_size=actual_model, device=device)
         else:
-            model = FasterWhisperBackend(model_size=model_size, device=device)
+            model = FasterWhisperBackend(model_size=target_model, device=device)
         
-        model.get_model()
-        model.load()
+        with metrics.stage("model_load"):
+            model.get_model()
+            model.load()
         
         # Transcribe the data (might be ndarray or filepath)
         start_time = time.time()
-        result = model.transcribe(audio, silent=True, language=language, task=task, diarize=diarize, num_speakers=num_speakers)
+        with metrics.stage("asr"):
+            if windowed:
+                result = model.transcribe_windowed(data, language=target_language, task=task, progress_callback=progress_callback, batch_size=batch_size)
+            else:
+                result = model.transcribe(data, silent=True, language=target_language, task=task, diarize=diarize, num_speakers=num_speakers, progress_callback=progress_callback, batch_size=batch_size, content_hash=content_hash)
         end_time = time.time()
         result["processing_duration"] = end_time - start_time
+        metrics.observe_transcription(target_model, pool_device_for(model_size, device), result["processing_duration"], result.get("duration"))
         
-        # Apply Pyannote Diarization if requested and not using Groq (Groq handles it differently or upstream)
-        # We only run this if audio is a string (filepath), which it should be now.
-        if diarize and isinstance(audio, str) and not model_size.startswith("groq:"):
-            print("Running Pyannote Diarization...")
+        return result
+
+    def run_diarization(pcm):
+        from processors.diarizer import PyannoteDiarizer
+        with metrics.stage("diarization"):
+            return PyannoteDiarizer().run_diarization(pcm, num_speakers=num_speakers)
+
+    async def diarize_when_decoded():
+        # Only take a diarization slot once the ASR slot has decoded the audio, so queued ASR jobs
+        # don't hold diarization slots idle. Shielded so cancelling this never cancels `decoded`.
+        pcm = await asyncio.shield(asyncio.wrap_future(decoded))
+        return await inference_pool.run("diarization", run_diarization, pcm)
+
+    # Apply Pyannote Diarization if requested and not using Groq (Groq handles it differently or upstream)
+    # We only run this if audio is a string (filepath), which it should be now.
+    # Diarization runs on its own pool concurrently with ASR, both only need the audio.
+    diarization_task = None
+    if diarize and isinstance(audio, str) and not model_size.startswith("groq:"):
+        inference_pool.check_capacity("diarization")
+        print("Running Pyannote Diarization...")
+        diarization_task = asyncio.ensure_future(diarize_when_decoded())
+
+    try:
+        result = await inference_pool.run(pool_device_for(model_size, device), run_inference)
+    except BaseException as e:
+        # Don't leave the diarization thread waiting for audio that will never be decoded
+        if not decoded.done():
+            decoded.set_exception(e if isinstance(e, Exception) else RuntimeError("transcription cancelled"))
+        if diarization_task:
+            diarization_task.cancel()
+        raise
+
+    if diarization_task is None:
+        return result
+
+    try:
+        from processors.diarizer import PyannoteDiarizer
+        diarizer = PyannoteDiarizer()
+        diarization_result = await diarization_task
+        # Align speakers with segments
+        with metrics.stage("alignment"):
+            result["segments"] = diarizer.assign_speakers_to_segments(result["segments"], diarization_result)
+        print("Pyannote Diarization completed.")
+    except Exception as e:
+        print(f"Pyannote Diarization failed: {e}")
+        result["degraded"] = True
+        return result
+
+    # LLM refinement is network-bound, run it on the event loop instead of holding an inference slot
+    print("Running Smart Refinement (LLM)...")
+    try:
+        with metrics.stage("llm_refine"):
+            result["segments"] = await diarizer.smart_refine(result["segments"])
+        print("Smart Refinement completed.")
+    except Exception as e:
+         print(f"Smart Refinement failed: {e}")
+         result["degraded"] = True
+
+    return result
+
+async def transcribe_batch(filenames: List[str],
+                           model_size: str,
+                           language: Optional[str] = None,
+                           device: DeviceType = DeviceType.cpu,
+                           task: str = "transcribe",
+                           batch_size: Optional[int] = None,
+                           is_cancelled: Optional[Callable[[], Awaitable[bool]]] = None) -> List[Dict]:
+    """
+    Transcribes files from UPLOAD_DIR with shared options on one loaded local model.
+    Each file, or pack of clips, takes its own inference slot so other requests interleave with
+    the batch. Clips of up to 30 s in the same known (or detected) language are packed through the
+    encoder together, recordings longer than LONG_AUDIO_SECONDS are transcribed in windows.
+    Stops between slots once is_cancelled() is true.
+    Returns {"filename", "result"} or {"filename", "error"} per file, in order.
+    """
+    if language == "auto":
+        language = None
+
+    upload_dir = os.environ["UPLOAD_DIR"]
+    entries: List[Dict] = [{"filename": filename} for filename in filenames]
+    cache_keys: List[Optional[str]] = [None] * len(filenames)
+    # Packed clips are always decoded in batches and stored under this key instead
+    packed_keys: List[Optional[str]] = [None] * len(filenames)
+    content_hashes: List[Optional[str]] = [None] * len(filenames)
+    # Same default as FasterWhisperBackend.transcribe_clips
+    pack_batch_size = batch_size or DEFAULT_BATCH_SIZE or 16
+    for i, filename in enumerate(filenames):
+        filepath = os.path.join(upload_dir, filename)
+        if not os.path.exists(filepath):
+            entries[i]["error"] = f"file not found in {filepath}"
+        elif result_cache is not None or detects_language(model_size, language):
+            content_hashes[i] = await asyncio.to_thread(hash_file, filepath)
+        if content_hashes[i] is not None and result_cache is not None:
+            # The batch itself never routes English to another model
+            cache_keys[i] = result_cache_key(content_hashes[i], model_size, language, task, False, None, batch_size, route_english=False)
+            packed_keys[i] = result_cache_key(content_hashes[i], model_size, language, task, False, None, pack_batch_size, route_english=False)
+            # Whether a file is packed is only known once it is decoded, so both keys are looked up
+            cached = await asyncio.to_thread(result_cache.get, cache_keys[i])
+            if cached is None and packed_keys[i] != cache_keys[i]:
+                cached = await asyncio.to_thread(result_cache.get, packed_keys[i])
+            if cached is not None:
+                entries[i]["result"] = cached
+    pending = [i for i, entry in enumerate(entries) if "result" not in entry and "error" not in entry]
+    if not pending:
+        return entries
+
+    pool_device = pool_device_for(model_size, device)
+    detect = detects_language(model_size, language)
+
+    def load_model() -> FasterWhisperBackend:
+        # Resident in the model registry after the first file
+        model = FasterWhisperBackend(model_size=model_size, device=device)
+        with metrics.stage("model_load"):
+            model.get_model()
+            model.load()
+        return model
+
+    def prepare(i: int):
+        # Returns (language, audio) of a clip to pack, or transcribes the file right away
+        with metrics.stage("decode"):
+            audio = load_audio(os.path.join(upload_dir, entries[i]["filename"]))
+        file_language = language
+        if detect:
+            try:
+                with metrics.stage("language_detection"):
+                    file_language = language_detector.detect(audio, device, content_hashes[i])
+            except Exception as e:
+                print(f"Language detection failed for {entries[i]['filename']}: {e}")
+        if file_language and len(audio) <= PACK_MAX_SECONDS * SAMPLE_RATE:
+            return file_language, audio
+
+        model = load_model()
+        start_time = time.time()
+        with metrics.stage("asr"):
+            result = model.transcribe(audio, silent=True, language=file_language, task=task, batch_size=batch_size)
+        result["processing_duration"] = time.time() - start_time
+        metrics.observe_transcription(model_size, pool_device, result["processing_duration"], result["duration"])
+        entries[i]["result"] = result
+        return None, None
+
+    def transcribe_pack(clip_language: str, pack: List):
+        for i, _ in pack:
+            cache_keys[i] = packed_keys[i]
+        model = load_model()
+        start_time = time.time()
+        with metrics.stage("asr"):
+            results = model.transcribe_clips([clip for _, clip in pack], clip_language, task, batch_size)
+        processing = (time.time() - start_time) / len(pack)
+        for (i, _), result in zip(pack, results):
+            result["processing_duration"] = processing
+            metrics.observe_transcription(model_size, pool_device, processing, result["duration"])
+            entries[i]["result"] = result
+
+    async def in_slot(run: Callable[[], Awaitable]):
+        # A batch waits for room in the queue rather than failing its remaining files
+        while True:
             try:
-                from processors.diarizer import PyannoteDiarizer
-                diarizer = PyannoteDiarizer()
-                # Run diarization
-                diarization_result = diarizer.run_diarization(audio, num_speakers=num_speakers)
-                # Align speakers with segments
-                result["segments"] = diarizer.assign_speakers_to_segments(result["segments"], diarization_result)
-                print("Pyannote Diarization completed.")
-                
-                print("Running Smart Refinement (LLM)...")
-                try:
-                    import asyncio
-                    # Run async smart refinement in this thread
-                    result["segments"] = asyncio.run(diarizer.smart_refine(result["segments"]))
-                    print("Smart Refinement completed.")
-                except Exception as e:
-                     print(f"Smart Refinement failed: {e}")
+                return await run()
+            except PoolSaturated:
+                await asyncio.sleep(BATCH_RETRY_SECONDS)
 
+    async def flush(clip_language: str):
+        pack = packs.pop(clip_language)
+        try:
+            await in_slot(lambda: inference_pool.run(pool_device, transcribe_pack, clip_language, pack))
+        except Exception as e:
+            for i, _ in pack:
+                entries[i]["error"] = str(e)
+
+    # Packed clips must share a language
+    packs: Dict[str, List] = {}
+    with metrics.active_transcription():
+        for i in pending:
+            if is_cancelled is not None and await is_cancelled():
+                break
+            filepath = os.path.join(upload_dir, entries[i]["filename"])
+            try:
+                duration = await asyncio.to_thread(media_duration, filepath) if LONG_AUDIO_SECONDS else None
+                if duration and duration > LONG_AUDIO_SECONDS:
+                    # Too long to decode whole, streamed in windows and cached like any single transcription
+                    cache_keys[i] = None
+                    entries[i]["result"] = await in_slot(lambda: transcribe_from_filename(
+                        entries[i]["filename"], model_size, language, device, task, content_hash=content_hashes[i], batch_size=batch_size
+                    ))
+                    continue
+                clip_language, audio = await in_slot(lambda: inference_pool.run(pool_device, prepare, i))
             except Exception as e:
-                print(f"Pyannote Diarization failed: {e}")
-                
+                entries[i]["error"] = str(e)
+                continue
+            if clip_language is not None:
+                packs.setdefault(clip_language, []).append((i, audio))
+                if len(packs[clip_language]) >= PACK_CLIPS:
+                    await flush(clip_language)
+
+        if is_cancelled is None or not await is_cancelled():
+            for clip_language in list(packs):
+                await flush(clip_language)
+
+    for i in pending:
+        if "result" not in entries[i] and "error" not in entries[i]:
+            entries[i]["error"] = "cancelled"
+        elif cache_keys[i] is not None and "result" in entries[i]:
+            await asyncio.to_thread(result_cache.put, cache_keys[i], entries[i]["result"])
+    return entries
+
+def result_cache_key(content_hash: str,
+                     model_size: str,
+                     language: Optional[str],
+                     task: str,
+                     diarize: bool,
+                     num_speakers: Optional[int],
+                     batch_size: Optional[int],
+                     route_english: bool = True) -> str:
+    # Batched (VAD) and sequential decoding give different results, so does routing English to a .en model
+    if model_size.startswith("groq:"):
+        batch_size = 0
+    elif batch_size is None:
+        batch_size = DEFAULT_BATCH_SIZE
+    routed_model = None
+    if route_english and routes_english(model_size, None if language == "auto" else language, task):
+        routed_model = english_model(model_size)
+    return result_cache.key(content_hash, model_size, language, task, diarize, num_speakers, batch_size, routed_model)
+
+def detects_language(model_size: str, language: Optional[str]) -> bool:
+    # Whether the small model detects the language before the requested model runs
+    return language in (None, "auto") and language_detector is not None and language_detector.applies(model_size)
+
+def routes_english(model_size: str, language: Optional[str], task: str) -> bool:
+    # Whether detected English is transcribed with the .en variant of the model
+    return (
+        ROUTE_ENGLISH and task == "transcribe" and detects_language(model_size, language)
+        and english_model(model_size) != model_size
+    )
+
+def pool_device_for(model_size: str, device) -> str:
+    # Local models run on a bounded number of slots per device, remote APIs on their own pool
+    return "remote" if model_size.startswith("groq:") else str(getattr(device, "value", device))
+
+async def stream_transcription(filename: str,
+                               model_size: str,
+                               language: Optional[str] = None,
+                               device: DeviceType = DeviceType.cpu,
+                               task: str = "transcribe",
+                               content_hash: Optional[str] = None,
+                               batch_size: Optional[int] = None) -> AsyncIterator[Dict]:
+    """
+    Yields {"type": "segment", "segment": ...} events as soon as each segment is decoded,
+    followed by a {"type": "summary", ...} event with the language and duration.
+    Remote (groq:) models and cache hits emit all segments once the transcription is available.
+    """
+    filepath = os.path.join(os.environ["UPLOAD_DIR"], filename)
+    if not os.path.exists(filepath):
+        raise RuntimeError(f"file not found in {filepath}")
+
+    def summary(result: Transcription) -> Dict:
+        return {
+            "type": "summary",
+            "text": result["text"],
+            "language": result["language"],
+            "duration": result["duration"],
+            "processing_duration": result.get("processing_duration", 0.0),
+        }
+
+    if model_size.startswith("groq:"):
+        result = await transcribe_from_filename(filename, model_size, language, device, task, content_hash=content_hash)
+        for segment in result["segments"]:
+            yield {"type": "segment", "segment": segment}
+        yield summary(result)
+        return
+
+    cache_key = None
+    if result_cache is not None:
+        if content_hash is None:
+            content_hash = await asyncio.to_thread(hash_file, filepath)
+        # Streams never route English to another model
+        cache_key = result_cache_key(content_hash, model_size, language, task, False, None, batch_size, route_english=False)
+        cached = await asyncio.to_thread(result_cache.get, cache_key)
+        if cached is not None:
+            for segment in cached["segments"]:
+                yield {"type": "segment", "segment": segment}
+            yield summary(cached)
+            return
+
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    cancelled = threading.Event()
+    done = object()
+
+    def run_inference():
+        # The client went away while the job was queued
+        if cancelled.is_set():
+            return None
+        model = FasterWhisperBackend(model_size=model_size, device=device)
+        with metrics.stage("model_load"):
+            model.get_model()
+            model.load()
+
+        start_time = time.time()
+        segments, info = model.iter_segments(filepath, language=None if language == "auto" else language, task=task, batch_size=batch_size)
+        collected = []
+        for segment in segments:
+            # Stop decoding if the client went away
+            if cancelled.is_set():
+                return None
+            collected.append(segment)
+            loop.call_soon_threadsafe(queue.put_nowait, {"type": "segment", "segment": segment})
+        result = build_transcription(collected, info.language, info.duration)
+        result["processing_duration"] = time.time() - start_time
+        metrics.observe_transcription(model_size, pool_device_for(model_size, device), result["processing_duration"], result["duration"])
         return result
 
-    import asyncio
-    return await asyncio.to_thread(run_inference)
+    inference = asyncio.ensure_future(inference_pool.run(pool_device_for(model_size, device), run_inference))
+    # Segments are queued from the thread before the future completes, so "done" always comes last
+    inference.add_done_callback(lambda _: queue.put_nowait(done))
+    try:
+        with metrics.active_transcription():
+            while True:
+                event = await queue.get()
+                if event is done:
+                    break
+                yield event
+            result = await inference
+    finally:
+        cancelled.set()
+        # A job still waiting in the queue is dropped without ever running
+        if not inference.done():
+            inference.cancel()
+
+    if result is not None:
+        if cache_key is not None:
+            await asyncio.to_thread(result_cache.put, cache_key, result)
+        yield summary(result)